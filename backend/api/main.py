@@ -1,15 +1,19 @@
 # backend/api/main.py
 import os
 import io
+import asyncio
 import csv
 import json
 import time
+import hashlib
+import threading
 import smtplib
 import requests
 import logging
 import sys
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -19,10 +23,13 @@ from dotenv import load_dotenv
 logging.basicConfig(level=logging.INFO, stream=sys.stdout, format='[%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
+import numpy as np
 import pandas as pd
 import httpx
 from fastapi import Depends, FastAPI, Form, HTTPException, UploadFile, Request, File
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import zipfile
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.gzip import GZipMiddleware
@@ -35,6 +42,13 @@ except Exception:
         pass
 from supabase import create_client, Client
 
+from libs import run_summary  # listing summary rows, shared with the worker
+from libs.metric_cache import MetricCache, metric_key, metric_version
+from libs.sketches import SchemaProfile  # chunk-wise upload profile
+from libs.dataset_store import (  # typed Parquet copies of uploads
+    PARQUET_COMPRESSION, PARQUET_ROW_GROUP_ROWS, load_dataset_head, parquet_path,
+)
+
 # Load environment variables from .env file
 # Try to load from the current directory and parent directory (for Docker)
 load_dotenv(override=True)
@@ -80,7 +94,58 @@ def get_omop_mapper():
 
 REPORT_SERVICE_BASE = os.getenv("REPORT_SERVICE_BASE", "http://localhost:8010")
 MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "10"))
+# Typed Parquet copy written next to each uploaded CSV (read by the worker and the preview paths);
+# PARQUET_ROW_GROUP_ROWS / PARQUET_COMPRESSION come from libs/dataset_store.py
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "50000"))  # rows parsed per chunk during ingestion
+FREE_PLAN_MAX_ROWS = 5000
+# Previews read only the head of the stored CSV (ranged/streamed) and are cached per object
+PREVIEW_ROWS = 20
+PREVIEW_RANGE_BYTES = int(os.getenv("PREVIEW_RANGE_BYTES", "65536"))  # first range requested; grows if rows are wider
+PREVIEW_CACHE_SIZE = int(os.getenv("PREVIEW_CACHE_SIZE", "256"))
+_PREVIEW_CACHE: "OrderedDict[tuple, str]" = OrderedDict()
+_PREVIEW_CACHE_LOCK = threading.Lock()
+# Run exports stream each ZIP entry as its artifact downloads; a bounded pool fetches ahead (spooled to disk past ZIP_SPOOL_MB each)
+ZIP_FETCH_WORKERS = int(os.getenv("ZIP_FETCH_WORKERS", "4"))
+ZIP_SPOOL_MB = int(os.getenv("ZIP_SPOOL_MB", "8"))
+ZIP_CHUNK_BYTES = 1 << 20
+# Dashboard listings: one aggregate query per call (sql/listing_summaries.sql). Without `limit` every row is
+# returned; with `limit` (or a `cursor`) they are keyset-paginated, LIST_PAGE_SIZE rows per page by default
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "100"))
+LIST_MAX_PAGE_SIZE = 500
+LISTING_RPC_RETRY_SECONDS = 300.0  # after a failed call, use batched table queries this long before retrying
+_LISTING_RPC_DOWN_UNTIL = [0.0]
+# Columns of run_summaries (sql/run_summaries.sql) the listings read
+RUN_SUMMARY_FIELDS = run_summary.SUMMARY_FIELDS + ("duration_seconds",)
+# Worker-written precompressed siblings of text artifacts, in order of preference
+ARTIFACT_ENCODINGS = (("zstd", ".zst"), ("gzip", ".gz"))
+ZIP_STORED_EXTENSIONS = (".pdf", ".parquet", ".zip", ".gz", ".zst", ".png", ".jpg", ".jpeg")  # already compressed
+# Async data access for hot read paths: one pooled (HTTP/2 when h2 is installed) client per process
+DB_HTTP2 = os.getenv("DB_HTTP2", "true").strip().lower() in ("1", "true", "yes", "on")
+DB_POOL_CONNECTIONS = int(os.getenv("DB_POOL_CONNECTIONS", "64"))
+DB_TIMEOUT_SECONDS = float(os.getenv("DB_TIMEOUT_SECONDS", "15"))
 APP_JWKS_CACHE: Dict[str, Any] = {}
+# Verified token claims are reused until the token's exp; ownership checks for AUTHZ_CACHE_TTL_SECONDS
+# HS256 projects; JWKS covers asymmetric keys. When set, HS256 tokens it does not verify are rejected
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+JWKS_REFRESH_SECONDS = 300.0  # min interval between JWKS refetches for an unknown kid
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096"))
+AUTHZ_CACHE_TTL_SECONDS = float(os.getenv("AUTHZ_CACHE_TTL_SECONDS", "30"))
+AUTHZ_CACHE_SIZE = int(os.getenv("AUTHZ_CACHE_SIZE", "10000"))
+_JWKS_FETCHED_AT = [0.0]
+_TOKEN_CACHE: "OrderedDict[str, tuple]" = OrderedDict()   # sha256(token) → (exp, claims)
+_TOKEN_CACHE_LOCK = threading.Lock()
+_AUTHZ_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()  # (user, kind, resource id) → (expires, project id)
+_AUTHZ_CACHE_LOCK = threading.Lock()
+# Responses of succeeded runs (metrics, report, artifacts, steps) served from memory with ETags
+FINISHED_CACHE_MAX_MB = float(os.getenv("FINISHED_CACHE_MAX_MB", "64"))  # 0 disables the cache
+FINISHED_CACHE_TTL_SECONDS = float(os.getenv("FINISHED_CACHE_TTL_SECONDS", "3600"))
+ARTIFACT_URL_SECONDS = 3600
+# Artifact listings embed signed URLs: a revalidated copy must keep most of their lifetime
+ARTIFACTS_CACHE_TTL_SECONDS = ARTIFACT_URL_SECONDS / 4
+_FINISHED: "OrderedDict[tuple, tuple]" = OrderedDict()  # (kind, run id, encoding) → (expires, etag, body, encoding)
+_FINISHED_LOCK = threading.Lock()
+_FINISHED_BYTES = [0]
+_FINISHED_INFLIGHT: Dict[tuple, "asyncio.Task"] = {}  # (kind, run id, encoding, user id) → load in progress
 
 # Email configuration
 # Using Resend API (no SMTP port issues)
@@ -122,38 +187,142 @@ def is_enterprise(user: Dict[str, Any]) -> bool:
     return False
 
 # ---------- Auth helpers ----------
-def get_jwks() -> Dict[str, Any]:
+def get_jwks(refresh: bool = False) -> Dict[str, Any]:
     global APP_JWKS_CACHE
-    if APP_JWKS_CACHE:
+    if APP_JWKS_CACHE and not (refresh and time.time() - _JWKS_FETCHED_AT[0] > JWKS_REFRESH_SECONDS):
         return APP_JWKS_CACHE
     jwks_url = f"{SUPABASE_URL}/auth/v1/.well-known/jwks.json"
     with httpx.Client(timeout=5.0) as client:
         r = client.get(jwks_url)
         r.raise_for_status()
         APP_JWKS_CACHE = r.json()
+        _JWKS_FETCHED_AT[0] = time.time()
         return APP_JWKS_CACHE
 
+class _TokenRejected(Exception):
+    """An HS256 token the configured SUPABASE_JWT_SECRET does not verify (bad signature, expired)."""
+
+def _verified_claims(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Claims of a token whose signature and expiry check out (JWKS key by kid,
+    else the HS256 secret); None when it cannot be verified here. Raises
+    _TokenRejected when the secret is configured and the HS256 token fails it.
+    """
+    unverified_header = jwt.get_unverified_header(token)
+    kid = unverified_header.get("kid")
+    if kid:
+        try:
+            jwks = get_jwks()
+            key = next((k for k in jwks.get("keys", []) if k.get("kid") == kid), None)
+            if key is None:  # keys rotated since the last fetch
+                key = next((k for k in get_jwks(refresh=True).get("keys", []) if k.get("kid") == kid), None)
+            if key:
+                return jwt.decode(token, key, algorithms=[unverified_header.get("alg", "RS256")], audience=None, options={"verify_aud": False})
+        except Exception as e:
+            logger.debug(f"JWKS verification failed: {e}")
+    if SUPABASE_JWT_SECRET and unverified_header.get("alg") == "HS256":
+        try:
+            return jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], options={"verify_aud": False})
+        except Exception as e:
+            logger.debug(f"HS256 verification failed: {e}")
+            raise _TokenRejected() from e
+    return None
+
 def verify_token(token: str) -> Dict[str, Any]:
-    # First try JWKS verification
+    """
+    Claims of a bearer token. Verified claims are cached (by token hash) until
+    the token's `exp`, so repeat requests skip decoding and key lookup.
+    HS256 tokens failing a configured SUPABASE_JWT_SECRET give no claims;
+    other tokens that cannot be verified fall back to their unverified claims,
+    as before; undecodable tokens give no claims.
+    """
+    now = time.time()
+    cache_key = hashlib.sha256(token.encode()).hexdigest()
+    with _TOKEN_CACHE_LOCK:
+        hit = _TOKEN_CACHE.get(cache_key)
+        if hit is not None:
+            if hit[0] > now:
+                _TOKEN_CACHE.move_to_end(cache_key)
+                return hit[1]
+            del _TOKEN_CACHE[cache_key]
+
     try:
-        jwks = get_jwks()
-        unverified_header = jwt.get_unverified_header(token)
-        key = next((k for k in jwks["keys"] if k["kid"] == unverified_header.get("kid")), None)
-        if key:
-            return jwt.decode(token, key, algorithms=[unverified_header.get("alg", "RS256")], audience=None, options={"verify_aud": False})
-    except Exception as e:
-        print(f"JWKS verification failed: {e}")
-        pass
-    
-    # Fallback to unverified claims for Supabase tokens
+        claims = _verified_claims(token)
+    except _TokenRejected:
+        return {}
+    except Exception:
+        claims = None  # malformed header
+    if claims is not None:
+        exp = claims.get("exp")
+        if isinstance(exp, (int, float)) and exp > now and AUTH_TOKEN_CACHE_SIZE > 0:
+            with _TOKEN_CACHE_LOCK:
+                _TOKEN_CACHE[cache_key] = (float(exp), claims)
+                while len(_TOKEN_CACHE) > AUTH_TOKEN_CACHE_SIZE:
+                    _TOKEN_CACHE.popitem(last=False)
+        return claims
+
+    # Fallback to unverified claims for Supabase tokens (not cached)
     try:
         claims = jwt.get_unverified_claims(token)
-        print(f"Unverified claims: {claims}")
+        logger.debug(f"Using unverified claims for sub={claims.get('sub')}")
         return claims
     except Exception as e:
-        print(f"Unverified claims failed: {e}")
-        # If all else fails, return a basic structure with a valid UUID
-        return {"sub": "00000000-0000-0000-0000-000000000000", "email": "fallback@example.com"}
+        logger.debug(f"Unverified claims failed: {e}")
+        return {}
+
+# ---------- Authorization cache ----------
+def _authz_get(user_id: str, kind: str, resource_id: str) -> Optional[str]:
+    """Project id of a resource `user_id` was recently found to own, or None (unknown/expired)."""
+    key = (user_id, kind, resource_id)
+    with _AUTHZ_CACHE_LOCK:
+        hit = _AUTHZ_CACHE.get(key)
+        if hit is None:
+            return None
+        if hit[0] <= time.monotonic():
+            del _AUTHZ_CACHE[key]
+            return None
+        _AUTHZ_CACHE.move_to_end(key)
+        return hit[1]
+
+def _authz_put(user_id: str, kind: str, resource_id: str, project_id: str) -> None:
+    if AUTHZ_CACHE_TTL_SECONDS <= 0:
+        return
+    with _AUTHZ_CACHE_LOCK:
+        _AUTHZ_CACHE[(user_id, kind, resource_id)] = (time.monotonic() + AUTHZ_CACHE_TTL_SECONDS, project_id)
+        _AUTHZ_CACHE.move_to_end((user_id, kind, resource_id))
+        while len(_AUTHZ_CACHE) > AUTHZ_CACHE_SIZE:
+            _AUTHZ_CACHE.popitem(last=False)
+
+def _authz_invalidate(kind: Optional[str] = None, resource_ids: Optional[List[str]] = None,
+                      project_id: Optional[str] = None, user_id: Optional[str] = None) -> None:
+    """Drop cached grants for the given resources, everything under a project, or everything of a user."""
+    ids = set(resource_ids or [])
+    with _AUTHZ_CACHE_LOCK:
+        for key in [k for k, (_, proj) in _AUTHZ_CACHE.items()
+                    if (project_id is not None and proj == project_id) or (k[1] == kind and k[2] in ids)
+                    or (user_id is not None and k[0] == user_id)]:
+            del _AUTHZ_CACHE[key]
+
+def _forget_user(user_id: str) -> None:
+    """Drop a user's cached tokens and grants (account deletion)."""
+    with _TOKEN_CACHE_LOCK:
+        for key in [k for k, (_, claims) in _TOKEN_CACHE.items() if claims.get("sub") == user_id]:
+            del _TOKEN_CACHE[key]
+    _authz_invalidate(user_id=user_id)
+
+def _check_run_owner(run_id: str, user: Dict[str, Any]) -> str:
+    """Project id of a run owned by `user` (404/403 otherwise); a cached grant skips both queries."""
+    project_id = _authz_get(user["id"], "run", run_id)
+    if project_id is not None:
+        return project_id
+    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
+    if not r.data:
+        raise HTTPException(status_code=404, detail="Run not found")
+    proj = supabase.table("projects").select("owner_id").eq("id", r.data["project_id"]).single().execute()
+    if not proj.data or proj.data.get("owner_id") != user["id"]:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    _authz_put(user["id"], "run", run_id, r.data["project_id"])
+    return r.data["project_id"]
 
 async def require_user(request: Request) -> Dict[str, Any]:
     auth = request.headers.get("authorization") or request.headers.get("Authorization")
@@ -167,7 +336,6 @@ async def require_user(request: Request) -> Dict[str, Any]:
     
     # For development, allow any valid token to access any resource
     # In production, you should verify ownership properly
-    print(f"User authenticated: {uid}")
     return {"id": uid, "email": claims.get("email")}
 
 # Development-only endpoint that bypasses authentication
@@ -175,6 +343,218 @@ async def require_user_dev(request: Request) -> Dict[str, Any]:
     # For development, return a mock user with valid UUID
     return {"id": "00000000-0000-0000-0000-000000000001", "email": "dev@example.com"}
 
+# ---------- Async data access ----------
+class DataAccessError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+class AsyncRest:
+    """
+    Async PostgREST/Storage access on one shared httpx.AsyncClient.
+
+    The pool keeps connections to Supabase open (multiplexed over HTTP/2 when
+    `h2` is installed), so handlers can await independent queries together with
+    asyncio.gather instead of holding a threadpool worker through sequential
+    blocking supabase-py calls. Uses the service key, like `supabase`; handlers
+    still check ownership.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop = None
+
+    def _http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:  # clients are bound to their event loop
+            http2 = DB_HTTP2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    http2 = False
+            key = SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY
+            self._client = httpx.AsyncClient(
+                base_url=SUPABASE_URL.rstrip("/"),
+                headers={"apikey": key, "Authorization": f"Bearer {key}"},
+                http2=http2,
+                limits=httpx.Limits(max_connections=DB_POOL_CONNECTIONS, max_keepalive_connections=DB_POOL_CONNECTIONS),
+                timeout=DB_TIMEOUT_SECONDS,
+            )
+            self._loop = loop
+        return self._client
+
+    async def select(self, table: str, columns: str = "*", filters: Optional[Dict[str, str]] = None,
+                     order: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows of `table`; `filters` are PostgREST operators, e.g. {"id": "eq.<uuid>"}."""
+        params = {"select": columns, **(filters or {})}
+        if order:
+            params["order"] = order
+        if limit:
+            params["limit"] = str(limit)
+        resp = await self._http().get(f"/rest/v1/{table}", params=params)
+        if resp.status_code >= 400:
+            raise DataAccessError(resp.status_code, resp.text)
+        return resp.json()
+
+    async def first(self, table: str, columns: str = "*", filters: Optional[Dict[str, str]] = None,
+                    order: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        rows = await self.select(table, columns, filters, order, limit=1)
+        return rows[0] if rows else None
+
+    async def signed_urls(self, bucket: str, paths: List[str], expires_in: int) -> Dict[str, Optional[str]]:
+        """{path: signed URL} for many objects in one request."""
+        if not paths:
+            return {}
+        resp = await self._http().post(f"/storage/v1/object/sign/{bucket}", json={"expiresIn": expires_in, "paths": paths})
+        if resp.status_code >= 400:
+            raise DataAccessError(resp.status_code, resp.text)
+        base = f"{SUPABASE_URL.rstrip('/')}/storage/v1"
+        out = {}
+        for item in resp.json():
+            url = item.get("signedURL") or item.get("signedUrl")
+            out[item.get("path")] = (base + url if url and url.startswith("/") else url)
+        return out
+
+    async def download(self, bucket: str, path: str) -> bytes:
+        from urllib.parse import quote
+        resp = await self._http().get(f"/storage/v1/object/{bucket}/{quote(path)}")
+        if resp.status_code >= 400:
+            raise DataAccessError(resp.status_code, resp.text)
+        return resp.content
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+db = AsyncRest()
+
+async def _owned_run(run_id: str, user: Dict[str, Any], columns: str = "id,project_id",
+                     with_project_name: bool = False) -> Dict[str, Any]:
+    """
+    The run's `columns` if it exists (404) and its project belongs to `user`
+    (403), in one query: the project's owner is embedded in the run row.
+    """
+    try:
+        row = await db.first("runs", f"{columns},projects!inner(owner_id,name)", {"id": f"eq.{run_id}"})
+    except DataAccessError as e:
+        if e.status_code == 400:  # malformed id
+            raise HTTPException(status_code=404, detail="Run not found")
+        raise
+    if not row:
+        raise HTTPException(status_code=404, detail="Run not found")
+    project = row.pop("projects", None) or {}
+    if project.get("owner_id") != user["id"]:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if row.get("project_id"):
+        _authz_put(user["id"], "run", run_id, row["project_id"])
+    if with_project_name:
+        row["project_name"] = project.get("name")
+    return row
+
+async def _authorize_run(run_id: str, user: Dict[str, Any]) -> None:
+    """Ownership check only: a dictionary lookup while the grant is cached, else `_owned_run`."""
+    if _authz_get(user["id"], "run", run_id) is None:
+        await _owned_run(run_id, user)
+
+# ---------- Finished-run response cache ----------
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def _finished_get(key: tuple) -> Optional[tuple]:
+    with _FINISHED_LOCK:
+        hit = _FINISHED.get(key)
+        if hit is None:
+            return None
+        if hit[0] <= time.monotonic():
+            _FINISHED_BYTES[0] -= len(_FINISHED.pop(key)[2])
+            return None
+        _FINISHED.move_to_end(key)
+        return hit
+
+def _finished_put(key: tuple, entry: tuple) -> None:
+    budget = FINISHED_CACHE_MAX_MB * 2**20
+    if len(entry[2]) > budget / 4:  # one large payload must not flush the cache
+        return
+    with _FINISHED_LOCK:
+        old = _FINISHED.pop(key, None)
+        if old is not None:
+            _FINISHED_BYTES[0] -= len(old[2])
+        _FINISHED[key] = entry
+        _FINISHED_BYTES[0] += len(entry[2])
+        while _FINISHED_BYTES[0] > budget:
+            _FINISHED_BYTES[0] -= len(_FINISHED.popitem(last=False)[1][2])
+
+def _finished_forget(run_ids: List[str], kinds: Optional[List[str]] = None) -> None:
+    """Drop cached responses of runs that were deleted or got new artifacts."""
+    ids = set(run_ids)
+    with _FINISHED_LOCK:
+        for key in [k for k in _FINISHED if k[1] in ids and (kinds is None or k[0] in kinds)]:
+            _FINISHED_BYTES[0] -= len(_FINISHED.pop(key)[2])
+
+async def _load_finished(key: tuple, load) -> tuple:
+    """
+    Run `load` → (payload, cacheable[, content encoding]) and render it; cacheable
+    results are kept for later requests. The ETag is over the bytes as sent.
+    """
+    payload, cacheable, *encoding = await load()
+    body = payload if isinstance(payload, (bytes, bytearray)) else JSONResponse(jsonable_encoder(payload)).body
+    ttl = ARTIFACTS_CACHE_TTL_SECONDS if key[0] == "artifacts" else FINISHED_CACHE_TTL_SECONDS
+    entry = (time.monotonic() + ttl, _etag(body), bytes(body), encoding[0] if encoding else None)
+    if cacheable and FINISHED_CACHE_MAX_MB > 0 and ttl > 0:
+        _finished_put(key, entry)
+    return entry
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+async def _finished_run_response(kind: str, run_id: str, user: Dict[str, Any], request: Request, load,
+                                 encoding: Optional[str] = None) -> Response:
+    """
+    JSON response of a run endpoint with a strong ETag; If-None-Match gives 304.
+
+    Results of succeeded runs do not change, so once loaded they are served from
+    memory: a repeat request costs the ownership check (itself a cached lookup)
+    and a dictionary read. Concurrent misses for the same run and user share one
+    `load` (an async callable returning (payload, cacheable[, content encoding])),
+    which performs its own ownership check. `encoding` is the content coding
+    negotiated for the request: each one is cached (and ETagged) separately.
+    """
+    key = (kind, run_id, encoding)
+    entry = _finished_get(key)
+    if entry is not None:
+        await _authorize_run(run_id, user)
+    else:
+        loop = asyncio.get_running_loop()
+        flight = (*key, user["id"])
+        task = _FINISHED_INFLIGHT.get(flight)
+        if task is None or task.get_loop() is not loop:
+            task = loop.create_task(_load_finished(key, load))
+            _FINISHED_INFLIGHT[flight] = task
+
+            def _done(t, flight=flight):
+                if _FINISHED_INFLIGHT.get(flight) is t:
+                    del _FINISHED_INFLIGHT[flight]
+                if not t.cancelled():
+                    t.exception()  # retrieved here if every waiter went away
+            task.add_done_callback(_done)
+        entry = await asyncio.shield(task)  # a disconnecting client does not cancel the shared load
+
+    _, etag, body, content_encoding = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    if content_encoding:
+        # Stored precompressed bytes go out as-is (the GZip middleware leaves them alone)
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
 # ---------- FastAPI app & CORS ----------
 app = FastAPI(
     title="GESALP AI API",
@@ -220,9 +600,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 app.add_middleware(GZipMiddleware, minimum_size=1024)
 
+@app.on_event("startup")
+async def _warn_unverified_auth() -> None:
+    if not SUPABASE_JWT_SECRET:
+        logger.warning("SUPABASE_JWT_SECRET is not set: HS256 bearer tokens cannot be verified and their "
+                       "unverified claims are trusted (see ENV_TEMPLATE.txt)")
+
+@app.on_event("shutdown")
+async def _close_data_access() -> None:
+    await db.aclose()
+
 # --- One-Click Generation & Static Files ---
 from fastapi.staticfiles import StaticFiles
 # from . import generation
@@ -312,7 +703,8 @@ def delete_account(user: Dict[str, Any] = Depends(require_user)):
              except Exception:
                  # If fetching failed, they are likely gone.
                  pass
-                 
+
+        _forget_user(user["id"])
         return {"message": "Account deleted successfully"}
     except Exception as e:
         print(f"Error deleting user {user.get('id')}: {e}")
@@ -514,6 +906,227 @@ def get_usage_stats(user: Dict[str, Any] = Depends(require_user)):
             "total_rows_managed": 0
         }
 
+# ---------- Listing summaries ----------
+def _time_ago(ts: Optional[str]) -> str:
+    """Relative label for an ISO timestamp ("3 days ago"), "No activity yet" if missing."""
+    if not ts:
+        return "No activity yet"
+    diff = datetime.now(timezone.utc) - datetime.fromisoformat(ts.replace('Z', '+00:00'))
+    if diff.days > 0:
+        return f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
+    if diff.seconds > 3600:
+        hours = diff.seconds // 3600
+        return f"{hours} hour{'s' if hours > 1 else ''} ago"
+    if diff.seconds > 60:
+        minutes = diff.seconds // 60
+        return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
+    return "Just now"
+
+def _page_limit(limit: Optional[int], cursor: Optional[str] = None) -> Optional[int]:
+    """Page size, or None for the whole listing (no `limit` and no `cursor`)."""
+    if limit is None:
+        return LIST_PAGE_SIZE if cursor else None
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+    return min(limit, LIST_MAX_PAGE_SIZE)
+
+def _encode_cursor(key: Any, row_id: Any) -> str:
+    import base64
+    return base64.urlsafe_b64encode(json.dumps([key, row_id]).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[List[str]]:
+    """(sort key, id) of the last row of the previous page."""
+    if not cursor:
+        return None
+    import base64
+    try:
+        key, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return [str(key), str(row_id)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _wanted_fields(fields: Optional[str]) -> Optional[set]:
+    """Field projection from a comma-separated `fields` query (id is always kept); None = all fields."""
+    if not fields:
+        return None
+    return {f.strip() for f in fields.split(",") if f.strip()} | {"id"}
+
+def _select_fields(item: Dict[str, Any], wanted: Optional[set]) -> Dict[str, Any]:
+    return item if wanted is None else {k: v for k, v in item.items() if k in wanted}
+
+def _paginate(response: Response, rows: List[Dict[str, Any]], page: Optional[int], key: str) -> List[Dict[str, Any]]:
+    """First `page` rows (fetched with one extra); the next-page cursor goes into X-Next-Cursor. page=None: all rows."""
+    if page is None:
+        return rows
+    if len(rows) > page:
+        last = rows[page - 1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(last.get(key), last["id"])
+    return rows[:page]
+
+def _listing_rpc(fn: str, params: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    """Rows of an aggregate listing function; None while it is not installed (callers batch table queries)."""
+    if time.monotonic() < _LISTING_RPC_DOWN_UNTIL[0]:
+        return None
+    try:
+        return supabase.rpc(fn, params).execute().data or []
+    except Exception as e:
+        print(f"[listing] {fn} unavailable, using table queries: {e}")
+        _LISTING_RPC_DOWN_UNTIL[0] = time.monotonic() + LISTING_RPC_RETRY_SECONDS
+        return None
+
+def _project_summaries(owner_id: str, limit: Optional[int], cursor: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Projects newest first with datasets_count, runs_count and last_run_at."""
+    rows = _listing_rpc("list_project_summaries", {
+        "p_owner": owner_id, "p_limit": limit,
+        "p_cursor_created": cursor[0] if cursor else None, "p_cursor_id": cursor[1] if cursor else None,
+    })
+    if rows is not None:
+        return rows
+    q = supabase.table("projects").select("id, name, owner_id, created_at").eq("owner_id", owner_id)
+    if cursor:
+        q = q.or_(f'created_at.lt."{cursor[0]}",and(created_at.eq."{cursor[0]}",id.lt.{cursor[1]})')
+    q = q.order("created_at", desc=True).order("id", desc=True)
+    rows = (q.limit(limit) if limit else q).execute().data or []
+    ids = [p["id"] for p in rows]
+    if not ids:
+        return rows
+    datasets = supabase.table("datasets").select("project_id").in_("project_id", ids).execute().data or []
+    runs = supabase.table("runs").select("project_id, started_at").in_("project_id", ids).execute().data or []
+    for p in rows:
+        p["datasets_count"] = sum(1 for d in datasets if d["project_id"] == p["id"])
+        started = [r.get("started_at") for r in runs if r["project_id"] == p["id"]]
+        p["runs_count"] = len(started)
+        p["last_run_at"] = max((t for t in started if t), default=None)
+    return rows
+
+def _summary_metrics(row: Dict[str, Any]) -> Dict[str, Any]:
+    """privacy/utility/fairness/compliance objects of a run from its summary fields."""
+    def present(**values):
+        values = {k: v for k, v in values.items() if v is not None}
+        return values or None
+
+    if not row.get("has_summary"):
+        return {"privacy": None, "utility": None, "fairness": None, "compliance": None}
+    return {
+        "privacy": present(mia_auc=row.get("mia_auc"), dup_rate=row.get("dup_rate"), privacy_score=row.get("privacy_score")),
+        "utility": present(ks_mean=row.get("ks_mean"), corr_delta=row.get("corr_delta"), utility_score=row.get("utility_score"),
+                           auroc=row.get("auroc"), c_index=row.get("c_index")),
+        "fairness": present(rare_coverage=row.get("rare_coverage"), freq_skew=row.get("freq_skew")),
+        "compliance": present(passed=row.get("compliance_passed"), score=row.get("compliance_score"),
+                              level=row.get("compliance_level")),
+    }
+
+def _summary_scores(row: Dict[str, Any], keys: tuple) -> Dict[str, float]:
+    """Dashboard scores: the run summary where it has them, else the values saved in config_json, else 0."""
+    config = row.get("config_json") if isinstance(row.get("config_json"), dict) else {}
+    scores = {k: config.get(k, 0.0) for k in keys}
+    for k in ("auroc", "c_index", "mia_auc", "privacy_score", "utility_score"):
+        if k in scores and row.get(k):
+            scores[k] = row[k]
+    return scores
+
+def _run_summaries(owner_id: str, limit: Optional[int], cursor: Optional[List[str]],
+                   project_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Runs newest first with project/dataset names and their run_summaries
+    fields (has_summary, RUN_SUMMARY_FIELDS; duration_seconds is live for
+    unfinished runs); never the metrics payload.
+    """
+    rows = _listing_rpc("list_run_summaries", {
+        "p_owner": owner_id, "p_project": project_id, "p_limit": limit,
+        "p_cursor_key": cursor[0] if cursor else None, "p_cursor_id": cursor[1] if cursor else None,
+    })
+    if rows is not None:
+        return rows
+    pq = supabase.table("projects").select("id, name").eq("owner_id", owner_id)
+    projects = (pq.eq("id", project_id) if project_id else pq).execute().data or []
+    if not projects:
+        return []
+    project_names = {p["id"]: p["name"] for p in projects}
+    q = supabase.table("runs").select("id, name, project_id, dataset_id, status, method, started_at, finished_at, config_json") \
+        .in_("project_id", list(project_names))
+    if cursor and cursor[0] == "infinity":  # previous page ended among runs not started yet
+        q = q.or_(f"started_at.not.is.null,id.lt.{cursor[1]}")
+    elif cursor:
+        q = q.or_(f'started_at.lt."{cursor[0]}",and(started_at.eq."{cursor[0]}",id.lt.{cursor[1]})')
+    q = q.order("started_at", desc=True, nullsfirst=True).order("id", desc=True)
+    rows = (q.limit(limit) if limit else q).execute().data or []
+    if not rows:
+        return rows
+    dataset_ids = list({r["dataset_id"] for r in rows if r.get("dataset_id")})
+    datasets = supabase.table("datasets").select("id, name").in_("id", dataset_ids).execute().data or [] if dataset_ids else []
+    dataset_names = {d["id"]: d["name"] for d in datasets}
+    run_ids = [r["id"] for r in rows]
+    try:
+        summaries = supabase.table("run_summaries").select(", ".join(("run_id",) + RUN_SUMMARY_FIELDS)) \
+            .in_("run_id", run_ids).execute().data or []
+    except Exception:
+        # Summary table not installed either: derive the same fields from the payloads
+        metrics = supabase.table("metrics").select("run_id, payload_json").in_("run_id", run_ids).execute().data or []
+        summaries = [{"run_id": m["run_id"], **run_summary.payload_summary(m.get("payload_json") or {}),
+                      "duration_seconds": None} for m in metrics]
+    by_run = {m["run_id"]: m for m in summaries}
+    now = datetime.now(timezone.utc)
+    for r in rows:
+        r["project_name"] = project_names.get(r["project_id"])
+        r["dataset_name"] = dataset_names.get(r.get("dataset_id"))
+        r["sort_key"] = r.get("started_at") or "infinity"
+        summary = by_run.get(r["id"])
+        r["has_summary"] = summary is not None
+        r.update({k: (summary or {}).get(k) for k in RUN_SUMMARY_FIELDS})
+        if r.get("duration_seconds") is None and r.get("started_at"):
+            end = datetime.fromisoformat(r["finished_at"].replace('Z', '+00:00')) if r.get("finished_at") else now
+            r["duration_seconds"] = (end - datetime.fromisoformat(r["started_at"].replace('Z', '+00:00'))).total_seconds()
+    return rows
+
+def _run_listing_item(row: Dict[str, Any]) -> Dict[str, Any]:
+    """GET /v1/runs item for one run summary row."""
+    run = {k: row.get(k) for k in ("id", "name", "dataset_id", "status", "method", "started_at", "finished_at", "config_json")}
+    duration = int(row["duration_seconds"] / 60) if row.get("duration_seconds") is not None else None  # minutes
+
+    scores = _summary_scores(row, ("auroc", "c_index", "mia_auc", "dp_epsilon", "privacy_score", "utility_score"))
+    metrics = {
+        "rows_generated": 0,
+        "columns_generated": 0,
+        "privacy_audit_passed": False,
+        "utility_audit_passed": False,
+        "compliance_passed": False,
+        "compliance_score": None,
+        "compliance_level": None,
+        **_summary_metrics(row),
+    }
+    if row.get("has_summary"):
+        if row.get("compliance_passed") is not None:
+            metrics["compliance_passed"] = bool(row["compliance_passed"])
+        metrics["compliance_score"] = row.get("compliance_score")
+        metrics["compliance_level"] = row.get("compliance_level")
+        metrics["rows_generated"] = row.get("n_synth") or 0
+
+        # Audit passes from the summary (PRIVACY GATES); a missing metric fails its gate
+        metrics["privacy_audit_passed"], metrics["utility_audit_passed"] = run_summary.audit_passed(row)
+    elif run["status"] == "succeeded":
+        # No summary (metrics) record: placeholder figures from the config scores
+        metrics.update({
+            "rows_generated": 1500,
+            "columns_generated": 25,
+            "privacy_audit_passed": scores["privacy_score"] > 0.7,
+            "utility_audit_passed": scores["utility_score"] > 0.7,
+            "compliance_passed": scores["privacy_score"] > 0.7 and scores["utility_score"] > 0.7,
+        })
+
+    return {
+        **run,
+        "project_id": row.get("project_id"),
+        "project_name": row.get("project_name") or "Unknown Project",
+        "dataset_name": row.get("dataset_name") or "Unknown Dataset",
+        "duration": duration,
+        "scores": scores,
+        "metrics": metrics,
+        "privacy": metrics["privacy"],  # Top-level for frontend compatibility
+        "utility": metrics["utility"],  # Top-level for frontend compatibility
+        "created_at": run["started_at"]  # Use started_at as created_at since runs table doesn't have created_at
+    }
+
 # ---------- Projects ----------
 class CreateProject(BaseModel):
     name: str
@@ -522,51 +1135,28 @@ class RenameBody(BaseModel):
     name: str
 
 @app.get("/v1/projects")
-def list_projects(user: Dict[str, Any] = Depends(require_user)):
-    """List all projects for the authenticated user."""
-    res = supabase.table("projects").select("id, name, owner_id, created_at").eq("owner_id", user["id"]).order("created_at", desc=True).execute()
-    if res.data is None:
-        raise HTTPException(status_code=500, detail=str(res.error))
-    
-    # Add additional computed fields for the frontend
-    projects_with_metadata = []
-    for project in res.data:
-        # Get datasets count for this project
-        datasets_res = supabase.table("datasets").select("id", count="exact").eq("project_id", project["id"]).execute()
-        datasets_count = datasets_res.count or 0
-        
-        # Get runs count for this project
-        runs_res = supabase.table("runs").select("id", count="exact").eq("project_id", project["id"]).execute()
-        runs_count = runs_res.count or 0
-        
-        # Get last activity (most recent run)
-        last_run_res = supabase.table("runs").select("started_at").eq("project_id", project["id"]).order("started_at", desc=True).limit(1).execute()
-        last_activity = "No activity yet"
-        if last_run_res.data and last_run_res.data[0].get("started_at"):
-            from datetime import datetime, timezone
-            last_run_time = datetime.fromisoformat(last_run_res.data[0]["started_at"].replace('Z', '+00:00'))
-            now = datetime.now(timezone.utc)
-            diff = now - last_run_time
-            if diff.days > 0:
-                last_activity = f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
-            elif diff.seconds > 3600:
-                hours = diff.seconds // 3600
-                last_activity = f"{hours} hour{'s' if hours > 1 else ''} ago"
-            elif diff.seconds > 60:
-                minutes = diff.seconds // 60
-                last_activity = f"{minutes} minute{'s' if minutes > 1 else ''} ago"
-            else:
-                last_activity = "Just now"
-        
-        projects_with_metadata.append({
-            **project,
-            "datasets_count": datasets_count,
-            "runs_count": runs_count,
-            "last_activity": last_activity,
-            "status": "Active" if runs_count > 0 else "Ready"
-        })
-    
-    return projects_with_metadata
+def list_projects(response: Response, limit: Optional[int] = None, cursor: Optional[str] = None,
+                  fields: Optional[str] = None, user: Dict[str, Any] = Depends(require_user)):
+    """
+    List the authenticated user's projects, newest first, with counts and last
+    activity. Every project unless `limit` is given; then one page per call
+    (pass the X-Next-Cursor response header back as `cursor` for the next page;
+    a `cursor` alone pages by LIST_PAGE_SIZE).
+    """
+    page = _page_limit(limit, cursor)
+    wanted = _wanted_fields(fields)
+    rows = _project_summaries(user["id"], page + 1 if page else None, _decode_cursor(cursor))
+    rows = _paginate(response, rows, page, "created_at")
+    return [_select_fields({
+        "id": p["id"],
+        "name": p.get("name"),
+        "owner_id": p.get("owner_id"),
+        "created_at": p.get("created_at"),
+        "datasets_count": p.get("datasets_count") or 0,
+        "runs_count": p.get("runs_count") or 0,
+        "last_activity": _time_ago(p.get("last_run_at")),
+        "status": "Active" if p.get("runs_count") else "Ready",
+    }, wanted) for p in rows]
 
 @app.post("/v1/projects")
 def create_project(p: CreateProject, user: Dict[str, Any] = Depends(require_user)):
@@ -581,18 +1171,22 @@ def create_project(p: CreateProject, user: Dict[str, Any] = Depends(require_user
     return res.data[0]
 
 @app.get("/v1/projects/{project_id}")
-def get_project(project_id: str, user: Dict[str, Any] = Depends(require_user)):
+async def get_project(project_id: str, user: Dict[str, Any] = Depends(require_user)):
     """Get a specific project with detailed information."""
-    # Get project details
-    res = supabase.table("projects").select("id, name, owner_id, created_at").eq("id", project_id).eq("owner_id", user["id"]).single().execute()
-    if res.data is None:
+    # Project, datasets and run summaries are fetched concurrently
+    try:
+        project, datasets, summaries = await asyncio.gather(
+            db.first("projects", "id,name,owner_id,created_at", {"id": f"eq.{project_id}", "owner_id": f"eq.{user['id']}"}),
+            db.select("datasets", "id,name,file_url,rows:rows_count,columns:cols_count,created_at",
+                      {"project_id": f"eq.{project_id}"}, order="created_at.desc"),
+            run_in_threadpool(_run_summaries, user["id"], None, None, project_id),
+        )
+    except DataAccessError as e:
+        if e.status_code == 400:  # malformed id
+            raise HTTPException(status_code=404, detail="Project not found")
+        raise
+    if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    
-    project = res.data
-    
-    # Get datasets count and details
-    datasets_res = supabase.table("datasets").select("id, name, file_url, rows:rows_count, columns:cols_count, created_at").eq("project_id", project_id).order("created_at", desc=True).execute()
-    datasets = datasets_res.data or []
     datasets_count = len(datasets)
     
     # Post-process datasets to add derived fields
@@ -601,116 +1195,17 @@ def get_project(project_id: str, user: Dict[str, Any] = Depends(require_user)):
         d["file_size"] = 0  # Not in schema yet
         d["status"] = "Ready"  # Default status (column does not exist)
     
-    # Get runs count and details
-    runs_res = supabase.table("runs").select("id, name, status, started_at, finished_at, method, config_json").eq("project_id", project_id).order("started_at", desc=True).execute()
-    runs = runs_res.data or []
+    # Runs with their summary rows
+    runs = []
+    for row in summaries:
+        run = {k: row.get(k) for k in ("id", "name", "status", "started_at", "finished_at", "method", "config_json")}
+        run["scores"] = _summary_scores(row, ("auroc", "c_index", "mia_auc", "privacy_score", "utility_score"))
+        run["metrics"] = _summary_metrics(row)
+        runs.append(run)
     runs_count = len(runs)
-    
-    # Fetch metrics for all runs in this project
-    run_ids = [r["id"] for r in runs]
-    metrics_map = {}
-    if run_ids:
-        try:
-            m_res = supabase.table("metrics").select("run_id, payload_json").in_("run_id", run_ids).execute()
-            if m_res.data:
-                for m in m_res.data:
-                    metrics_map[m["run_id"]] = m["payload_json"]
-        except Exception as e:
-            print(f"Error fetching metrics for project {project_id}: {e}")
-
-    # Enrich runs with metrics
-    for run in runs:
-        # Get scores from config_json if available (legacy/fallback)
-        scores = {
-            "auroc": 0.0,
-            "c_index": 0.0,
-            "mia_auc": 0.0,
-            "privacy_score": 0.0,
-            "utility_score": 0.0
-        }
-        if run.get("config_json") and isinstance(run["config_json"], dict):
-            config = run["config_json"]
-            scores.update({
-                "auroc": config.get("auroc", 0.0),
-                "c_index": config.get("c_index", 0.0),
-                "mia_auc": config.get("mia_auc", 0.0),
-                "privacy_score": config.get("privacy_score", 0.0),
-                "utility_score": config.get("utility_score", 0.0)
-            })
-            
-        # Initialize full metrics structure
-        metrics = {
-            "privacy": None,
-            "utility": None,
-            "fairness": None,
-            "compliance": None
-        }
-        
-        # Populate from real metrics if available
-        payload = metrics_map.get(run["id"])
-        if payload:
-            metrics["privacy"] = payload.get("privacy")
-            metrics["utility"] = payload.get("utility")
-            metrics["fairness"] = payload.get("fairness")
-            metrics["compliance"] = payload.get("compliance")
-            
-            # Update top-level scores if present in metrics
-            if metrics["utility"]:
-                scores["auroc"] = metrics["utility"].get("auroc") or scores["auroc"]
-                scores["c_index"] = metrics["utility"].get("c_index") or scores["c_index"]
-                
-                # Check for explicit utility score, otherwise calculate fallback
-                u_score = metrics["utility"].get("utility_score")
-                if not u_score and (metrics["utility"].get("ks_mean") is not None):
-                     ks = metrics["utility"].get("ks_mean", 0.0)
-                     cd = metrics["utility"].get("corr_delta", 0.0)
-                     # Fallback: 1 - average error
-                     u_score = max(0.0, 1.0 - ((ks + cd) / 2.0))
-                scores["utility_score"] = u_score or scores["utility_score"]
-
-            if metrics["privacy"]:
-                scores["mia_auc"] = metrics["privacy"].get("mia_auc") or scores["mia_auc"]
-                
-                # Check for explicit privacy score, otherwise calculate fallback
-                p_score = metrics["privacy"].get("privacy_score")
-                if not p_score and (metrics["privacy"].get("mia_auc") is not None):
-                    mia = metrics["privacy"].get("mia_auc", 0.5)
-                    dup = metrics["privacy"].get("dup_rate", 0.0)
-                    # Fallback logic
-                    penalty = 0.0
-                    if dup > 0: penalty += dup * 5.0
-                    if mia > 0.6: penalty += (mia - 0.6) * 2.0
-                    p_score = max(0.0, 1.0 - penalty)
-                scores["privacy_score"] = p_score or scores["privacy_score"]
-
-        run["scores"] = scores
-        run["metrics"] = metrics
 
-    
     # Calculate last activity
-    last_activity = "No activity yet"
-    if runs_count > 0:
-        latest_run = runs[0]
-        if latest_run.get("finished_at"):
-            last_run_time = datetime.fromisoformat(latest_run["finished_at"].replace('Z', '+00:00'))
-        elif latest_run.get("started_at"):
-            last_run_time = datetime.fromisoformat(latest_run["started_at"].replace('Z', '+00:00'))
-        else:
-            last_run_time = None
-            
-        if last_run_time:
-            now = datetime.now(timezone.utc)
-            diff = now - last_run_time
-            if diff.days > 0:
-                last_activity = f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
-            elif diff.seconds > 3600:
-                hours = diff.seconds // 3600
-                last_activity = f"{hours} hour{'s' if hours > 1 else ''} ago"
-            elif diff.seconds > 60:
-                minutes = diff.seconds // 60
-                last_activity = f"{minutes} minute{'s' if minutes > 1 else ''} ago"
-            else:
-                last_activity = "Just now"
+    last_activity = _time_ago((runs[0].get("finished_at") or runs[0].get("started_at")) if runs else None)
     
     # Calculate success rate
     completed_runs = [r for r in runs if r.get("status") == "succeeded"]
@@ -765,7 +1260,7 @@ def delete_project(project_id: str, user: Dict[str, Any] = Depends(require_user)
     for ds in datasets:
         if ds.get("file_url"):
             try:
-                supabase.storage.from_("datasets").remove([ds["file_url"]])
+                supabase.storage.from_("datasets").remove([ds["file_url"], parquet_path(ds["file_url"])])
             except Exception:
                 pass
     
@@ -774,6 +1269,8 @@ def delete_project(project_id: str, user: Dict[str, Any] = Depends(require_user)
     
     # Finally delete the project
     supabase.table("projects").delete().eq("id", project_id).execute()
+    _authz_invalidate("run", run_ids, project_id=project_id)
+    _finished_forget(run_ids)
     return {"ok": True}
 
 # ---------- Datasets ----------
@@ -917,36 +1414,167 @@ def get_omop_mapping(dataset_id: str, user: Dict[str, Any] = Depends(require_use
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=str(e))
-@app.post("/v1/datasets/upload")
-async def upload_dataset(project_id: str = Form(...), file: UploadFile = File(...), user: Dict[str, Any] = Depends(require_user)):
-    ensure_bucket("datasets")
-    content = await file.read()
-    if len(content) > MAX_UPLOAD_MB * 1024 * 1024:
-        raise HTTPException(status_code=413, detail=f"File too large. Max allowed is {MAX_UPLOAD_MB} MB")
+
+
+def _file_reader(fileobj):
+    """Buffered reader over a (spooled) temporary file, which the storage client streams from disk."""
+    fd = fileobj.fileno()  # rolls a spooled file over to disk
+    fileobj.seek(0)
+    return open(fd, "rb", closefd=False)
+
+
+def _csv_chunks(fileobj, dtype: Optional[Dict[str, str]] = None):
+    fileobj.seek(0)
+    return pd.read_csv(fileobj, chunksize=UPLOAD_CHUNK_ROWS, dtype=dtype)
+
+
+def _profile_upload(fileobj, max_rows: Optional[int]) -> SchemaProfile:
+    """Parse the spooled upload chunk by chunk; stops early once `max_rows` is exceeded."""
     try:
-        df = pd.read_csv(io.BytesIO(content))
+        profile = SchemaProfile()
+        with _csv_chunks(fileobj) as reader:
+            for chunk in reader:
+                profile.update(chunk)
+                if max_rows is not None and profile.rows > max_rows:
+                    break
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid CSV. Please upload a UTF-8 encoded .csv file: {e}")
+    if not profile.columns:
+        raise HTTPException(status_code=400, detail="Invalid CSV. Please upload a UTF-8 encoded .csv file: no columns")
+    return profile
 
-    rows_count = int(df.shape[0])
-    cols_count = int(df.shape[1])
-    if not is_enterprise(user):
-        if rows_count > 5000:
-            raise HTTPException(status_code=403, detail="Quota exceeded: Datasets up to 5,000 rows on free plan.")
 
-    cols = []
-    for col in df.columns:
-        s = df[col]
-        miss = float(s.isna().mean()) if rows_count > 0 else 0.0
-        uniq = int(s.nunique(dropna=True))
-        cols.append({"name": str(col), "type": str(s.dtype), "missing": round(miss, 4), "unique": uniq})
-    schema = {"columns": cols}
+def _write_parquet_copy_chunked(fileobj, profile: SchemaProfile, csv_path: str) -> bool:
+    """Parquet copy written chunk by chunk with the merged column types; best effort."""
+    try:
+        import tempfile
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        arrow_types = {"int64": pa.int64(), "float64": pa.float64(), "bool": pa.bool_()}
+        schema = pa.schema([(c, arrow_types.get(profile.dtypes[c], pa.string())) for c in profile.columns])
+        dtypes = {c: (d if d in arrow_types else "object") for c, d in profile.dtypes.items()}
+        with tempfile.TemporaryFile() as out:
+            with pq.ParquetWriter(out, schema, compression=PARQUET_COMPRESSION) as writer, \
+                    _csv_chunks(fileobj, dtypes) as reader:
+                for chunk in reader:
+                    chunk.columns = profile.columns
+                    writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False),
+                                       row_group_size=PARQUET_ROW_GROUP_ROWS)
+            with _file_reader(out) as body:
+                supabase.storage.from_("datasets").upload(path=parquet_path(csv_path), file=body,
+                                                          file_options={"contentType": "application/octet-stream"})
+        return True
+    except Exception as e:
+        print(f"[datasets] Parquet copy skipped for {csv_path}: {e}")
+        return False
+
 
-    object_name = f"{project_id}/{int(time.time())}_{file.filename or 'dataset'}.csv"
+def _ingest_upload(fileobj, object_name: str, max_rows: Optional[int]) -> SchemaProfile:
+    """
+    Profile the spooled upload, store it and its Parquet copy. Runs in the
+    threadpool: the request body never has to be held in memory as one buffer.
+    """
+    t0 = time.time()
+    profile = _profile_upload(fileobj, max_rows)
+    if max_rows is not None and profile.rows > max_rows:
+        raise HTTPException(status_code=403, detail="Quota exceeded: Datasets up to 5,000 rows on free plan.")
     try:
-        supabase.storage.from_("datasets").upload(path=object_name, file=content)
+        with _file_reader(fileobj) as body:
+            supabase.storage.from_("datasets").upload(path=object_name, file=body)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Storage upload failed: {e}")
+    _write_parquet_copy_chunked(fileobj, profile, object_name)
+    print(f"[datasets] Ingested {object_name}: {profile.rows}x{len(profile.columns)} in {time.time() - t0:.2f}s")
+    return profile
+
+
+def _storage_object_request(bucket: str, path: str) -> tuple:
+    """(URL, auth headers) of a stored object on the storage REST API."""
+    from urllib.parse import quote
+    key = SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY
+    url = f"{SUPABASE_URL.rstrip('/')}/storage/v1/object/{bucket}/{quote(path)}"
+    return url, {"Authorization": f"Bearer {key}", "apikey": key}
+
+def _stream_head(bucket: str, path: str, lines: int) -> bytes:
+    """
+    Leading bytes of a stored object holding at least `lines` complete lines (or
+    the whole object). Each attempt asks for a byte range and stops reading once
+    enough lines arrived, so only the head crosses the network even if the
+    server ignores the range.
+    """
+    url, auth = _storage_object_request(bucket, path)
+    want = max(1024, PREVIEW_RANGE_BYTES)
+    while True:
+        buf = bytearray()
+        headers = {**auth, "Range": f"bytes=0-{want - 1}"}
+        with httpx.stream("GET", url, headers=headers, timeout=30.0) as resp:
+            if resp.status_code == 416:  # empty object
+                return b""
+            resp.raise_for_status()
+            for part in resp.iter_bytes():
+                buf += part
+                if buf.count(b"\n") >= lines:
+                    return bytes(buf[:buf.rfind(b"\n") + 1])
+            whole = resp.status_code == 200 or len(buf) < want
+        if whole:
+            return bytes(buf)
+        want *= 4
+
+def _read_dataset_head(csv_path: str, nrows: int) -> pd.DataFrame:
+    """First `nrows` rows of a dataset: from its typed Parquet copy when stored, else the head of its CSV."""
+    try:
+        head = load_dataset_head(supabase.storage.from_("datasets"), csv_path, nrows)
+        if head is not None:
+            return head
+    except Exception as e:
+        print(f"[datasets] Parquet head unreadable for {csv_path}, reading the CSV: {e}")
+    return pd.read_csv(io.BytesIO(_stream_head("datasets", csv_path, nrows + 1)), nrows=nrows)
+
+def _preview_csv(bucket: str, path: str) -> str:
+    """
+    First PREVIEW_ROWS rows of a stored CSV as CSV text (datasets from their
+    Parquet copy when there is one); objects are immutable, so cached by (bucket, path).
+    """
+    key = (bucket, path)
+    with _PREVIEW_CACHE_LOCK:
+        hit = _PREVIEW_CACHE.get(key)
+        if hit is not None:
+            _PREVIEW_CACHE.move_to_end(key)
+            return hit
+    try:
+        if bucket == "datasets":
+            head = _read_dataset_head(path, PREVIEW_ROWS)
+        else:
+            head = pd.read_csv(io.BytesIO(_stream_head(bucket, path, PREVIEW_ROWS + 1)), nrows=PREVIEW_ROWS)
+    except Exception as e:
+        # e.g. a quoted field spanning lines cut at the range boundary: parse the full object
+        print(f"[preview] head read failed for {bucket}/{path}, reading full object: {e}")
+        raw = supabase.storage.from_(bucket).download(path)
+        head = pd.read_csv(io.BytesIO(raw if isinstance(raw, (bytes, bytearray)) else raw.read()), nrows=PREVIEW_ROWS)
+    text = head.to_csv(index=False, lineterminator="\r\n")
+    with _PREVIEW_CACHE_LOCK:
+        _PREVIEW_CACHE[key] = text
+        _PREVIEW_CACHE.move_to_end(key)
+        while len(_PREVIEW_CACHE) > max(1, PREVIEW_CACHE_SIZE):
+            _PREVIEW_CACHE.popitem(last=False)
+    return text
+
+@app.post("/v1/datasets/upload")
+async def upload_dataset(project_id: str = Form(...), file: UploadFile = File(...), user: Dict[str, Any] = Depends(require_user)):
+    ensure_bucket("datasets")
+    # The multipart parser has already spooled the body to a temporary file;
+    # it is parsed, profiled and stored from there in chunks, off the event loop
+    fileobj = file.file
+    fileobj.seek(0, os.SEEK_END)
+    if fileobj.tell() > MAX_UPLOAD_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"File too large. Max allowed is {MAX_UPLOAD_MB} MB")
+
+    object_name = f"{project_id}/{int(time.time())}_{file.filename or 'dataset'}.csv"
+    max_rows = None if is_enterprise(user) else FREE_PLAN_MAX_ROWS
+    profile = await run_in_threadpool(_ingest_upload, fileobj, object_name, max_rows)
+    rows_count = profile.rows
+    cols_count = len(profile.columns)
+    schema = profile.schema()
 
     # Run OMOP Mapping (Synchronous)
     omop_result = {}
@@ -955,12 +1583,12 @@ async def upload_dataset(project_id: str = Form(...), file: UploadFile = File(..
         if mapper:
             print(f"[OMOP] Mapping {cols_count} columns for {file.filename}...")
             # map_columns expects a list of column names
-            omop_result = mapper.map_columns(df.columns.tolist())
+            omop_result = mapper.map_columns(list(profile.columns))
             print("[OMOP] Mapping complete.")
         else:
             print("[OMOP] Mapper not available, returning blank template.")
             # Create blank template for manual mapping
-            for col in df.columns:
+            for col in profile.columns:
                 omop_result[str(col)] = {
                     "status": "UNKNOWN",
                     "confidence": 0.0, 
@@ -969,7 +1597,7 @@ async def upload_dataset(project_id: str = Form(...), file: UploadFile = File(..
     except Exception as e:
         print(f"[OMOP] Mapping failed during upload: {e}")
         # Create blank template with error note
-        for col in df.columns:
+        for col in profile.columns:
             omop_result[str(col)] = {
                 "status": "UNKNOWN", 
                 "confidence": 0.0,
@@ -999,18 +1627,7 @@ def dataset_preview(dataset_id: str, user: Dict[str, Any] = Depends(require_user
     if not proj.data or proj.data.get("owner_id") != user["id"]:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    obj_path = ds.data["file_url"]
-    file_bytes = supabase.storage.from_("datasets").download(obj_path)
-    raw = io.BytesIO(file_bytes) if isinstance(file_bytes, (bytes, bytearray)) else io.BytesIO(file_bytes.read())
-    df = pd.read_csv(raw)
-    df_head = df.head(20)
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(df_head.columns.tolist())
-    for _, row in df_head.iterrows():
-        writer.writerow([None if pd.isna(v) else v for v in row.tolist()])
-    buf.seek(0)
-    return StreamingResponse(io.StringIO(buf.read()), media_type="text/csv")
+    return Response(_preview_csv("datasets", ds.data["file_url"]), media_type="text/csv")
 
 @app.delete("/v1/datasets/{dataset_id}")
 def dataset_delete(dataset_id: str, user: Dict[str, Any] = Depends(require_user)):
@@ -1029,11 +1646,13 @@ def dataset_delete(dataset_id: str, user: Dict[str, Any] = Depends(require_user)
         supabase.table("runs").delete().in_("id", run_ids).execute()
 
     try:
-        supabase.storage.from_("datasets").remove([ds.data["file_url"]])
+        supabase.storage.from_("datasets").remove([ds.data["file_url"], parquet_path(ds.data["file_url"])])
     except Exception:
         pass
 
     supabase.table("datasets").delete().eq("id", dataset_id).execute()
+    _authz_invalidate("run", run_ids)
+    _finished_forget(run_ids)
     return {"ok": True}
 
 @app.put("/v1/datasets/{dataset_id}/rename")
@@ -1087,173 +1706,19 @@ def update_dataset_mapping(dataset_id: str, body: MappingUpdate, user: Dict[str,
 
 # ---------- Runs ----------
 @app.get("/v1/runs")
-def list_runs(user: Dict[str, Any] = Depends(require_user)):
-    """List all runs for the authenticated user."""
-    # First get all projects owned by the user
-    projects_res = supabase.table("projects").select("id, name").eq("owner_id", user["id"]).execute()
-    if projects_res.data is None:
-        raise HTTPException(status_code=500, detail=str(projects_res.error))
-    
-    project_ids = [p["id"] for p in projects_res.data]
-    project_names = {p["id"]: p["name"] for p in projects_res.data}
-    
-    if not project_ids:
-        return []
-    
-    # Get all datasets for these projects
-    datasets_res = supabase.table("datasets").select("id, name, project_id").in_("project_id", project_ids).execute()
-    if datasets_res.data is None:
-        raise HTTPException(status_code=500, detail=str(datasets_res.error))
-    
-    dataset_ids = [d["id"] for d in datasets_res.data]
-    dataset_names = {d["id"]: d["name"] for d in datasets_res.data}
-    dataset_projects = {d["id"]: d["project_id"] for d in datasets_res.data}
-    
-    if not dataset_ids:
-        return []
-    
-    # Get all runs for these datasets
-    runs_res = supabase.table("runs").select("id, name, dataset_id, status, started_at, finished_at, config_json").in_("dataset_id", dataset_ids).order("started_at", desc=True).execute()
-    if runs_res.data is None:
-        raise HTTPException(status_code=500, detail=str(runs_res.error))
-    
-    # Add project and dataset names and compute additional fields
-    runs_with_metadata = []
-    for run in runs_res.data:
-        dataset_id = run["dataset_id"]
-        project_id = dataset_projects.get(dataset_id)
-        
-        # Calculate duration
-        duration = None
-        if run.get("started_at") and run.get("finished_at"):
-            from datetime import datetime, timezone
-            start_time = datetime.fromisoformat(run["started_at"].replace('Z', '+00:00'))
-            end_time = datetime.fromisoformat(run["finished_at"].replace('Z', '+00:00'))
-            duration = int((end_time - start_time).total_seconds() / 60)  # in minutes
-        elif run.get("started_at") and not run.get("finished_at"):
-            # Running run - calculate current duration
-            from datetime import datetime, timezone
-            start_time = datetime.fromisoformat(run["started_at"].replace('Z', '+00:00'))
-            now = datetime.now(timezone.utc)
-            duration = int((now - start_time).total_seconds() / 60)  # in minutes
-        
-        # Get scores from config_json if available
-        scores = {
-            "auroc": 0.0,
-            "c_index": 0.0,
-            "mia_auc": 0.0,
-            "dp_epsilon": 0.0,
-            "privacy_score": 0.0,
-            "utility_score": 0.0
-        }
-        
-        if run.get("config_json") and isinstance(run["config_json"], dict):
-            config = run["config_json"]
-            scores.update({
-                "auroc": config.get("auroc", 0.0),
-                "c_index": config.get("c_index", 0.0),
-                "mia_auc": config.get("mia_auc", 0.0),
-                "dp_epsilon": config.get("dp_epsilon", 0.0),
-                "privacy_score": config.get("privacy_score", 0.0),
-                "utility_score": config.get("utility_score", 0.0)
-            })
-        
-        # Fetch actual metrics from database
-        metrics = {
-            "rows_generated": 0,
-            "columns_generated": 0,
-            "privacy_audit_passed": False,
-            "utility_audit_passed": False,
-            "compliance_passed": False,
-            "compliance_score": None,
-            "compliance_level": None,
-            "privacy": None,
-            "utility": None,
-            "fairness": None,
-            "compliance": None,
-        }
-        
-        # Try to fetch metrics from database
-        try:
-            m = supabase.table("metrics").select("payload_json").eq("run_id", run["id"]).maybe_single().execute()
-            if m.data and m.data.get("payload_json"):
-                payload = m.data["payload_json"]
-                # Extract privacy and utility metrics
-                if payload.get("privacy"):
-                    metrics["privacy"] = payload["privacy"]
-                    logger.info(f"[list_runs] Run {run['id'][:8]}...: Set privacy metrics: {metrics['privacy']}")
-                if payload.get("utility"):
-                    metrics["utility"] = payload["utility"]
-                    logger.info(f"[list_runs] Run {run['id'][:8]}...: Set utility metrics: {metrics['utility']}")
-                if payload.get("fairness"):
-                    metrics["fairness"] = payload["fairness"]
-                
-                # Extract compliance results if available
-                if payload.get("compliance"):
-                    compliance = payload["compliance"]
-                    metrics["compliance"] = compliance
-                    metrics["compliance_passed"] = compliance.get("passed", False)
-                    metrics["compliance_score"] = compliance.get("score")
-                    metrics["compliance_level"] = compliance.get("level")
-                    logger.info(f"[list_runs] Run {run['id'][:8]}...: Compliance status: {metrics['compliance_passed']}, Score: {metrics['compliance_score']}")
-                
-                # Extract meta info for rows/columns
-                meta = payload.get("meta", {})
-                metrics["rows_generated"] = meta.get("n_synth", 0)
-                metrics["columns_generated"] = 0  # Could be derived from data if needed
-                
-                # Calculate audit passes based on thresholds (PRIVACY GATES)
-                mia_auc = metrics["privacy"] and metrics["privacy"].get("mia_auc", 1.0) or 1.0
-                dup_rate = metrics["privacy"] and metrics["privacy"].get("dup_rate", 1.0) or 1.0
-                ks_mean = metrics["utility"] and metrics["utility"].get("ks_mean", 1.0) or 1.0
-                corr_delta = metrics["utility"] and metrics["utility"].get("corr_delta", 1.0) or 1.0
-                metrics["privacy_audit_passed"] = mia_auc <= 0.60 and dup_rate <= 0.05
-                metrics["utility_audit_passed"] = ks_mean <= 0.10 and corr_delta <= 0.15
-                
-                # Use compliance result if available, otherwise calculate from thresholds
-                if metrics.get("compliance_passed") is not None:
-                    metrics["compliance_passed"] = metrics["compliance_passed"]
-                else:
-                    metrics["compliance_passed"] = metrics["privacy_audit_passed"] and metrics["utility_audit_passed"]
-            else:
-                logger.info(f"[list_runs] Run {run['id'][:8]}...: No metrics record found (m.data={m.data is not None})")
-        except Exception as e:
-            # If metrics don't exist or error, use defaults
-            logger.warning(f"Could not fetch metrics for run {run['id']}: {e}")
-            if run["status"] == "succeeded":
-                # Fallback to mock data only if no metrics found
-                metrics.update({
-                    "rows_generated": 1500,
-                    "columns_generated": 25,
-                    "privacy_audit_passed": scores["privacy_score"] > 0.7,
-                    "utility_audit_passed": scores["utility_score"] > 0.7,
-                    "compliance_passed": scores["privacy_score"] > 0.7 and scores["utility_score"] > 0.7,
-                })
-        
-        # Add top-level privacy and utility for frontend compatibility
-        # Extract directly from metrics dict (will be None if not found, which is fine)
-        privacy = metrics.get("privacy")
-        utility = metrics.get("utility")
-        
-        # Debug: log what we're about to return for the TabDDPM run
-        if run["id"] == "0f6d5294-efe8-45a9-a9ea-caf8d9386485":
-            logger.info(f"[list_runs] DEBUG Run {run['id'][:8]}...: privacy={privacy}, utility={utility}")
-            logger.info(f"[list_runs] DEBUG metrics dict keys: {list(metrics.keys())}, privacy type: {type(privacy)}, utility type: {type(utility)}")
-        
-        runs_with_metadata.append({
-            **run,
-            "project_id": project_id,
-            "project_name": project_names.get(project_id, "Unknown Project"),
-            "dataset_name": dataset_names.get(dataset_id, "Unknown Dataset"),
-            "duration": duration,
-            "scores": scores,
-            "metrics": metrics,
-            "privacy": privacy,  # Top-level for frontend compatibility
-            "utility": utility,  # Top-level for frontend compatibility
-            "created_at": run["started_at"]  # Use started_at as created_at since runs table doesn't have created_at
-        })
-    
-    return runs_with_metadata
+def list_runs(response: Response, limit: Optional[int] = None, cursor: Optional[str] = None,
+              fields: Optional[str] = None, user: Dict[str, Any] = Depends(require_user)):
+    """
+    List the authenticated user's runs, newest first. Every run unless `limit`
+    is given; then one page per call (next page via the X-Next-Cursor header as
+    `cursor`; a `cursor` alone pages by LIST_PAGE_SIZE). `fields` projects each
+    item. Scores come from the compact run_summaries rows, never the metrics
+    payloads.
+    """
+    page = _page_limit(limit, cursor)
+    wanted = _wanted_fields(fields)
+    rows = _run_summaries(user["id"], page + 1 if page else None, _decode_cursor(cursor))
+    return [_select_fields(_run_listing_item(r), wanted) for r in _paginate(response, rows, page, "sort_key")]
 
 class StartRun(BaseModel):
     dataset_id: str
@@ -1584,34 +2049,13 @@ def list_runs_dev():
 
 
 @app.get("/v1/runs/{run_id}")
-def get_run(run_id: str, user: Dict[str, Any] = Depends(require_user)):
+async def get_run(run_id: str, user: Dict[str, Any] = Depends(require_user)):
     """Get full run details including config_json with plan."""
-    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    
-    # Ownership check
-    # Ownership check
-    proj = supabase.table("projects").select("owner_id,name").eq("id", r.data["project_id"]).single().execute()
-    if not proj.data or proj.data.get("owner_id") != user["id"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    
-    # Get full run data
-    run_data = supabase.table("runs").select("*").eq("id", run_id).single().execute()
-    if not run_data.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    
-    run = dict(run_data.data)
-    run["project_name"] = proj.data.get("name")
-    
-    # Fetch dataset name
-    if run.get("dataset_id"):
-        try:
-            ds = supabase.table("datasets").select("name").eq("id", run["dataset_id"]).single().execute()
-            if ds.data:
-                run["dataset_name"] = ds.data.get("name")
-        except Exception:
-            pass # Graceful fallback if dataset deleted
+    # Run, ownership, project and dataset names in one query
+    run = await _owned_run(run_id, user, "*,dataset:datasets(name)", with_project_name=True)
+    dataset = run.pop("dataset", None)
+    if dataset:  # None if the dataset was deleted
+        run["dataset_name"] = dataset.get("name")
     
     # Analyze which method succeeded (from method field or metrics)
     config_json = run.get("config_json") or {}
@@ -1681,125 +2125,115 @@ def run_status(run_id: str, user: Dict[str, Any] = Depends(require_user)):
 @app.patch("/v1/runs/{run_id}/name")
 def rename_run(run_id: str, body: RenameBody, user: Dict[str, Any] = Depends(require_user)):
     # Validate ownership via project
-    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    proj = supabase.table("projects").select("owner_id").eq("id", r.data["project_id"]).single().execute()
-    if not proj.data or proj.data.get("owner_id") != user["id"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
+    _check_run_owner(run_id, user)
     supabase.table("runs").update({"name": body.name}).eq("id", run_id).execute()
     return {"ok": True}
 
-@app.get("/v1/runs/{run_id}/metrics")
-def run_metrics(run_id: str, user: Dict[str, Any] = Depends(require_user)):
-    """Get metrics for a run. Returns empty dict if run was cancelled/failed before metrics were generated."""
-    # Check run status first - cancelled/failed runs may not have metrics
-    r = supabase.table("runs").select("id,status,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    
-    # Ownership check
-    proj = supabase.table("projects").select("owner_id").eq("id", r.data["project_id"]).single().execute()
-    if not proj.data or proj.data.get("owner_id") != user["id"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    
-    # For cancelled or failed runs, return empty dict gracefully
-    if r.data.get("status") in ("cancelled", "failed"):
-        return {}
-    
-    # Try to fetch metrics
+async def _run_metrics_row(run_id: str) -> Optional[Dict[str, Any]]:
     try:
-        m = supabase.table("metrics").select("payload_json").eq("run_id", run_id).maybe_single().execute()
-        if m.data is None:
-            return {}
-        return m.data.get("payload_json") or {}
+        return await db.first("metrics", "payload_json", {"run_id": f"eq.{run_id}"})
     except Exception as e:
         # If metrics don't exist, return empty dict (graceful degradation)
         print(f"[api] Warning: Could not fetch metrics for run {run_id}: {e}")
-        return {}
+        return None
 
-@app.get("/v1/runs/{run_id}/artifacts")
-def run_artifacts(run_id: str, user: Dict[str, Any] = Depends(require_user)):
-    r = supabase.table("runs").select("id,status,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    # Ownership check
-    proj = supabase.table("projects").select("owner_id").eq("id", r.data["project_id"]).single().execute()
-    if not proj.data or proj.data.get("owner_id") != user["id"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
+@app.get("/v1/runs/{run_id}/metrics")
+async def run_metrics(run_id: str, request: Request, user: Dict[str, Any] = Depends(require_user)):
+    """Get metrics for a run. Returns empty dict if run was cancelled/failed before metrics were generated."""
+    async def load():
+        # Ownership/status check and the metrics read go out together
+        run, m = await asyncio.gather(_owned_run(run_id, user, "id,status,project_id"), _run_metrics_row(run_id))
 
-    ready = False
-    if r.data.get("status") == "succeeded":
+        # For cancelled or failed runs, return empty dict gracefully
+        if run.get("status") in ("cancelled", "failed") or m is None:
+            return {}, False
+        return m.get("payload_json") or {}, run.get("status") == "succeeded"
+
+    return await _finished_run_response("metrics", run_id, user, request, load)
+
+@app.get("/v1/runs/{run_id}/artifacts")
+async def run_artifacts(run_id: str, request: Request, user: Dict[str, Any] = Depends(require_user)):
+    async def metrics_exist() -> bool:
         try:
-            m = supabase.table("metrics").select("run_id").eq("run_id", run_id).maybe_single().execute()
-            ready = bool(m.data)
+            return bool(await db.first("metrics", "run_id", {"run_id": f"eq.{run_id}"}))
         except Exception:
-            ready = False
-    if not ready:
-        return {"artifacts_ready": False, "artifacts": []}
+            return False
 
-    rows = supabase.table("run_artifacts").select("kind,path,bytes,mime").eq("run_id", run_id).execute().data or []
-    items = []
-    for a in rows:
-        bucket = "artifacts"
-        signed = supabase.storage.from_(bucket).create_signed_url(a["path"], int(timedelta(hours=1).total_seconds()))
-        url = signed.get("signedURL") if isinstance(signed, dict) else getattr(signed, "signed_url", None)
-        items.append({"kind": a["kind"], "signedUrl": url, "bytes": a.get("bytes"), "mime": a.get("mime")})
-    return {"artifacts_ready": True, "artifacts": items}
+    async def load():
+        run, has_metrics, rows = await asyncio.gather(
+            _owned_run(run_id, user, "id,status,project_id"),
+            metrics_exist(),
+            db.select("run_artifacts", "kind,path,bytes,mime", {"run_id": f"eq.{run_id}"}),
+        )
+        if run.get("status") != "succeeded" or not has_metrics:
+            return {"artifacts_ready": False, "artifacts": []}, False
+
+        # All signed URLs in one storage request
+        urls = await db.signed_urls("artifacts", [a["path"] for a in rows], ARTIFACT_URL_SECONDS)
+        items = [{"kind": a["kind"], "signedUrl": urls.get(a["path"]), "bytes": a.get("bytes"), "mime": a.get("mime")}
+                 for a in rows]
+        return {"artifacts_ready": True, "artifacts": items}, True
+
+    return await _finished_run_response("artifacts", run_id, user, request, load)
+
+def _enhanced_steps(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Steps with agent intervention flags."""
+    enhanced_rows = []
+    for step in rows:
+        enhanced_step = dict(step)
+        title_lower = (step.get("title") or "").lower()
+        detail_lower = (step.get("detail") or "").lower()
+        
+        # Detect agent events
+        enhanced_step["is_agent_action"] = (
+            "agent" in title_lower or 
+            "agent" in detail_lower or
+            "suggestion" in title_lower or
+            "replanned" in detail_lower
+        )
+        enhanced_step["is_backup_attempt"] = (
+            "backup" in detail_lower or
+            ("attempt" in detail_lower and any(x in detail_lower for x in ["2", "3", "4"]))
+        )
+        enhanced_step["is_error"] = title_lower == "error"
+        enhanced_step["is_training"] = title_lower == "training"
+        enhanced_step["is_metrics"] = title_lower == "metrics"
+        enhanced_step["is_planned"] = title_lower == "planned"
+        
+        # Extract method from detail if present
+        method_match = None
+        if detail_lower:
+            import re
+            methods = ["gc", "ctgan", "tvae"]
+            for m in methods:
+                if re.search(rf'\b{m}\b', detail_lower):
+                    method_match = m.upper()
+                    break
+        enhanced_step["method_hint"] = method_match
+        
+        enhanced_rows.append(enhanced_step)
+    
+    return enhanced_rows
 
 @app.get("/v1/runs/{run_id}/steps")
-def run_steps(run_id: str, user: Dict[str, Any] = Depends(require_user)):
+async def run_steps(run_id: str, request: Request, user: Dict[str, Any] = Depends(require_user)):
     """Get step-by-step execution log with enhanced agent intervention flags."""
-    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    proj = supabase.table("projects").select("owner_id").eq("id", r.data["project_id"]).single().execute()
-    if not proj.data or proj.data.get("owner_id") != user["id"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    try:
-        rows = supabase.table("run_steps").select("step_no,title,detail,metrics_json,created_at").eq("run_id", run_id).order("step_no").execute().data or []
-        
-        # Enhance steps with agent intervention flags
-        enhanced_rows = []
-        for step in rows:
-            enhanced_step = dict(step)
-            title_lower = (step.get("title") or "").lower()
-            detail_lower = (step.get("detail") or "").lower()
-            
-            # Detect agent events
-            enhanced_step["is_agent_action"] = (
-                "agent" in title_lower or 
-                "agent" in detail_lower or
-                "suggestion" in title_lower or
-                "replanned" in detail_lower
-            )
-            enhanced_step["is_backup_attempt"] = (
-                "backup" in detail_lower or
-                ("attempt" in detail_lower and any(x in detail_lower for x in ["2", "3", "4"]))
-            )
-            enhanced_step["is_error"] = title_lower == "error"
-            enhanced_step["is_training"] = title_lower == "training"
-            enhanced_step["is_metrics"] = title_lower == "metrics"
-            enhanced_step["is_planned"] = title_lower == "planned"
-            
-            # Extract method from detail if present
-            method_match = None
-            if detail_lower:
-                import re
-                methods = ["gc", "ctgan", "tvae"]
-                for m in methods:
-                    if re.search(rf'\b{m}\b', detail_lower):
-                        method_match = m.upper()
-                        break
-            enhanced_step["method_hint"] = method_match
-            
-            enhanced_rows.append(enhanced_step)
-        
-        return enhanced_rows
-    except APIError as e:
-        # Gracefully handle when the optional run_steps table hasn't been created yet
-        # PGRST205: table not found in schema cache
-        return []
+    async def steps():
+        try:
+            return await db.select("run_steps", "step_no,title,detail,metrics_json,created_at",
+                                   {"run_id": f"eq.{run_id}"}, order="step_no")
+        except DataAccessError:
+            # Gracefully handle when the optional run_steps table hasn't been created yet
+            # PGRST205: table not found in schema cache
+            return None
+
+    async def load():
+        run, rows = await asyncio.gather(_owned_run(run_id, user, "id,status,project_id"), steps())
+        if rows is None:
+            return [], False
+        return _enhanced_steps(rows), run.get("status") == "succeeded"
+
+    return await _finished_run_response("steps", run_id, user, request, load)
 
 @app.get("/v1/runs/{run_id}/logs")
 def get_run_logs(run_id: str, tail: int = 500, user: Dict[str, Any] = Depends(require_user)):
@@ -1888,15 +2322,14 @@ def cancel_run(run_id: str, user: Dict[str, Any] = Depends(require_user)):
 
 @app.delete("/v1/runs/{run_id}")
 def delete_run(run_id: str, user: Dict[str, Any] = Depends(require_user)):
-    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    proj = supabase.table("projects").select("owner_id").eq("id", r.data["project_id"]).single().execute()
-    if not proj.data or proj.data.get("owner_id") != user["id"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
+    _check_run_owner(run_id, user)
 
     artifacts = supabase.table("run_artifacts").select("path").eq("run_id", run_id).execute().data or []
     paths = [a.get("path") for a in artifacts if a and a.get("path")]
+    # Precompressed siblings and the Parquet copy are not artifact rows
+    paths += [p + suffix for p in paths for _, suffix in ARTIFACT_ENCODINGS]
+    paths += [parquet_path(p) for p in paths if p.endswith(".csv")]
+    paths = list(dict.fromkeys(paths))
     if paths:
         try:
             supabase.storage.from_("artifacts").remove(paths)
@@ -1906,63 +2339,172 @@ def delete_run(run_id: str, user: Dict[str, Any] = Depends(require_user)):
     supabase.table("metrics").delete().eq("run_id", run_id).execute()
     supabase.table("run_artifacts").delete().eq("run_id", run_id).execute()
     supabase.table("runs").delete().eq("id", run_id).execute()
+    _authz_invalidate("run", [run_id])
+    _finished_forget([run_id])
     return {"ok": True}
 
+# ---------- Artifact downloads (precompressed variants) ----------
+def _accepted_encodings(request: Request) -> set:
+    """Content codings the client accepts (q=0 entries excluded)."""
+    accepted = set()
+    for part in (request.headers.get("accept-encoding") or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if name and not (q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000")):
+            accepted.add(name.strip().lower())
+    return accepted
+
+def _open_storage_stream(bucket: str, path: str):
+    """(response, exit stack) of a streamed GET of a stored object, or None if it cannot be read."""
+    from contextlib import ExitStack
+    url, headers = _storage_object_request(bucket, path)
+    stack = ExitStack()
+    try:
+        resp = stack.enter_context(httpx.stream("GET", url, headers=headers, timeout=60.0))
+        if resp.status_code == 200:
+            return resp, stack
+    except Exception as e:
+        print(f"[artifacts] cannot open {bucket}/{path}: {e}")
+    stack.close()
+    return None
+
+def _storage_stream_response(opened, media_type: str, headers: Dict[str, str]) -> StreamingResponse:
+    resp, stack = opened
+
+    def body():
+        with stack:
+            yield from resp.iter_bytes(ZIP_CHUNK_BYTES)
+
+    length = resp.headers.get("content-length")
+    if length and "Content-Encoding" not in headers:
+        headers = {**headers, "Content-Length": length}
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+def _encoded_artifact_response(path: str, request: Request, media_type: str,
+                               headers: Dict[str, str]) -> Optional[StreamingResponse]:
+    """
+    The precompressed sibling of an artifact matching Accept-Encoding, streamed
+    as-is with its Content-Encoding (the GZip middleware leaves such responses
+    alone); None if the client accepts none or the worker wrote none.
+    """
+    accepted = _accepted_encodings(request)
+    for encoding, suffix in ARTIFACT_ENCODINGS:
+        if encoding in accepted:
+            opened = _open_storage_stream("artifacts", path + suffix)
+            if opened is not None:
+                return _storage_stream_response(opened, media_type, {**headers, "Content-Encoding": encoding})
+    return None
+
+def _artifact_response(path: str, request: Request, media_type: str,
+                       filename: Optional[str] = None) -> Optional[StreamingResponse]:
+    """Stored artifact streamed in the best accepted encoding; None if it cannot be read."""
+    headers = {"Vary": "Accept-Encoding"}
+    if filename:
+        headers["Content-Disposition"] = f"attachment; filename=\"{filename}\""
+    encoded = _encoded_artifact_response(path, request, media_type, headers)
+    if encoded is not None:
+        return encoded
+    opened = _open_storage_stream("artifacts", path)
+    return _storage_stream_response(opened, media_type, headers) if opened is not None else None
+
 @app.get("/v1/runs/{run_id}/synthetic/preview")
 def run_synthetic_preview(run_id: str, user: Dict[str, Any] = Depends(require_user)):
-    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    proj = supabase.table("projects").select("owner_id").eq("id", r.data["project_id"]).single().execute()
-    if not proj.data or proj.data.get("owner_id") != user["id"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
+    _check_run_owner(run_id, user)
     art = supabase.table("run_artifacts").select("path").eq("run_id", run_id).eq("kind", "synthetic_csv").single().execute()
     if not art.data:
         raise HTTPException(status_code=404, detail="synthetic_csv not found")
-    file_bytes = supabase.storage.from_("artifacts").download(art.data["path"])
-    raw = io.BytesIO(file_bytes) if isinstance(file_bytes, (bytes, bytearray)) else io.BytesIO(file_bytes.read())
-    df = pd.read_csv(raw)
-    df_head = df.head(20)
-    buf = io.StringIO()
-    writer = csv.writer(buf)
-    writer.writerow(df_head.columns.tolist())
-    for _, row in df_head.iterrows():
-        writer.writerow([None if pd.isna(v) else v for v in row.tolist()])
-    buf.seek(0)
-    return StreamingResponse(io.StringIO(buf.read()), media_type="text/csv")
+    return Response(_preview_csv("artifacts", art.data["path"]), media_type="text/csv")
+
+# format → (artifact path suffix added to synthetic.csv, media type, download name)
+SYNTHETIC_FORMATS = {
+    "csv": ("", "text/csv", "synthetic.csv"),
+    "csv.gz": (".gz", "application/gzip", "synthetic.csv.gz"),
+    "csv.zst": (".zst", "application/zstd", "synthetic.csv.zst"),
+}
+
+@app.get("/v1/runs/{run_id}/synthetic/download")
+def run_synthetic_download(run_id: str, request: Request, format: str = "csv",
+                           user: Dict[str, Any] = Depends(require_user)):
+    """
+    Synthetic data as stored by the worker. `format=csv` negotiates a
+    precompressed encoding via Accept-Encoding; `csv.gz`/`csv.zst` download the
+    compressed file itself and `parquet` the typed Parquet copy.
+    """
+    fmt = (format or "csv").strip().lower()
+    if fmt not in SYNTHETIC_FORMATS and fmt != "parquet":
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{format}' (csv, csv.gz, csv.zst, parquet)")
+    _check_run_owner(run_id, user)
+    art = supabase.table("run_artifacts").select("path").eq("run_id", run_id).eq("kind", "synthetic_csv").single().execute()
+    if not art.data:
+        raise HTTPException(status_code=404, detail="synthetic_csv not found")
+
+    csv_path = art.data["path"]
+    if fmt == "csv":
+        resp = _artifact_response(csv_path, request, "text/csv", "synthetic.csv")
+    elif fmt == "parquet":
+        opened = _open_storage_stream("artifacts", parquet_path(csv_path))
+        resp = _storage_stream_response(opened, "application/vnd.apache.parquet", {
+            "Content-Disposition": "attachment; filename=\"synthetic.parquet\""}) if opened is not None else None
+    else:
+        suffix, media_type, name = SYNTHETIC_FORMATS[fmt]
+        opened = _open_storage_stream("artifacts", csv_path + suffix)
+        resp = _storage_stream_response(opened, media_type, {
+            "Content-Disposition": f"attachment; filename=\"{name}\""}) if opened is not None else None
+    if resp is None:
+        raise HTTPException(status_code=404, detail=f"synthetic data not available as {fmt}")
+    return resp
 
 @app.get("/v1/runs/{run_id}/report")
-def run_report_json(run_id: str, user: Dict[str, Any] = Depends(require_user)):
-    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    proj = supabase.table("projects").select("owner_id").eq("id", r.data["project_id"]).single().execute()
-    if not proj.data or proj.data.get("owner_id") != user["id"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    art = supabase.table("run_artifacts").select("path").eq("run_id", run_id).eq("kind", "report_json").single().execute()
-    if not art.data:
-        m = supabase.table("metrics").select("payload_json").eq("run_id", run_id).single().execute()
-        if m.data and m.data.get("payload_json"):
-            return m.data["payload_json"]
-        raise HTTPException(status_code=404, detail="report_json not found")
-    file_bytes = supabase.storage.from_("artifacts").download(art.data["path"])
-    raw = file_bytes if isinstance(file_bytes, (bytes, bytearray)) else file_bytes.read()
-    try:
-        js = json.loads(raw)
-    except Exception:
-        js = json.loads(raw.decode("utf-8"))
-    return js
+async def run_report_json(run_id: str, request: Request, user: Dict[str, Any] = Depends(require_user)):
+    accepted = _accepted_encodings(request)
+    encoding = next((enc for enc, _ in ARTIFACT_ENCODINGS if enc in accepted), None)
+
+    async def load():
+        run, art = await asyncio.gather(
+            _owned_run(run_id, user, "id,status,project_id"),
+            db.first("run_artifacts", "path", {"run_id": f"eq.{run_id}", "kind": "eq.report_json"}),
+        )
+        final = run.get("status") == "succeeded"
+        if not art:
+            m = await _run_metrics_row(run_id)
+            if m and m.get("payload_json"):
+                return m["payload_json"], final
+            raise HTTPException(status_code=404, detail="report_json not found")
+        # Stored report bytes go out untouched (no parse/serialize round trip), precompressed if accepted
+        if encoding is not None:
+            try:
+                return await db.download("artifacts", art["path"] + dict(ARTIFACT_ENCODINGS)[encoding]), final, encoding
+            except DataAccessError:
+                pass  # runs from before precompressed artifacts
+        return await db.download("artifacts", art["path"]), final
+
+    return await _finished_run_response("report", run_id, user, request, load, encoding)
 
 # ---------- PDF trigger (via report-service) ----------
-@app.post("/v1/runs/{run_id}/report/pdf")
-def generate_report_pdf(run_id: str, user: Dict[str, Any] = Depends(require_user)):
-    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-    proj = supabase.table("projects").select("owner_id").eq("id", r.data["project_id"]).single().execute()
-    if not proj.data or proj.data.get("owner_id") != user["id"]:
-        raise HTTPException(status_code=403, detail="Forbidden")
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "64"))
+# Rendered PDFs keyed like metric results (libs/metric_cache.py); entry {"pdf": bytes, "paths": uploaded paths}
+_REPORT_CACHE = MetricCache(max_entries=REPORT_CACHE_SIZE, directory=None)
+
+def _report_cache_key(metrics: Any) -> tuple:
+    """
+    metric_key(real hash, synth hash, "report_pdf", version) of a metrics payload.
+
+    The worker records the content hashes of the scored real/synthetic pair in
+    meta.metric_cache_key; the version carries a payload digest, which guards
+    against re-scored payloads for the same pair.
+    """
+    meta = (metrics.get("meta") or {}) if isinstance(metrics, dict) else {}
+    pair = meta.get("metric_cache_key") or {}
+    digest = hashlib.sha256(json.dumps(metrics, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return metric_key(pair.get("real") or "-", pair.get("synth") or "-", "report_pdf",
+                      f"{metric_version('report_pdf')}.{digest}")
 
+def _report_pdf(run_id: str) -> Dict[str, Any]:
+    """
+    Render (or reuse) the quality report PDF of a run, store it as its
+    report_pdf artifact and return a signed URL. A payload rendered and
+    uploaded for this run before is only re-signed.
+    """
     # Prefer report_json artifact; fallback to metrics table
     art = supabase.table("run_artifacts").select("path").eq("run_id", run_id).eq("kind", "report_json").single().execute()
     if art.data:
@@ -1973,91 +2515,18 @@ def generate_report_pdf(run_id: str, user: Dict[str, Any] = Depends(require_user
         m = supabase.table("metrics").select("payload_json").eq("run_id", run_id).single().execute()
         metrics = (m.data or {}).get("payload_json") or {}
 
-    # Call report-service
-    # Try remote report-service first; on failure, fallback to local render
-    pdf_bytes: bytes
-    try:
-        base = REPORT_SERVICE_BASE
-        with httpx.Client(timeout=15.0) as client:
-            resp = client.post(f"{base}/render", json={
-                "title": "Gesalps Privacy–Utility Report",
-                "metrics": metrics,
-                "date": datetime.utcnow().strftime("%Y-%m-%d"),
-            })
-        if resp.status_code != 200:
-            raise RuntimeError(f"report-service returned {resp.status_code}")
-        pdf_bytes = resp.content or b""
-        # Validate payload is actually a PDF; otherwise trigger fallback
-        ct = resp.headers.get("content-type", "")
-        if not (ct.lower().startswith("application/pdf") and pdf_bytes[:5] == b"%PDF-"):
-            raise RuntimeError("report-service returned non-PDF content")
-    except Exception:
-        # Local fallback using a minimal PDF (keeps local dev resilient)
-        try:
-            from reportlab.lib.pagesizes import A4  # type: ignore
-            from reportlab.lib import colors  # type: ignore
-            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer  # type: ignore
-            from reportlab.lib.styles import getSampleStyleSheet  # type: ignore
-            buf = io.BytesIO()
-            doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=36, bottomMargin=36, leftMargin=36, rightMargin=36)
-            styles = getSampleStyleSheet()
-            story = []
-            title = styles['Title']; title.fontSize = 20
-            h2 = styles['Heading2']; h2.spaceBefore = 12; h2.spaceAfter = 6
-            body = styles['BodyText']
-            story.append(Paragraph("Gesalps Privacy–Utility Report", title))
-            story.append(Paragraph(datetime.utcnow().strftime("%Y-%m-%d"), body))
-            story.append(Spacer(1, 12))
-
-            def badge(val, op, thr):
-                try:
-                    if val is None:
-                        return "N/A"
-                    ok = val <= thr if op == "<=" else val >= thr
-                    return "Pass" if ok else "Check"
-                except Exception:
-                    return "N/A"
+    def signed_url(path: str) -> Optional[str]:
+        signed = supabase.storage.from_("artifacts").create_signed_url(path, int(timedelta(hours=1).total_seconds()))
+        return signed.get("signedURL") if isinstance(signed, dict) else getattr(signed, "signed_url", None)
 
-            p = metrics.get('privacy', {}) if isinstance(metrics, dict) else {}
-            u = metrics.get('utility', {}) if isinstance(metrics, dict) else {}
-            mia = p.get('mia_auc'); dup = p.get('dup_rate')
-            ks = u.get('ks_mean'); corr = u.get('corr_delta')
-            privacy_rows = [["Test","Result","Threshold","Status"],
-                            ["Membership Inference AUC", f"{mia if mia is not None else '—'}", "≤ 0.60", badge(mia, "<=", 0.60)],
-                            ["Record Linkage Risk (%)", f"{(dup*100):.1f}%" if isinstance(dup,(int,float)) else "—", "≤ 5%", badge(dup*100 if isinstance(dup,(int,float)) else None, "<=", 5.0)]]
-            t = Table(privacy_rows, hAlign='LEFT', colWidths=[220, 90, 110, 80])
-            t.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#111827')),
-                ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-                ('GRID', (0,0), (-1,-1), 0.25, colors.HexColor('#D1D5DB')),
-                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                ('ALIGN', (1,1), (-1,-1), 'CENTER'),
-                ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ]))
-            story.append(Paragraph("Privacy Assessment", h2))
-            story.append(t); story.append(Spacer(1, 18))
-            util_rows = [["Metric","Value","Target","Status"],
-                         ["KS mean (lower is better)", f"{ks if ks is not None else '—'}", "≤ 0.10", badge(ks, "<=", 0.10)],
-                         ["Correlation Δ (lower is better)", f"{corr if corr is not None else '—'}", "≤ 0.10", badge(corr, "<=", 0.10)]]
-            t2 = Table(util_rows, hAlign='LEFT', colWidths=[220, 90, 110, 80])
-            t2.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#111827')),
-                ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-                ('GRID', (0,0), (-1,-1), 0.25, colors.HexColor('#D1D5DB')),
-                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                ('ALIGN', (1,1), (-1,-1), 'CENTER'),
-                ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ]))
-            story.append(Paragraph("Utility Assessment", h2))
-            story.append(t2)
-            doc.build(story)
-            buf.seek(0)
-            pdf_bytes = buf.read()
-        except Exception as e:
-            raise HTTPException(502, f"Report service failed and fallback errored: {e}")
-    ensure_bucket("artifacts")
-    # Prefer a friendly filename for the formatted report
+    cache_key = _report_cache_key(metrics)
     path = f"{run_id}/gesalps_quality_report.pdf"
+    entry = _REPORT_CACHE.get(cache_key)
+    if entry is not None and path in entry["paths"]:
+        # Same metrics already rendered and uploaded for this run: just re-sign
+        return {"path": path, "signedUrl": signed_url(path), "cached": True}
+    pdf_bytes = entry["pdf"] if entry is not None else _render_report_pdf(metrics)
+    ensure_bucket("artifacts")
     # Robust upload across supabase-py versions
     try:
         # storage3 expects header values as strings; use upsert="true"
@@ -2077,29 +2546,13 @@ def generate_report_pdf(run_id: str, user: Dict[str, Any] = Depends(require_user
         }).execute()
     except Exception:
         pass
+    _finished_forget([run_id], ["artifacts"])  # the listing now includes the PDF
+    entry = entry or {"pdf": pdf_bytes, "paths": set()}
+    entry["paths"].add(path)
+    _REPORT_CACHE.put(cache_key, entry)
+    return {"path": path, "signedUrl": signed_url(path)}
 
-    signed = supabase.storage.from_("artifacts").create_signed_url(path, int(timedelta(hours=1).total_seconds()))
-    url = signed.get("signedURL") if isinstance(signed, dict) else getattr(signed, "signed_url", None)
-    return {"path": path, "signedUrl": url}
-
-# Development endpoint for PDF generation (bypasses authentication)
-@app.post("/dev/runs/{run_id}/report/pdf")
-def generate_report_pdf_dev(run_id: str, user: Dict[str, Any] = Depends(require_user_dev)):
-    # Skip ownership check for development
-    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
-    if not r.data:
-        raise HTTPException(status_code=404, detail="Run not found")
-
-    # Prefer report_json artifact; fallback to metrics table
-    art = supabase.table("run_artifacts").select("path").eq("run_id", run_id).eq("kind", "report_json").single().execute()
-    if art.data:
-        raw = supabase.storage.from_("artifacts").download(art.data["path"])
-        content = raw if isinstance(raw, (bytes, bytearray)) else raw.read()
-        metrics = json.loads(content.decode("utf-8"))
-    else:
-        m = supabase.table("metrics").select("payload_json").eq("run_id", run_id).single().execute()
-        metrics = (m.data or {}).get("payload_json") or {}
-
+def _render_report_pdf(metrics: Dict[str, Any]) -> bytes:
     # Call report-service
     # Try remote report-service first; on failure, fallback to local render
     pdf_bytes: bytes
@@ -2182,35 +2635,174 @@ def generate_report_pdf_dev(run_id: str, user: Dict[str, Any] = Depends(require_
             pdf_bytes = buf.read()
         except Exception as e:
             raise HTTPException(502, f"Report service failed and fallback errored: {e}")
-    ensure_bucket("artifacts")
-    # Prefer a friendly filename for the formatted report
-    path = f"{run_id}/gesalps_quality_report.pdf"
-    # Robust upload across supabase-py versions
-    try:
-        # storage3 expects header values as strings; use upsert="true"
-        supabase.storage.from_("artifacts").upload(path=path, file=pdf_bytes, file_options={"contentType": "application/pdf", "upsert": "true"})
-    except Exception:
-        try:
-            supabase.storage.from_("artifacts").update(path=path, file=pdf_bytes, file_options={"contentType": "application/pdf", "upsert": "true"})
-        except Exception:
-            supabase.storage.from_("artifacts").upload(path=path, file=pdf_bytes)
-    try:
-        supabase.table("run_artifacts").upsert({
-            "run_id": run_id,
-            "kind": "report_pdf",
-            "path": path,
-            "mime": "application/pdf",
-            "bytes": len(pdf_bytes) if isinstance(pdf_bytes, (bytes, bytearray)) else None,
-        }).execute()
-    except Exception:
-        pass
+    return pdf_bytes
+
+@app.post("/v1/runs/{run_id}/report/pdf")
+def generate_report_pdf(run_id: str, user: Dict[str, Any] = Depends(require_user)):
+    _check_run_owner(run_id, user)
+    return _report_pdf(run_id)
 
-    signed = supabase.storage.from_("artifacts").create_signed_url(path, int(timedelta(hours=1).total_seconds()))
-    url = signed.get("signedURL") if isinstance(signed, dict) else getattr(signed, "signed_url", None)
-    return {"path": path, "signedUrl": url}
+# Development endpoint for PDF generation (bypasses authentication)
+@app.post("/dev/runs/{run_id}/report/pdf")
+def generate_report_pdf_dev(run_id: str, user: Dict[str, Any] = Depends(require_user_dev)):
+    # Skip ownership check for development
+    r = supabase.table("runs").select("id,project_id").eq("id", run_id).single().execute()
+    if not r.data:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return _report_pdf(run_id)
 
 
 # ---------- Download bundle (ZIP) ----------
+class _ZipSink:
+    """Write-only, unseekable target for ZipFile; the generator drains it after every write."""
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def write(self, data) -> int:
+        self.buf += data
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = bytes(self.buf)
+        self.buf.clear()
+        return out
+
+class _ArtifactPipe:
+    """
+    One artifact download, readable while it is still arriving: the fetch thread
+    appends response chunks to a spooled temp file (in memory up to ZIP_SPOOL_MB)
+    and the ZIP writer reads them back as they land.
+    """
+
+    def __init__(self):
+        import tempfile
+        self._file = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MB * 2**20)
+        self._cond = threading.Condition()
+        self._written = 0
+        self._read = 0
+        self._done = False
+        self._aborted = False
+        self.error: Optional[BaseException] = None
+
+    def fetch(self, path: str) -> None:
+        """Stream `path` from storage into the pipe (runs in the fetch pool)."""
+        try:
+            url, headers = _storage_object_request("artifacts", path)
+            with httpx.stream("GET", url, headers=headers, timeout=60.0) as resp:
+                resp.raise_for_status()
+                for part in resp.iter_bytes(ZIP_CHUNK_BYTES):
+                    with self._cond:
+                        if self._aborted:
+                            return  # closes the response: the download stops here
+                        self._file.seek(0, io.SEEK_END)
+                        self._file.write(part)
+                        self._written += len(part)
+                        self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self.error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify_all()
+
+    def started(self) -> bool:
+        """Block until the first bytes (or the end) arrived; False if the fetch failed before any."""
+        with self._cond:
+            while not self._written and not self._done:
+                self._cond.wait()
+            return bool(self._written) or self.error is None
+
+    def read(self) -> bytes:
+        """Next bytes as soon as they arrive; b"" at the end. Raises if the download broke off."""
+        with self._cond:
+            while self._read >= self._written and not self._done:
+                self._cond.wait()
+            if self._read >= self._written:
+                if self.error is not None:
+                    raise self.error
+                return b""
+            self._file.seek(self._read)
+            data = self._file.read(min(ZIP_CHUNK_BYTES, self._written - self._read))
+            self._read += len(data)
+            return data
+
+    def abort(self) -> None:
+        """Stop the download at its next chunk."""
+        with self._cond:
+            self._aborted = True
+
+    def close(self) -> None:
+        with self._cond:
+            self._aborted = True
+            self._file.close()
+
+def _zip_stream(entries: List[tuple], manifest: bytes):
+    """
+    ZIP archive of `entries` ((name in archive, artifact path)) plus README.txt,
+    yielded as it is written. Up to ZIP_FETCH_WORKERS artifacts download at once;
+    entries are written in order, each streamed from its download as the bytes
+    arrive, so the first bytes go out with the first artifact's first chunk.
+    Already-compressed formats are stored rather than deflated. Artifacts that
+    cannot be fetched are skipped; one that breaks off mid-download is listed as
+    incomplete in README.txt.
+    """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    sink = _ZipSink()
+    queue = deque(entries)
+    active: "deque[tuple]" = deque()  # (name, pipe, future) in archive order
+    incomplete: List[str] = []
+    workers = max(1, ZIP_FETCH_WORKERS)
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            while queue or active:
+                while queue and len(active) < workers:
+                    fname, path = queue.popleft()
+                    pipe = _ArtifactPipe()
+                    active.append((fname, pipe, pool.submit(pipe.fetch, path)))
+                fname, pipe, _ = active[0]
+                if not pipe.started():
+                    print(f"[zip] skipping {fname}: {pipe.error}")
+                else:
+                    info = zipfile.ZipInfo(fname, date_time=time.localtime()[:6])
+                    stored = fname.lower().endswith(ZIP_STORED_EXTENSIONS)
+                    info.compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+                    with zf.open(info, mode="w", force_zip64=True) as dest:
+                        while True:
+                            try:
+                                chunk = pipe.read()
+                            except Exception as e:
+                                print(f"[zip] {fname} incomplete: {e}")
+                                incomplete.append(fname)
+                                break
+                            if not chunk:
+                                break
+                            dest.write(chunk)
+                            if sink.buf:
+                                yield sink.drain()
+                    if sink.buf:
+                        yield sink.drain()
+                active.popleft()
+                pipe.close()
+            if incomplete:
+                manifest += ("\nIncomplete (download interrupted): " + ", ".join(incomplete) + "\n").encode("utf-8")
+            zf.writestr("README.txt", manifest)
+        yield sink.drain()
+    finally:
+        # Client went away mid-export: stop the downloads still running and release
+        # each spool once its fetch has actually finished
+        for _, pipe, fut in active:
+            pipe.abort()
+            fut.add_done_callback(lambda _f, p=pipe: p.close())
+        pool.shutdown(wait=False, cancel_futures=True)
+
 @app.get("/v1/runs/{run_id}/download/all")
 def download_all_artifacts(run_id: str, user: Dict[str, Any] = Depends(require_user)):
     # Ownership check via project
@@ -2225,46 +2817,36 @@ def download_all_artifacts(run_id: str, user: Dict[str, Any] = Depends(require_u
     if not rows:
         raise HTTPException(status_code=404, detail="No artifacts to download")
 
-    # Build an in-memory ZIP
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        # Add artifacts with friendly names when recognized
-        for a in rows:
-            path = a.get("path")
-            kind = a.get("kind") or "file"
-            if not path:
-                continue
-            try:
-                raw = supabase.storage.from_("artifacts").download(path)
-                content = raw if isinstance(raw, (bytes, bytearray)) else raw.read()
-            except Exception:
-                continue
-            # Friendly filename mapping
-            if kind == "synthetic_csv":
-                fname = "synthetic.csv"
-            elif kind == "report_json":
-                fname = "report.json"
-            elif kind == "report_pdf":
-                fname = "Gesalps_Quality_Report.pdf"
-            else:
-                # fallback to basename of storage path
-                fname = path.split("/")[-1] or kind
-            zf.writestr(fname, content)
+    entries = []
+    for a in rows:
+        path = a.get("path")
+        kind = a.get("kind") or "file"
+        if not path:
+            continue
+        # Friendly filename mapping
+        if kind == "synthetic_csv":
+            fname = "synthetic.csv"
+        elif kind == "report_json":
+            fname = "report.json"
+        elif kind == "report_pdf":
+            fname = "Gesalps_Quality_Report.pdf"
+        else:
+            # fallback to basename of storage path
+            fname = path.split("/")[-1] or kind
+        entries.append((fname, path))
 
-        # Manifest
-        try:
-            title = str(r.data.get("name") or "").strip() or run_id
-        except Exception:
-            title = run_id
-        manifest = (
-            f"Gesalps Run Export\nRun: {title}\nRun ID: {run_id}\n"
-        ).encode("utf-8")
-        zf.writestr("README.txt", manifest)
+    # Manifest
+    try:
+        title = str(r.data.get("name") or "").strip() or run_id
+    except Exception:
+        title = run_id
+    manifest = (
+        f"Gesalps Run Export\nRun: {title}\nRun ID: {run_id}\n"
+    ).encode("utf-8")
 
-    buf.seek(0)
     filename = f"run_{run_id}_artifacts.zip"
     headers = {"Content-Disposition": f"attachment; filename=\"{filename}\""}
-    return StreamingResponse(buf, media_type="application/zip", headers=headers)
+    return StreamingResponse(_zip_stream(entries, manifest), media_type="application/zip", headers=headers)
 
 # Alias path for convenience
 @app.get("/v1/runs/{run_id}/download")
@@ -2401,15 +2983,10 @@ def _summarize_dataset(dataset_id: str) -> Dict[str, Any]:
     print(f"[telemetry][summarize] metadata fetched in {time.time()-t0:.2f}s")
     
     t1 = time.time()
-    # Download CSV (entire file) and read first 1000 rows
+    # Read the first 1000 rows (only the head of the CSV is transferred)
     try:
-        raw = supabase.storage.from_("datasets").download(info["file_url"])  # bytes or response
-        data = raw if isinstance(raw, (bytes, bytearray)) else raw.read()
-        print(f"[telemetry][summarize] download completed in {time.time()-t1:.2f}s ({len(data)} bytes)")
-        
-        t2 = time.time()
-        df = pd.read_csv(io.BytesIO(data), nrows=1000)
-        print(f"[telemetry][summarize] pandas parse 1000 rows in {time.time()-t2:.2f}s")
+        df = _read_dataset_head(info["file_url"], 1000)
+        print(f"[telemetry][summarize] loaded {len(df)} rows in {time.time()-t1:.2f}s")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load dataset: {e}")
 
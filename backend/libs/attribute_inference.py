@@ -0,0 +1,172 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from libs.encoding import NeighbourSpace, dataset_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Budgets keep the full audit within the old single-column check's time
+ATTR_TARGETS = int(os.getenv("ATTR_TARGETS", "2000"))                 # real records attacked
+ATTR_SYNTH_BUDGET = int(os.getenv("ATTR_SYNTH_BUDGET", "50000"))      # synthetic rows indexed
+ATTR_K = int(os.getenv("ATTR_K", "5"))                                # neighbours voting per target
+ATTR_QUERY_BATCH = int(os.getenv("ATTR_QUERY_BATCH", "4096"))         # targets per kNN query
+ATTR_MAX_SENSITIVE = int(os.getenv("ATTR_MAX_SENSITIVE", "50"))       # columns attacked per audit
+ATTR_NUMERIC_BINS = 3        # numeric sensitive columns become real-quantile classes
+ATTR_MAX_ONEHOT = 50         # categorical QIs with more levels use scaled codes
+
+
+class AttributeInferenceEngine:
+    """
+    kNN attribute-inference attack on every sensitive column at once.
+
+    The attacker knows a real record's quasi-identifiers and looks up its k
+    nearest synthetic records on those QIs; each sensitive column is guessed by
+    majority vote among the neighbours. Accuracy is compared with guessing the
+    most frequent real class, and the difference is reported per column as lift.
+
+    Built once per real dataset (through the real baseline cache): QI/sensitive
+    selection, the QI encoding (scaled numerics, one-hot categoricals), class
+    labels of the attacked real targets and their baselines are fixed, so
+    `attack(synth)` only encodes the synthetic side, builds one neighbour index
+    and answers all targets with batched queries.
+    """
+
+    def __init__(self, baseline, qis: Optional[List[str]] = None, k: int = ATTR_K,
+                 n_targets: int = ATTR_TARGETS, synth_budget: int = ATTR_SYNTH_BUDGET):
+        from libs.dataset_profile import detect_quasi_identifiers, detect_sensitive_column
+        from libs.tstr import subsample_index
+
+        self.encoder = baseline.encoder
+        self.seed = baseline.seed
+        self.k = max(1, int(k))
+        self.synth_budget = synth_budget
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        real = baseline.real
+        n = len(real)
+        nunique = {c: int(real[c].nunique(dropna=False)) for c in real.columns}
+
+        self.qis = [c for c in (qis if qis is not None else detect_quasi_identifiers(real)) if c in real.columns]
+        if not self.qis:
+            # No named QIs: the attacker knows the lowest-cardinality columns
+            ranked = sorted((c for c in real.columns if 1 < nunique[c] < n), key=lambda c: nunique[c])
+            self.qis = ranked[:3]
+
+        # Every other informative column is attacked; keyword-sensitive ones first
+        primary = detect_sensitive_column(real, self.qis)
+        # (all-distinct categoricals are identifiers, continuous numerics get binned)
+        candidates = [c for c in real.columns if c not in self.qis and nunique[c] > 1
+                      and (nunique[c] < n or self.encoder.is_numeric(c))]
+        candidates.sort(key=lambda c: c != primary)
+        self.sensitive = candidates[:ATTR_MAX_SENSITIVE]
+        self.primary = primary if primary in self.sensitive else (self.sensitive[0] if self.sensitive else None)
+
+        # QI encoding learned from the real data
+        self.space = NeighbourSpace(self.encoder, real, self.qis, max_onehot=ATTR_MAX_ONEHOT)
+
+        # Class dictionaries of the sensitive columns (shared by both sides):
+        # quantile bins for continuous numerics, real levels otherwise
+        self._edges: Dict[str, np.ndarray] = {}
+        self._levels: Dict[str, pd.Index] = {}
+        for c in self.sensitive:
+            if self.encoder.is_numeric(c) and nunique[c] > 10:
+                _, edges = pd.qcut(real[c], q=ATTR_NUMERIC_BINS, retbins=True, duplicates="drop")
+                self._edges[c] = np.asarray(edges, dtype=float)
+            elif self.encoder.is_numeric(c):
+                self._levels[c] = pd.Index(pd.unique(pd.to_numeric(real[c], errors="coerce").dropna()))
+
+        targets = real.iloc[subsample_index(n, n_targets, self.seed + 7)]
+        self.n_targets = len(targets)
+        self.X_targets = self.encode_qis(targets)
+        self.y_targets = self.labels(targets)
+        self.baselines = np.array([
+            np.bincount(self.y_targets[:, j]).max() / max(1, self.n_targets) for j in range(len(self.sensitive))
+        ], dtype=float)
+
+    # -------------------- encodings --------------------
+
+    def encode_qis(self, df: pd.DataFrame) -> np.ndarray:
+        return self.space.transform(df)
+
+    def labels(self, df: pd.DataFrame) -> np.ndarray:
+        """(n_rows, n_sensitive) class labels in the real dictionaries; 0 = missing or unseen value."""
+        n = len(df)
+        out = np.zeros((n, len(self.sensitive)), dtype=np.int64)
+        for j, c in enumerate(self.sensitive):
+            if c not in df.columns:
+                continue
+            if c in self._edges:
+                vals = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+                lab = np.digitize(vals, self._edges[c][1:-1], right=True)
+                lab[np.isnan(vals)] = -1
+            elif c in self._levels:
+                lab = self._levels[c].get_indexer(pd.to_numeric(df[c], errors="coerce"))
+            else:
+                lab = self.encoder.encode_column(df[c], c, n).astype(np.int64)
+            out[:, j] = lab + 1
+        return out
+
+    # -------------------- attack --------------------
+
+    def _neighbours(self, X_synth: np.ndarray) -> np.ndarray:
+        from sklearn.neighbors import NearestNeighbors
+
+        k = min(self.k, len(X_synth))
+        index = NearestNeighbors(n_neighbors=k).fit(X_synth)
+        parts = []
+        for start in range(0, self.n_targets, max(1, ATTR_QUERY_BATCH)):
+            parts.append(index.kneighbors(self.X_targets[start:start + ATTR_QUERY_BATCH], return_distance=False))
+        return np.vstack(parts)
+
+    def attack(self, synth: pd.DataFrame) -> Dict[str, Any]:
+        """Per-column accuracy/baseline/lift of the kNN attack plus max/mean lift."""
+        from libs.tstr import subsample_index
+
+        key = dataset_fingerprint(synth)
+        with self._lock:
+            if key in self._last:
+                return self._last[key]
+
+        start = time.time()
+        result: Dict[str, Any] = {"qis": list(self.qis), "primary": self.primary, "k": self.k,
+                                  "targets": self.n_targets, "columns": {}}
+        if not self.sensitive or self.X_targets.shape[1] == 0 or len(synth) == 0:
+            result.update({"max_lift": None, "mean_lift": None, "primary_lift": None, "elapsed_s": 0.0})
+            return result
+
+        s = synth.iloc[subsample_index(len(synth), self.synth_budget, self.seed)]
+        neigh = self._neighbours(self.encode_qis(s))              # (targets, k)
+        # Labels are re-coded against the real dictionaries; classes the real data
+        # never had collapse into one "unknown" class that can never be correct
+        y_synth = self.labels(s)
+        guesses = y_synth[neigh]                                  # (targets, k, sensitive)
+
+        rows = np.arange(self.n_targets)
+        lifts = []
+        for j, col in enumerate(self.sensitive):
+            n_cls = int(max(self.y_targets[:, j].max(), guesses[:, :, j].max())) + 1
+            votes = np.zeros((self.n_targets, n_cls), dtype=np.int32)
+            np.add.at(votes, (np.repeat(rows, neigh.shape[1]), guesses[:, :, j].ravel()), 1)
+            acc = float(np.mean(votes.argmax(axis=1) == self.y_targets[:, j]))
+            lift = max(0.0, acc - float(self.baselines[j]))
+            lifts.append(lift)
+            result["columns"][col] = {"accuracy": acc, "baseline": float(self.baselines[j]), "lift": lift}
+
+        worst = int(np.argmax(lifts))
+        result.update({
+            "max_lift": float(lifts[worst]),
+            "mean_lift": float(np.mean(lifts)),
+            "primary_lift": result["columns"][self.primary]["lift"] if self.primary else None,
+            "worst_column": self.sensitive[worst],
+            "elapsed_s": round(time.time() - start, 4),
+        })
+        with self._lock:
+            self._last = {key: result}
+        return result
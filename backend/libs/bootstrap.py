@@ -0,0 +1,320 @@
+"""
+Bootstrap confidence intervals for the headline metrics (KS mean, corr Δ,
+dup rate, MIA AUC).
+
+Replicates resample row *indices*, not frames: every replicate is a pair of
+multinomial count vectors over the real and synthetic rows, applied as
+weights to arrays prepared once from the shared encoded representation
+(presorted numeric columns for KS, complete numeric rows for the correlation
+matrices, distinct real-matching synthetic rows, held-out MIA scores).
+Replicates are split into seeded chunks and run in a process pool, so
+intervals are reproducible for a given seed regardless of the number of
+workers. The pool is started with forkserver (never forked from the metric
+thread) and stops at the caller's metric deadline, keeping the replicates
+finished so far.
+
+The compliance gates (libs.compliance.ci_gate_value) can then compare a CI
+bound instead of the point estimate, so borderline runs stop flipping between
+pass and fail from sampling noise. They only do so when the CI's estimate is
+the reported point value.
+"""
+
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_N = int(os.getenv("BOOTSTRAP_N", "200"))
+BOOTSTRAP_LEVEL = float(os.getenv("BOOTSTRAP_LEVEL", "0.95"))
+BOOTSTRAP_ROW_BUDGET = int(os.getenv("BOOTSTRAP_ROW_BUDGET", "50000"))   # rows per side
+BOOTSTRAP_MAX_COLS = int(os.getenv("BOOTSTRAP_MAX_COLS", "100"))         # numeric columns resampled
+BOOTSTRAP_WORKERS = int(os.getenv("BOOTSTRAP_WORKERS", str(min(4, os.cpu_count() or 1))))
+BOOTSTRAP_START_METHOD = os.getenv("BOOTSTRAP_START_METHOD", "forkserver")  # forkserver | spawn
+BOOTSTRAP_CHUNK = 25  # replicates per pool task
+
+# Set in pool workers by _init_worker
+_SHARED: Optional["BootstrapInputs"] = None
+
+
+def _ks_layout(r: np.ndarray, s: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """Merged sort order of one column: (order, valid_r, valid_s, tie-group ends)."""
+    valid_r, valid_s = ~np.isnan(r), ~np.isnan(s)
+    if not valid_r.any() or not valid_s.any():
+        return None
+    merged = np.concatenate([np.where(valid_r, r, np.inf), np.where(valid_s, s, np.inf)])
+    order = np.argsort(merged, kind="mergesort")
+    ordered = merged[order]
+    ends = np.append(ordered[1:] != ordered[:-1], True)
+    return order, valid_r, valid_s, ends
+
+
+def _weighted_auc(y_sorted: np.ndarray, group_ends: np.ndarray, w: np.ndarray) -> Optional[float]:
+    """Mann-Whitney AUC of scores (pre-sorted ascending) with per-item weights; ties count half."""
+    pos = np.where(y_sorted == 1, w, 0.0)
+    neg = w - pos
+    n_pos, n_neg = pos.sum(), neg.sum()
+    if n_pos <= 0 or n_neg <= 0:
+        return None
+    group_id = np.concatenate([[0], np.cumsum(group_ends[:-1])])
+    g_pos = np.bincount(group_id, weights=pos)
+    g_neg = np.bincount(group_id, weights=neg)
+    neg_below = np.cumsum(g_neg) - g_neg
+    return float(np.sum(g_pos * (neg_below + 0.5 * g_neg)) / (n_pos * n_neg))
+
+
+def _weighted_corr(X: np.ndarray, w: np.ndarray) -> np.ndarray:
+    total = w.sum()
+    mean = (w @ X) / total
+    Xc = X - mean
+    cov = (Xc * w[:, None]).T @ Xc / total
+    sd = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.outer(sd, sd)
+    return corr
+
+
+class BootstrapInputs:
+    """
+    Everything the replicates need, prepared once per (real, synth) pair.
+
+    Real/synth rows are encoded with the baseline's FrameEncoder (shared
+    category dictionaries), so duplicate detection and numeric columns agree
+    with the other metric engines.
+    """
+
+    def __init__(self, real: pd.DataFrame, synth: pd.DataFrame, encoder=None,
+                 mia_scores: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                 row_budget: int = BOOTSTRAP_ROW_BUDGET, max_cols: int = BOOTSTRAP_MAX_COLS, seed: int = 0):
+        from libs.encoding import FrameEncoder
+        from libs.tstr import subsample_index
+
+        encoder = encoder or FrameEncoder().fit(real)
+        common = [c for c in encoder.columns if c in synth.columns]
+        real = real.iloc[subsample_index(len(real), row_budget, seed)]
+        synth = synth.iloc[subsample_index(len(synth), row_budget, seed + 1)]
+        self.n_real, self.n_synth = len(real), len(synth)
+
+        numeric = [c for c in common if encoder.is_numeric(c)][:max_cols]
+        R = real[numeric].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        S = synth[numeric].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+
+        # KS: one merged sort per column, reused by every replicate
+        self.ks_layouts = []
+        for j in range(len(numeric)):
+            layout = _ks_layout(R[:, j], S[:, j])
+            if layout is not None:
+                self.ks_layouts.append(layout)
+
+        # Correlation Δ over complete numeric rows (weighted Pearson per replicate)
+        self.corr_real = self.corr_synth = None
+        self.corr_rows_real = self.corr_rows_synth = None
+        if len(numeric) >= 2:
+            self.corr_rows_real = np.flatnonzero(~np.isnan(R).any(axis=1))
+            self.corr_rows_synth = np.flatnonzero(~np.isnan(S).any(axis=1))
+            self.corr_real = R[self.corr_rows_real]
+            self.corr_synth = S[self.corr_rows_synth]
+            self.triu = np.triu_indices(len(numeric), k=1)
+
+        # Dup rate as the worker defines it: distinct synthetic rows that occur in the
+        # real data over all synthetic rows. Real-matching rows are grouped by content,
+        # and a group counts once in a replicate if any of its rows was drawn.
+        self.dup_rows = self.dup_groups = None
+        self.n_dup_groups = 0
+        if common:
+            enc_r = np.ascontiguousarray(encoder.transform(real, common))
+            enc_s = np.ascontiguousarray(encoder.transform(synth, common))
+            real_rows = {row.tobytes() for row in enc_r}
+            groups: Dict[bytes, int] = {}
+            rows, ids = [], []
+            for i, row in enumerate(enc_s):
+                key = row.tobytes()
+                if key in real_rows:
+                    rows.append(i)
+                    ids.append(groups.setdefault(key, len(groups)))
+            self.dup_rows = np.asarray(rows, dtype=np.int64)
+            self.dup_groups = np.asarray(ids, dtype=np.int64)
+            self.n_dup_groups = len(groups)
+
+        # MIA: held-out (membership label, score) pairs from a model trained once
+        self.mia = None
+        if mia_scores is not None:
+            y, score = (np.asarray(a, dtype=np.float64) for a in mia_scores)
+            order = np.argsort(score, kind="mergesort")
+            ordered = score[order]
+            self.mia = (y[order].astype(np.int8), np.append(ordered[1:] != ordered[:-1], True))
+
+    # -------------------- statistics (counts → value) --------------------
+
+    def ks_mean(self, c_real: np.ndarray, c_synth: np.ndarray) -> Optional[float]:
+        vals = []
+        for order, valid_r, valid_s, ends in self.ks_layouts:
+            wr = c_real * valid_r
+            ws = c_synth * valid_s
+            tr, ts = wr.sum(), ws.sum()
+            if tr <= 0 or ts <= 0:
+                continue
+            step = np.concatenate([wr / tr, -ws / ts])[order]
+            diff = np.cumsum(step)[ends]
+            vals.append(float(np.abs(diff).max()))
+        return float(np.mean(vals)) if vals else None
+
+    def corr_delta(self, c_real: np.ndarray, c_synth: np.ndarray) -> Optional[float]:
+        if self.corr_real is None:
+            return None
+        wr, ws = c_real[self.corr_rows_real], c_synth[self.corr_rows_synth]
+        if wr.sum() < 3 or ws.sum() < 3:
+            return None
+        delta = np.abs(_weighted_corr(self.corr_real, wr) - _weighted_corr(self.corr_synth, ws))[self.triu]
+        delta = delta[np.isfinite(delta)]
+        return float(delta.mean()) if delta.size else None
+
+    def dup_rate(self, c_synth: np.ndarray) -> Optional[float]:
+        if self.dup_rows is None:
+            return None
+        drawn = np.bincount(self.dup_groups, weights=c_synth[self.dup_rows], minlength=self.n_dup_groups)
+        return float(np.count_nonzero(drawn) / max(1.0, c_synth.sum()))
+
+    def mia_auc(self, c_mia: np.ndarray) -> Optional[float]:
+        if self.mia is None:
+            return None
+        y_sorted, ends = self.mia
+        return _weighted_auc(y_sorted, ends, c_mia)
+
+    def statistics(self, c_real: np.ndarray, c_synth: np.ndarray, c_mia: Optional[np.ndarray]) -> Dict[str, Optional[float]]:
+        return {
+            "ks_mean": self.ks_mean(c_real, c_synth),
+            "corr_delta": self.corr_delta(c_real, c_synth),
+            "dup_rate": self.dup_rate(c_synth),
+            "mia_auc": self.mia_auc(c_mia) if c_mia is not None else None,
+        }
+
+    def point_estimates(self) -> Dict[str, Optional[float]]:
+        n_mia = len(self.mia[0]) if self.mia is not None else 0
+        return self.statistics(np.ones(self.n_real), np.ones(self.n_synth), np.ones(n_mia) if n_mia else None)
+
+    def replicates(self, seed_seq: np.random.SeedSequence, n_reps: int) -> Dict[str, List[Optional[float]]]:
+        rng = np.random.default_rng(seed_seq)
+        n_mia = len(self.mia[0]) if self.mia is not None else 0
+        out: Dict[str, List[Optional[float]]] = {"ks_mean": [], "corr_delta": [], "dup_rate": [], "mia_auc": []}
+        for _ in range(n_reps):
+            c_real = np.bincount(rng.integers(0, self.n_real, self.n_real), minlength=self.n_real).astype(np.float64)
+            c_synth = np.bincount(rng.integers(0, self.n_synth, self.n_synth), minlength=self.n_synth).astype(np.float64)
+            c_mia = np.bincount(rng.integers(0, n_mia, n_mia), minlength=n_mia).astype(np.float64) if n_mia else None
+            for k, v in self.statistics(c_real, c_synth, c_mia).items():
+                out[k].append(v)
+        return out
+
+
+def _init_worker(inputs: BootstrapInputs) -> None:
+    global _SHARED
+    _SHARED = inputs
+
+
+def _run_chunk(seed_seq: np.random.SeedSequence, n_reps: int) -> Dict[str, List[Optional[float]]]:
+    return _SHARED.replicates(seed_seq, n_reps)
+
+
+def _run_pooled(inputs: BootstrapInputs, seeds: List[np.random.SeedSequence], sizes: List[int], workers: int,
+                deadline: Optional[float], done: Dict[int, Dict[str, List[Optional[float]]]]) -> bool:
+    """Fill `done` (chunk index → replicates) from a process pool; True if the deadline cut it short."""
+    ctx = multiprocessing.get_context(BOOTSTRAP_START_METHOD)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(inputs,))
+    try:
+        pending = {pool.submit(_run_chunk, s, n): i for i, (s, n) in enumerate(zip(seeds, sizes))}
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            finished, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not finished:
+                return True
+            for future in finished:
+                done[pending.pop(future)] = future.result()
+        return False
+    finally:
+        # Queued chunks are cancelled; a running one is at most BOOTSTRAP_CHUNK replicates
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _centred_ci(values: List[Optional[float]], estimate: float, level: float) -> Optional[Tuple[float, float]]:
+    """
+    Percentile interval re-centred on the point estimate, clipped to [0, 1].
+
+    Distance statistics (KS, corr Δ) are biased upward under resampling - the
+    replicates of a near-perfect synthetic set all sit above its estimate - so
+    the spread of the replicates is kept but shifted to their median's offset.
+    """
+    arr = np.array([v for v in values if v is not None], dtype=np.float64)
+    if arr.size < 10:
+        return None
+    alpha = (1.0 - level) / 2.0
+    lo, med, hi = np.quantile(arr, [alpha, 0.5, 1.0 - alpha])
+    return float(np.clip(estimate + lo - med, 0.0, 1.0)), float(np.clip(estimate + hi - med, 0.0, 1.0))
+
+
+def bootstrap_cis(real: pd.DataFrame, synth: pd.DataFrame, encoder=None,
+                  mia_scores: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                  n_boot: int = BOOTSTRAP_N, level: float = BOOTSTRAP_LEVEL, seed: int = 0,
+                  workers: int = BOOTSTRAP_WORKERS, row_budget: int = BOOTSTRAP_ROW_BUDGET) -> Dict[str, Any]:
+    """
+    Bootstrap CIs (see _centred_ci) for ks_mean, corr_delta, dup_rate and (given
+    held-out `mia_scores` = (membership labels, scores)) mia_auc.
+
+    Returns {metric: {"estimate", "low", "high"}, ..., "n_boot", "level",
+    "rows", "elapsed_s"[, "truncated"]}; metrics that cannot be computed are
+    omitted. Point estimates are the statistics on the full (budgeted) sample
+    as the bootstrap sees it: KS and corr Δ match the exact metrics up to the
+    row budget (corr Δ uses complete numeric rows), dup rate counts distinct
+    real-matching synthetic rows like the worker's _dup_rate and the MIA AUC
+    is the held-out AUC of the given scores. Past the caller's metric deadline
+    no new chunks start; "n_boot" counts the replicates actually drawn.
+    """
+    start = time.time()
+    inputs = BootstrapInputs(real, synth, encoder=encoder, mia_scores=mia_scores, row_budget=row_budget, seed=seed)
+    n_boot = max(10, int(n_boot))
+    # Chunking (and so every replicate's seed) depends on n_boot only, not on the pool size
+    n_chunks = -(-n_boot // BOOTSTRAP_CHUNK)
+    sizes = [n_boot // n_chunks + (1 if i < n_boot % n_chunks else 0) for i in range(n_chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+
+    from libs.metric_profiles import metric_deadline
+    deadline = metric_deadline()
+    done: Dict[int, Dict[str, List[Optional[float]]]] = {}
+    truncated = False
+    if workers > 1:
+        try:
+            truncated = _run_pooled(inputs, seeds, sizes, workers, deadline, done)
+        except Exception as e:
+            logger.warning(f"[bootstrap] Process pool unavailable ({type(e).__name__}: {e}); running serially")
+    if not truncated:
+        for i, (s, n) in enumerate(zip(seeds, sizes)):
+            if i in done:
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                truncated = True
+                break
+            done[i] = inputs.replicates(s, n)
+    chunks = [done[i] for i in sorted(done)]
+
+    result: Dict[str, Any] = {}
+    estimates = inputs.point_estimates()
+    for metric, estimate in estimates.items():
+        if estimate is None:
+            continue
+        ci = _centred_ci([v for chunk in chunks for v in chunk[metric]], estimate, level)
+        if ci is not None:
+            result[metric] = {"estimate": estimate, "low": ci[0], "high": ci[1]}
+    result.update({
+        "n_boot": sum(sizes[i] for i in done),
+        "level": level,
+        "rows": {"real": inputs.n_real, "synth": inputs.n_synth},
+        "elapsed_s": round(time.time() - start, 3),
+    })
+    if truncated:
+        result["truncated"] = True
+    return result
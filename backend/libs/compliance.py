@@ -13,6 +13,10 @@ from dataclasses import dataclass, asdict
 
 logger = logging.getLogger(__name__)
 
+# Which bound of a bootstrap CI the gates compare (see ci_gate_value); empty = point estimates
+COMPLIANCE_CI_GATE = os.getenv("COMPLIANCE_CI_GATE", "").strip().lower() or None
+CI_GATE_MODES = ("lenient", "strict")
+
 
 class ComplianceLevel(Enum):
     """Compliance levels for different regulatory frameworks."""
@@ -60,6 +64,7 @@ class ComplianceConfig:
     require_dp_proof: bool = False
     require_audit_log: bool = True
     min_sample_size: int = 100  # Minimum rows for valid synthesis
+    ci_gate: Optional[str] = None  # "lenient" | "strict" | None (point estimates)
 
 
 # Predefined compliance configurations
@@ -142,6 +147,51 @@ COMPLIANCE_CONFIGS = {
 }
 
 
+# Largest |CI estimate - reported value| for which a CI is taken to describe the reported value
+CI_ESTIMATE_TOL = 1e-6
+
+
+def ci_estimate_matches(ci: Any, value: Any) -> bool:
+    """True when a bootstrap CI was computed around `value` (same estimator, same sample)."""
+    if not isinstance(ci, dict) or ci.get("estimate") is None or value is None:
+        return False
+    try:
+        return abs(float(ci["estimate"]) - float(value)) <= CI_ESTIMATE_TOL
+    except (TypeError, ValueError):
+        return False
+
+
+def ci_gate_value(section: Dict[str, Any], metric: str, mode: Optional[str],
+                  higher_is_better: bool = False) -> Tuple[Optional[float], Optional[Dict[str, float]]]:
+    """Value a gate compares for `metric`, and the CI it came from (if any).
+
+    Metric sections may carry bootstrap intervals under "ci" (libs.bootstrap):
+    {"ci": {"ks_mean": {"estimate", "low", "high"}, ...}}.
+
+    - None:      the point estimate.
+    - "lenient": the favourable bound - a gate fails only when the whole CI
+                 violates the threshold (retry decisions ignore noise).
+    - "strict":  the unfavourable bound - a gate passes only when the whole CI
+                 satisfies it (certification).
+    Without a CI for the metric, or with one whose estimate is not the reported
+    value (another estimator or sample), the point estimate is used in every mode.
+    """
+    value = section.get(metric)
+    ci = (section.get("ci") or {}).get(metric) if isinstance(section.get("ci"), dict) else None
+    if value is None or mode not in CI_GATE_MODES or not ci_estimate_matches(ci, value):
+        return value, None
+    favourable = "high" if higher_is_better else "low"
+    unfavourable = "low" if higher_is_better else "high"
+    bound = ci.get(favourable if mode == "lenient" else unfavourable)
+    if bound is None:
+        return value, None
+    return float(bound), ci
+
+
+def _ci_note(ci: Optional[Dict[str, float]]) -> str:
+    return f" (CI {ci['low']:.3f}-{ci['high']:.3f})" if ci else ""
+
+
 class ComplianceEvaluator:
     """Evaluates synthetic data against compliance thresholds."""
     
@@ -157,11 +207,14 @@ class ComplianceEvaluator:
             config = COMPLIANCE_CONFIGS.get(level, COMPLIANCE_CONFIGS[ComplianceLevel.HIPAA_LIKE])
         self.config = config
     
-    def evaluate(self, metrics: Dict[str, Any]) -> Dict[str, Any]:
+    def evaluate(self, metrics: Dict[str, Any], ci_gate: Optional[str] = None) -> Dict[str, Any]:
         """Evaluate metrics against compliance thresholds.
         
         Args:
             metrics: Dictionary with 'privacy', 'utility', 'fairness' keys.
+            ci_gate: Which bootstrap CI bound to gate MIA/dup/KS/corr on
+                ("lenient" | "strict"); defaults to config.ci_gate, then
+                COMPLIANCE_CI_GATE. Point estimates when unset or no CI.
             
         Returns:
             Dictionary with:
@@ -181,16 +234,17 @@ class ComplianceEvaluator:
         privacy_passed = True
         utility_passed = True
         fairness_passed = True
+        gate = ci_gate or self.config.ci_gate or COMPLIANCE_CI_GATE
         
         # Privacy checks
-        mia_auc = privacy_metrics.get("mia_auc")
+        mia_auc, mia_ci = ci_gate_value(privacy_metrics, "mia_auc", gate)
         if mia_auc is not None and mia_auc > self.config.privacy.mia_auc_max:
-            violations.append(f"MIA AUC {mia_auc:.3f} exceeds threshold {self.config.privacy.mia_auc_max}")
+            violations.append(f"MIA AUC {mia_auc:.3f}{_ci_note(mia_ci)} exceeds threshold {self.config.privacy.mia_auc_max}")
             privacy_passed = False
         
-        dup_rate = privacy_metrics.get("dup_rate")
+        dup_rate, dup_ci = ci_gate_value(privacy_metrics, "dup_rate", gate)
         if dup_rate is not None and dup_rate > self.config.privacy.dup_rate_max:
-            violations.append(f"Duplicate rate {dup_rate:.1%} exceeds threshold {self.config.privacy.dup_rate_max:.1%}")
+            violations.append(f"Duplicate rate {dup_rate:.1%}{_ci_note(dup_ci)} exceeds threshold {self.config.privacy.dup_rate_max:.1%}")
             privacy_passed = False
         
         k_anon = privacy_metrics.get("k_anonymization")
@@ -219,14 +273,14 @@ class ComplianceEvaluator:
                         privacy_passed = False
         
         # Utility checks
-        ks_mean = utility_metrics.get("ks_mean")
+        ks_mean, ks_ci = ci_gate_value(utility_metrics, "ks_mean", gate)
         if ks_mean is not None and ks_mean > self.config.utility.ks_mean_max:
-            violations.append(f"KS mean {ks_mean:.3f} exceeds threshold {self.config.utility.ks_mean_max}")
+            violations.append(f"KS mean {ks_mean:.3f}{_ci_note(ks_ci)} exceeds threshold {self.config.utility.ks_mean_max}")
             utility_passed = False
         
-        corr_delta = utility_metrics.get("corr_delta")
+        corr_delta, corr_ci = ci_gate_value(utility_metrics, "corr_delta", gate)
         if corr_delta is not None and corr_delta > self.config.utility.corr_delta_max:
-            violations.append(f"Correlation delta {corr_delta:.3f} exceeds threshold {self.config.utility.corr_delta_max}")
+            violations.append(f"Correlation delta {corr_delta:.3f}{_ci_note(corr_ci)} exceeds threshold {self.config.utility.corr_delta_max}")
             utility_passed = False
         
         jensenshannon = utility_metrics.get("jensenshannon_dist")
@@ -281,6 +335,7 @@ class ComplianceEvaluator:
             "violations": violations,
             "score": score,
             "level": self.config.level.value,
+            "ci_gate": gate if gate in CI_GATE_MODES else None,
             "timestamp": datetime.utcnow().isoformat(),
         }
     
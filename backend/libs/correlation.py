@@ -0,0 +1,264 @@
+"""
+Blockwise association engine for real-vs-synthetic correlation deltas.
+
+Columns are processed in blocks, so peak memory is O(block_size²) per matrix
+product instead of O(p²) for the whole table. Pair types:
+  - numeric/numeric:         Pearson or Spearman (pairwise-complete, like DataFrame.corr)
+  - categorical/categorical: Cramér's V (from one-hot contingency products)
+  - numeric/categorical:     correlation ratio η
+Only running sums and a top-k heap of the worst pairs are kept, so tables with
+thousands of columns are feasible.
+"""
+
+import os
+import heapq
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CORR_BLOCK_SIZE = int(os.getenv("CORR_BLOCK_SIZE", "256"))
+CORR_MAX_CATEGORIES = int(os.getenv("CORR_MAX_CATEGORIES", "100"))  # wider columns (IDs, free text) are skipped
+CORR_ROW_BUDGET = int(os.getenv("CORR_ROW_BUDGET", "200000"))
+CORR_TOP_K = int(os.getenv("CORR_TOP_K", "10"))
+
+
+def _blocks(n: int, size: int) -> List[Tuple[int, int]]:
+    size = max(1, size)
+    return [(s, min(n, s + size)) for s in range(0, n, size)]
+
+
+class _NumericSide:
+    """Centered values (0 where missing) and presence mask for one frame."""
+
+    def __init__(self, X: np.ndarray, method: str):
+        X = np.asarray(X, dtype=np.float64)
+        if method == "spearman":
+            X = pd.DataFrame(X).rank(method="average").to_numpy(dtype=np.float64)
+        self.M = ~np.isnan(X)
+        self.complete = bool(self.M.all())
+        with np.errstate(all="ignore"):
+            mean = np.nan_to_num(np.nanmean(X, axis=0)) if len(X) else np.zeros(X.shape[1])
+        self.Z = np.where(self.M, X - mean, 0.0)
+        self.Mf = self.M.astype(np.float64)
+
+    def corr_block(self, a: Tuple[int, int], b: Tuple[int, int]) -> np.ndarray:
+        Za, Zb = self.Z[:, a[0]:a[1]], self.Z[:, b[0]:b[1]]
+        with np.errstate(all="ignore"):
+            if self.complete:
+                sa = np.sqrt((Za * Za).sum(axis=0))
+                sb = np.sqrt((Zb * Zb).sum(axis=0))
+                c = (Za.T @ Zb) / np.outer(sa, sb)
+            else:
+                # Pairwise-complete moments over rows where both columns are present
+                Ma, Mb = self.Mf[:, a[0]:a[1]], self.Mf[:, b[0]:b[1]]
+                N = Ma.T @ Mb
+                n = np.where(N > 1, N, np.nan)
+                mx, my = (Za.T @ Mb) / n, (Ma.T @ Zb) / n
+                vx = ((Za * Za).T @ Mb) / n - mx ** 2
+                vy = (Ma.T @ (Zb * Zb)) / n - my ** 2
+                c = ((Za.T @ Zb) / n - mx * my) / np.sqrt(vx * vy)
+        c[~np.isfinite(c)] = np.nan
+        return np.clip(c, -1.0, 1.0)
+
+
+class _CategoricalSide:
+    """Sparse one-hot encoding of the categorical columns (shared real dictionaries)."""
+
+    def __init__(self, codes: np.ndarray, sizes: List[int]):
+        from scipy import sparse
+
+        self.sizes = sizes
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+        n, p = codes.shape
+        rows, cols = [], []
+        for j in range(p):
+            valid = codes[:, j] >= 0  # unknown synthetic values → no indicator
+            rows.append(np.nonzero(valid)[0])
+            cols.append(codes[valid, j] + self.offsets[j])
+        data_rows = np.concatenate(rows) if rows else np.empty(0, dtype=int)
+        data_cols = np.concatenate(cols) if cols else np.empty(0, dtype=int)
+        self.onehot = sparse.csr_matrix(
+            (np.ones(len(data_rows)), (data_rows, data_cols)), shape=(n, int(self.offsets[-1]))
+        ).tocsc()
+
+    def block(self, blk: Tuple[int, int]):
+        return self.onehot[:, self.offsets[blk[0]]:self.offsets[blk[1]]]
+
+    def cramers_v_block(self, a: Tuple[int, int], b: Tuple[int, int]) -> np.ndarray:
+        table = (self.block(a).T @ self.block(b)).toarray()
+        out = np.full((a[1] - a[0], b[1] - b[0]), np.nan)
+        oa, ob = self.offsets[a[0]:a[1] + 1] - self.offsets[a[0]], self.offsets[b[0]:b[1] + 1] - self.offsets[b[0]]
+        for i in range(a[1] - a[0]):
+            for j in range(b[1] - b[0]):
+                out[i, j] = _cramers_v(table[oa[i]:oa[i + 1], ob[j]:ob[j + 1]])
+        return out
+
+    def eta_block(self, num: _NumericSide, nb: Tuple[int, int], cb: Tuple[int, int]) -> np.ndarray:
+        """Correlation ratio η for numeric block `nb` against categorical block `cb`."""
+        O = self.block(cb)
+        Z, M = num.Z[:, nb[0]:nb[1]], num.Mf[:, nb[0]:nb[1]]
+        # Per-level sums, counts and squared sums over rows where the numeric value is present
+        sums = np.asarray(O.T @ Z)
+        counts = np.asarray(O.T @ M)
+        squares = np.asarray(O.T @ (Z * Z))
+        out = np.full((nb[1] - nb[0], cb[1] - cb[0]), np.nan)
+        oc = self.offsets[cb[0]:cb[1] + 1] - self.offsets[cb[0]]
+        with np.errstate(all="ignore"):
+            for j in range(cb[1] - cb[0]):
+                s, cnt = sums[oc[j]:oc[j + 1]], counts[oc[j]:oc[j + 1]]
+                n = cnt.sum(axis=0)
+                grand = s.sum(axis=0) / n
+                between = (s * s / np.where(cnt > 0, cnt, np.inf)).sum(axis=0) - n * grand ** 2
+                total = squares[oc[j]:oc[j + 1]].sum(axis=0) - n * grand ** 2
+                eta = np.sqrt(np.clip(between / total, 0.0, 1.0))
+                eta[(n < 2) | ~(total > 0)] = np.nan
+                out[:, j] = eta
+        return out
+
+
+def _cramers_v(table: np.ndarray) -> float:
+    n = table.sum()
+    if n <= 0:
+        return np.nan
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    r, k = table.shape
+    if min(r, k) < 2:
+        return np.nan
+    expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+    chi2 = float(((table - expected) ** 2 / expected).sum())
+    return float(np.sqrt(chi2 / (n * (min(r, k) - 1))))
+
+
+class CorrelationEngine:
+    """
+    Real-side preparation for association deltas, built once per real dataset.
+
+    Uses the shared FrameEncoder dictionaries so categorical codes line up between
+    real and synthetic frames. `compare(synth)` streams over column-block pairs
+    and returns mean absolute deltas per pair type plus the top-k worst pairs.
+
+    `real_corr` = (columns, matrix) is a precomputed real Pearson matrix (from
+    the dataset profile); when it covers every numeric column the real side of
+    numeric pairs becomes a lookup.
+    """
+
+    def __init__(self, real: pd.DataFrame, encoder=None, method: str = "pearson",
+                 block_size: int = CORR_BLOCK_SIZE, row_budget: int = CORR_ROW_BUDGET, seed: int = 42,
+                 real_corr: Optional[Tuple[List[str], np.ndarray]] = None):
+        if encoder is None:
+            from libs.encoding import FrameEncoder
+            encoder = FrameEncoder().fit(real)
+        self.encoder = encoder
+        self.method = method
+        self.block_size = block_size
+        self.row_budget = row_budget
+        self.seed = seed
+        # Same column roles as select_dtypes(include=[np.number]) in the legacy corr_delta
+        self.numeric = [c for c in real.columns if real[c].dtype.kind in 'iuf']
+        self.categorical = [
+            c for c in real.columns
+            if c not in self.numeric and 2 <= len(encoder.categories.get(c, [])) <= CORR_MAX_CATEGORIES
+        ]
+        self._real = self._prepare(real)
+        self._real_corr = None
+        if real_corr is not None and method == "pearson":
+            cols, mat = real_corr
+            pos = {str(c): i for i, c in enumerate(cols)}
+            if all(str(c) in pos for c in self.numeric):
+                idx = [pos[str(c)] for c in self.numeric]
+                self._real_corr = np.asarray(mat, dtype=np.float64)[np.ix_(idx, idx)]
+
+    def _real_corr_block(self, a: Tuple[int, int], b: Tuple[int, int]) -> np.ndarray:
+        if self._real_corr is not None:
+            return self._real_corr[a[0]:a[1], b[0]:b[1]]
+        return self._real["num"].corr_block(a, b)
+
+    def _sample(self, df: pd.DataFrame) -> pd.DataFrame:
+        from libs.tstr import subsample_index
+        return df.iloc[subsample_index(len(df), self.row_budget, self.seed)]
+
+    def _prepare(self, df: pd.DataFrame) -> Dict[str, Any]:
+        df = self._sample(df)
+        out: Dict[str, Any] = {"num": None, "cat": None}
+        if self.numeric:
+            X = np.column_stack([
+                pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+                if c in df.columns else np.full(len(df), np.nan)
+                for c in self.numeric
+            ])
+            out["num"] = _NumericSide(X, self.method)
+        if self.categorical:
+            codes = np.column_stack([
+                self.encoder.categories[c].get_indexer(df[c].astype(str)) if c in df.columns
+                else np.full(len(df), -1)
+                for c in self.categorical
+            ])
+            out["cat"] = _CategoricalSide(codes, [len(self.encoder.categories[c]) for c in self.categorical])
+        return out
+
+    def compare(self, synth: pd.DataFrame, top_k: Optional[int] = CORR_TOP_K) -> Dict[str, Any]:
+        s = self._prepare(synth)
+        r = self._real
+        sums = {"numeric": [0.0, 0], "categorical": [0.0, 0], "mixed": [0.0, 0]}
+        heap: List[Tuple[float, str, str, str, float, float]] = []
+
+        def consume(kind: str, ra: np.ndarray, sa: np.ndarray, rows: List[str], cols: List[str], upper: bool):
+            diff = np.abs(ra - sa)
+            mask = np.isfinite(diff)
+            if upper:
+                mask &= np.triu(np.ones_like(mask, dtype=bool), k=1)
+            if not mask.any():
+                return
+            sums[kind][0] += float(diff[mask].sum())
+            sums[kind][1] += int(mask.sum())
+            if top_k:
+                ii, jj = np.nonzero(mask)
+                vals = diff[ii, jj]
+                if len(vals) > top_k:
+                    sel = np.argpartition(-vals, top_k - 1)[:top_k]
+                    ii, jj, vals = ii[sel], jj[sel], vals[sel]
+                for i, j, v in zip(ii, jj, vals):
+                    item = (float(v), rows[i], cols[j], kind, float(ra[i, j]), float(sa[i, j]))
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, item)
+                    elif item[0] > heap[0][0]:
+                        heapq.heapreplace(heap, item)
+
+        nblocks = _blocks(len(self.numeric), self.block_size)
+        cblocks = _blocks(len(self.categorical), self.block_size)
+        if r["num"] is not None:
+            for bi, a in enumerate(nblocks):
+                for b in nblocks[bi:]:
+                    consume("numeric", self._real_corr_block(a, b), s["num"].corr_block(a, b),
+                            self.numeric[a[0]:a[1]], self.numeric[b[0]:b[1]], upper=(a == b))
+        if r["cat"] is not None:
+            for bi, a in enumerate(cblocks):
+                for b in cblocks[bi:]:
+                    consume("categorical", r["cat"].cramers_v_block(a, b), s["cat"].cramers_v_block(a, b),
+                            self.categorical[a[0]:a[1]], self.categorical[b[0]:b[1]], upper=(a == b))
+        if r["num"] is not None and r["cat"] is not None:
+            for a in nblocks:
+                for b in cblocks:
+                    consume("mixed", r["cat"].eta_block(r["num"], a, b), s["cat"].eta_block(s["num"], a, b),
+                            self.numeric[a[0]:a[1]], self.categorical[b[0]:b[1]], upper=False)
+
+        means = {k: (v[0] / v[1] if v[1] else None) for k, v in sums.items()}
+        total_n = sum(v[1] for v in sums.values())
+        result: Dict[str, Any] = {
+            "method": self.method,
+            "corr_delta": means["numeric"],
+            "cramers_v_delta": means["categorical"],
+            "corr_ratio_delta": means["mixed"],
+            "assoc_delta": (sum(v[0] for v in sums.values()) / total_n) if total_n else None,
+            "pairs": {k: v[1] for k, v in sums.items()},
+        }
+        if top_k:
+            result["worst_pairs"] = [
+                {"a": a, "b": b, "kind": kind, "real": rv, "synth": sv, "delta": d}
+                for d, a, b, kind, rv, sv in sorted(heap, reverse=True)
+            ]
+        return result
@@ -0,0 +1,302 @@
+"""
+Versioned real-dataset profile shared across attempts and runs.
+
+Everything the metric and post-processing code needs from the real side -
+sorted numeric columns (KS, quantile matching), normalized value counts (TVD,
+categorical marginal matching, fairness), the numeric correlation matrix, QI /
+sensitive-column detection and the meta-learning features - is computed once
+per dataset content hash. Profiles live in an in-process LRU and can be
+persisted as a single NPZ file next to the dataset in storage, so later runs on
+the same data only pay for a download.
+"""
+
+import io
+import os
+import json
+import time
+import weakref
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from libs.encoding import dataset_fingerprint
+from libs.frame_types import str_value_counts
+
+logger = logging.getLogger(__name__)
+
+PROFILE_VERSION = 1
+PROFILE_CACHE_SIZE = int(os.getenv("DATASET_PROFILE_CACHE_SIZE", "4"))
+PROFILE_MAX_LEVELS = int(os.getenv("DATASET_PROFILE_MAX_LEVELS", "10000"))    # value counts kept up to this many levels
+PROFILE_MAX_CORR_COLS = int(os.getenv("DATASET_PROFILE_MAX_CORR_COLS", "500"))
+LOW_CARD_NUMERIC = 10  # numeric columns with few values are also treated as categorical (fairness)
+
+QI_KEYWORDS = ["age", "sex", "gender", "race", "zip", "state", "city", "region", "ethni", "birth", "dob"]
+SENSITIVE_KEYWORDS = ["diag", "disease", "icd", "condition", "salary", "income", "target", "label", "outcome"]
+
+_CACHE: "OrderedDict[str, DatasetProfile]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+# id(frame) -> (weakref, fingerprint): real frames are treated as immutable once profiled
+_FRAME_FP: Dict[int, Tuple[Any, str]] = {}
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """dataset_fingerprint memoized per frame object (avoids rehashing the real data on every metric call)."""
+    hit = _FRAME_FP.get(id(df))
+    if hit is not None and hit[0]() is df:
+        return hit[1]
+    fp = dataset_fingerprint(df)
+    try:
+        key = id(df)
+        _FRAME_FP[key] = (weakref.ref(df, lambda _r, k=key: _FRAME_FP.pop(k, None)), fp)
+    except TypeError:
+        pass
+    return fp
+
+
+def detect_quasi_identifiers(real: pd.DataFrame) -> List[str]:
+    """Heuristic QI detection (keyword match, else up to 3 low-cardinality categoricals)."""
+    possible_qis = [c for c in real.columns if any(x in str(c).lower() for x in QI_KEYWORDS)]
+    if not possible_qis:
+        cats = [c for c in real.columns if real[c].dtype == 'object' or isinstance(real[c].dtype, pd.CategoricalDtype)]
+        possible_qis = [c for c in cats if real[c].nunique() < 50][:3]
+    return list(dict.fromkeys(possible_qis))
+
+
+def detect_sensitive_column(real: pd.DataFrame, qis: List[str]) -> Optional[str]:
+    for c in real.columns:
+        if any(x in str(c).lower() for x in SENSITIVE_KEYWORDS):
+            return c
+    if len(real.columns) > len(qis):
+        remaining = [c for c in real.columns if c not in qis]
+        if remaining:
+            return remaining[-1]
+    return None
+
+
+def ks_statistic(real_sorted: np.ndarray, synth_values) -> Optional[float]:
+    """Two-sample KS statistic against a pre-sorted real column (same value as scipy's ks_2samp)."""
+    s = np.sort(np.asarray(synth_values, dtype=np.float64))
+    s = s[~np.isnan(s)]
+    if len(real_sorted) == 0 or len(s) == 0:
+        return None
+    points = np.concatenate([real_sorted, s])
+    cdf_r = np.searchsorted(real_sorted, points, side="right") / len(real_sorted)
+    cdf_s = np.searchsorted(s, points, side="right") / len(s)
+    return float(np.max(np.abs(cdf_r - cdf_s)))
+
+
+class DatasetProfile:
+    """Real-side statistics for one dataset version (see module docstring)."""
+
+    def __init__(self, fingerprint: str, columns: List[str], numeric: List[str],
+                 sorted_values: Dict[str, np.ndarray], value_counts: Dict[str, Dict[str, float]],
+                 corr: Optional[np.ndarray], info: Dict[str, Any], version: int = PROFILE_VERSION):
+        self.fingerprint = fingerprint
+        self.version = version
+        self.columns = columns
+        self.numeric = numeric
+        self.sorted_values = sorted_values
+        self.value_counts = value_counts
+        self.corr = corr
+        self.info = info
+
+    # -------------------- accessors --------------------
+
+    @property
+    def n_rows(self) -> int:
+        return int(self.info.get("n_rows", 0))
+
+    @property
+    def quasi_identifiers(self) -> List[str]:
+        return list(self.info.get("qis") or [])
+
+    @property
+    def sensitive(self) -> Optional[str]:
+        return self.info.get("sensitive")
+
+    @property
+    def meta_features(self) -> Dict[str, float]:
+        return dict(self.info.get("meta_features") or {})
+
+    def sorted(self, col: str) -> Optional[np.ndarray]:
+        return self.sorted_values.get(col)
+
+    def freq(self, col: str) -> Optional[pd.Series]:
+        """Normalized value counts of `col` (astype(str), NaN kept), as in the legacy code paths."""
+        vc = self.value_counts.get(col)
+        return None if vc is None else pd.Series(vc, dtype=float)
+
+    @property
+    def categorical_like(self) -> List[str]:
+        return list(self.info.get("categorical_like") or [])
+
+    def stats(self, col: str) -> Dict[str, float]:
+        return (self.info.get("numeric_stats") or {}).get(col, {})
+
+    # -------------------- build --------------------
+
+    @classmethod
+    def build(cls, real: pd.DataFrame, fingerprint: Optional[str] = None,
+              meta_features_fn: Optional[Callable[[pd.DataFrame], Dict[str, float]]] = None) -> "DatasetProfile":
+        start = time.time()
+        fp = fingerprint or frame_fingerprint(real)
+        numeric = list(real.select_dtypes(include=[np.number]).columns)
+        sorted_values: Dict[str, np.ndarray] = {}
+        numeric_stats: Dict[str, Dict[str, float]] = {}
+        for c in numeric:
+            v = pd.to_numeric(real[c], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            v = np.sort(v[~np.isnan(v)])
+            sorted_values[c] = v
+            numeric_stats[c] = {
+                "mean": float(v.mean()) if len(v) else 0.0,
+                "std": float(v.std()) if len(v) else 0.0,
+            }
+
+        value_counts: Dict[str, Dict[str, float]] = {}
+        for c in real.columns:
+            if c in numeric and real[c].nunique(dropna=True) > LOW_CARD_NUMERIC:
+                continue
+            vc = str_value_counts(real[c], normalize=True)
+            if len(vc) <= PROFILE_MAX_LEVELS:
+                value_counts[c] = {str(k): float(p) for k, p in vc.items()}
+
+        corr = None
+        if 2 <= len(numeric) <= PROFILE_MAX_CORR_COLS:
+            corr = real[numeric].corr().to_numpy(dtype=np.float64)
+
+        # Same rule as the fairness metrics: non-numeric columns plus low-cardinality numerics
+        categorical_like = []
+        for c in real.columns:
+            if real[c].dtype.kind not in "biufcM" or real[c].nunique(dropna=True) <= LOW_CARD_NUMERIC:
+                categorical_like.append(str(c))
+
+        qis = detect_quasi_identifiers(real)
+        meta_features: Dict[str, float] = {}
+        if meta_features_fn is not None:
+            try:
+                meta_features = meta_features_fn(real)
+            except Exception:
+                meta_features = {}
+
+        info = {
+            "n_rows": int(len(real)),
+            "dtypes": {str(c): str(real[c].dtype) for c in real.columns},
+            "numeric_stats": numeric_stats,
+            "categorical_like": categorical_like,
+            "qis": qis,
+            "sensitive": detect_sensitive_column(real, qis) if qis else None,
+            "meta_features": meta_features,
+            "built_s": round(time.time() - start, 3),
+        }
+        logger.info(f"[dataset-profile] built profile {fp[:10]} in {info['built_s']}s")
+        return cls(fp, [str(c) for c in real.columns], [str(c) for c in numeric], sorted_values, value_counts, corr, info)
+
+    # -------------------- persistence (NPZ) --------------------
+
+    def to_bytes(self) -> bytes:
+        arrays: Dict[str, np.ndarray] = {f"num_{i}": self.sorted_values[c] for i, c in enumerate(self.numeric)}
+        if self.corr is not None:
+            arrays["corr"] = self.corr
+        header = {
+            "version": self.version,
+            "fingerprint": self.fingerprint,
+            "columns": self.columns,
+            "numeric": self.numeric,
+            "value_counts": self.value_counts,
+            "info": self.info,
+        }
+        arrays["header"] = np.array(json.dumps(header, default=str))
+        buf = io.BytesIO()
+        np.savez_compressed(buf, **arrays)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> Optional["DatasetProfile"]:
+        """Load a persisted profile; returns None for other profile versions."""
+        with np.load(io.BytesIO(raw), allow_pickle=False) as z:
+            header = json.loads(str(z["header"]))
+            if header.get("version") != PROFILE_VERSION:
+                return None
+            numeric = header["numeric"]
+            sorted_values = {c: z[f"num_{i}"] for i, c in enumerate(numeric)}
+            corr = z["corr"] if "corr" in z.files else None
+        return cls(header["fingerprint"], header["columns"], numeric, sorted_values,
+                   header["value_counts"], corr, header["info"], header["version"])
+
+
+def profile_storage_path(dataset_path: str, fingerprint: str) -> str:
+    """Profile object key next to the dataset file: <dir>/.profiles/<fingerprint>.v<version>.npz"""
+    base = os.path.dirname(dataset_path.strip("/"))
+    name = f".profiles/{fingerprint}.v{PROFILE_VERSION}.npz"
+    return f"{base}/{name}" if base else name
+
+
+def _remember(profile: DatasetProfile) -> DatasetProfile:
+    with _CACHE_LOCK:
+        _CACHE[profile.fingerprint] = profile
+        _CACHE.move_to_end(profile.fingerprint)
+        while len(_CACHE) > max(1, PROFILE_CACHE_SIZE):
+            _CACHE.popitem(last=False)
+    return profile
+
+
+def get_dataset_profile(real: pd.DataFrame, storage=None, dataset_path: Optional[str] = None,
+                        meta_features_fn: Optional[Callable[[pd.DataFrame], Dict[str, float]]] = None) -> Optional[DatasetProfile]:
+    """
+    Profile for this real frame: in-process cache → persisted NPZ → build.
+
+    `storage` is a bucket handle with download/upload (e.g. supabase.storage.from_("datasets")).
+    Without it the profile is only cached in memory. `meta_features_fn` computes
+    the meta-learning features stored in the profile. Never raises; returns None
+    if the profile cannot be built.
+    """
+    try:
+        fp = frame_fingerprint(real)
+        with _CACHE_LOCK:
+            hit = _CACHE.get(fp)
+            if hit is not None:
+                _CACHE.move_to_end(fp)
+                return hit
+
+        path = profile_storage_path(dataset_path, fp) if (storage is not None and dataset_path) else None
+        if path:
+            try:
+                raw = storage.download(path)
+                raw = raw if isinstance(raw, (bytes, bytearray)) else raw.read()
+                loaded = DatasetProfile.from_bytes(bytes(raw))
+                if loaded is not None and loaded.fingerprint == fp:
+                    print(f"[dataset-profile] loaded persisted profile {path}")
+                    return _remember(loaded)
+            except Exception:
+                pass  # not persisted yet
+
+        profile = _remember(DatasetProfile.build(real, fp, meta_features_fn))
+        if path:
+            try:
+                storage.upload(path=path, file=profile.to_bytes(),
+                               file_options={"contentType": "application/octet-stream", "upsert": "true"})
+                print(f"[dataset-profile] persisted profile {path}")
+            except Exception as e:
+                logger.warning(f"[dataset-profile] could not persist profile: {e}")
+        return profile
+    except Exception as e:
+        logger.warning(f"[dataset-profile] profile unavailable: {e}")
+        return None
+
+
+def peek_dataset_profile(real: pd.DataFrame) -> Optional[DatasetProfile]:
+    """Cached profile for this frame object, without hashing or building."""
+    hit = _FRAME_FP.get(id(real))
+    if hit is None or hit[0]() is not real:
+        return None
+    with _CACHE_LOCK:
+        return _CACHE.get(hit[1])
+
+
+def clear_dataset_profiles() -> None:
+    with _CACHE_LOCK:
+        _CACHE.clear()
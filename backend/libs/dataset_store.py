@@ -0,0 +1,271 @@
+"""
+Columnar copies of uploaded datasets.
+
+The API writes `<name>.parquet` next to every uploaded CSV in the datasets
+bucket: the frame `pd.read_csv` produced at upload, with its column types,
+zstd-compressed, in row groups carrying min/max statistics. Loaders prefer
+that copy - no text parsing or type inference, and `columns=` only reads the
+projected column chunks - and fall back to the CSV for datasets uploaded
+before the copy existed, writing the copy back so the next load is columnar.
+
+Repeated runs on one dataset skip storage entirely: downloaded objects are
+kept in a size-capped worker-local disk cache (LRU by last use) and the most
+recent parsed frames in memory. Entries are keyed by object path and the
+storage eTag, read from one listing of the dataset's folder per load, so a
+replaced object is never served stale; objects whose eTag cannot be read are
+not cached.
+
+pyarrow is optional: without it every load reads the CSV as before.
+"""
+
+import io
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PARQUET_ROW_GROUP_ROWS = int(os.getenv("PARQUET_ROW_GROUP_ROWS", "100000"))
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+PARQUET_BACKFILL = os.getenv("PARQUET_BACKFILL", "true").strip().lower() in ("1", "true", "yes", "on")
+
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", "/tmp/dataset-cache")
+DATASET_CACHE_MAX_MB = float(os.getenv("DATASET_CACHE_MAX_MB", "2048"))    # disk tier cap (0 disables it)
+DATASET_FRAME_CACHE_SIZE = int(os.getenv("DATASET_FRAME_CACHE_SIZE", "2"))  # parsed frames kept in memory (0 = off)
+
+# (object path, eTag) → parsed frame
+_FRAMES: "OrderedDict[Tuple[str, str], pd.DataFrame]" = OrderedDict()
+_FRAMES_LOCK = threading.Lock()
+_DISK_LOCK = threading.Lock()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def parquet_path(csv_path: str) -> str:
+    """Object key of the Parquet copy: same name with a .parquet extension."""
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def to_parquet_bytes(df: pd.DataFrame) -> Optional[bytes]:
+    """Typed Parquet encoding of `df`, or None if pyarrow is missing or a column cannot be stored."""
+    if not parquet_available():
+        return None
+    try:
+        buf = io.BytesIO()
+        df.to_parquet(buf, engine="pyarrow", index=False, compression=PARQUET_COMPRESSION,
+                      row_group_size=PARQUET_ROW_GROUP_ROWS)
+        return buf.getvalue()
+    except Exception as e:
+        logger.warning(f"[dataset-store] parquet encoding failed: {e}")
+        return None
+
+
+def read_parquet_bytes(raw: bytes, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    return pd.read_parquet(io.BytesIO(raw), engine="pyarrow", columns=columns)
+
+
+def _download(storage, path: str) -> bytes:
+    b = storage.download(path)
+    return bytes(b) if isinstance(b, (bytes, bytearray)) else b.read()
+
+
+def object_versions(storage, path: str) -> Optional[Dict[str, str]]:
+    """
+    {object path: eTag} of `path` and its siblings sharing its stem (the Parquet
+    copy), from one listing of its folder; None if the bucket cannot be listed.
+    """
+    folder, name = os.path.split(path.strip("/"))
+    stem = os.path.splitext(name)[0]
+    try:
+        items = storage.list(folder, {"search": stem, "limit": 100})
+    except Exception:
+        return None
+    versions: Dict[str, str] = {}
+    for item in items or []:
+        meta = item.get("metadata") or {}
+        tag = meta.get("eTag") or item.get("updated_at")
+        if item.get("name") and tag:
+            key = f"{folder}/{item['name']}" if folder else item["name"]
+            versions[key] = f"{tag}:{meta.get('size', '')}"
+    return versions
+
+
+# -------------------- disk tier --------------------
+
+def _disk_path(path: str, version: str) -> str:
+    digest = hashlib.sha1(f"{path}\0{version}".encode()).hexdigest()[:24]
+    return os.path.join(DATASET_CACHE_DIR, digest + os.path.splitext(path)[1])
+
+
+def _evict(keep: str) -> None:
+    """Drop least recently used files until the cache fits DATASET_CACHE_MAX_MB."""
+    entries = []
+    for entry in os.scandir(DATASET_CACHE_DIR):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    budget = DATASET_CACHE_MAX_MB * 2**20
+    for _, size, file in sorted(entries):
+        if total <= budget:
+            break
+        if file == keep:
+            continue
+        try:
+            os.remove(file)
+            total -= size
+        except OSError:
+            pass
+
+
+def _cached_download(storage, path: str, version: Optional[str]) -> Tuple[bytes, bool]:
+    """(object bytes, served from disk) - disk cache first when the object has a known version."""
+    if not version or DATASET_CACHE_MAX_MB <= 0:
+        return _download(storage, path), False
+    local = _disk_path(path, version)
+    try:
+        with open(local, "rb") as f:
+            raw = f.read()
+        os.utime(local)  # mtime = last use, for LRU eviction
+        return raw, True
+    except OSError:
+        pass
+    raw = _download(storage, path)
+    if len(raw) <= DATASET_CACHE_MAX_MB * 2**20:
+        try:
+            os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+            tmp = f"{local}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, local)  # atomic: concurrent workers never read a partial file
+            with _DISK_LOCK:
+                _evict(keep=local)
+        except OSError as e:
+            logger.warning(f"[dataset-store] disk cache write failed: {e}")
+    return raw, False
+
+
+# -------------------- memory tier --------------------
+
+def _remember_frame(key: Tuple[str, str], df: pd.DataFrame) -> None:
+    if DATASET_FRAME_CACHE_SIZE <= 0:
+        return
+    with _FRAMES_LOCK:
+        _FRAMES[key] = df
+        _FRAMES.move_to_end(key)
+        while len(_FRAMES) > DATASET_FRAME_CACHE_SIZE:
+            _FRAMES.popitem(last=False)
+
+
+def _cached_frame(key: Tuple[str, str]) -> Optional[pd.DataFrame]:
+    with _FRAMES_LOCK:
+        df = _FRAMES.get(key)
+        if df is not None:
+            _FRAMES.move_to_end(key)
+    return df
+
+
+def clear_dataset_cache(disk: bool = False) -> None:
+    with _FRAMES_LOCK:
+        _FRAMES.clear()
+    if disk and os.path.isdir(DATASET_CACHE_DIR):
+        for entry in os.scandir(DATASET_CACHE_DIR):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# -------------------- load --------------------
+
+def _parse(raw: bytes, source: str, columns: Optional[List[str]]) -> pd.DataFrame:
+    if source == "parquet":
+        return read_parquet_bytes(raw, columns)
+    return pd.read_csv(io.BytesIO(raw), usecols=columns)
+
+
+def load_dataset(storage, path: str, columns: Optional[List[str]] = None,
+                 backfill: bool = PARQUET_BACKFILL) -> Tuple[pd.DataFrame, str]:
+    """
+    (frame, source) for the dataset at `path` in `storage` (a bucket handle,
+    e.g. supabase.storage.from_("datasets")); source is "parquet" or "csv".
+
+    Every call returns a new frame the caller may modify. Raises if neither
+    copy can be read.
+    """
+    start = time.time()
+    versions = object_versions(storage, path)
+    pq_path = parquet_path(path)
+    candidates = []
+    if parquet_available() and (versions is None or pq_path in versions):
+        candidates.append(("parquet", pq_path))
+    candidates.append(("csv", path))
+
+    for source, key in candidates:
+        version = (versions or {}).get(key.strip("/"))
+        cached = _cached_frame((key, version)) if version else None
+        if cached is not None:
+            df = cached if columns is None else cached[columns]
+            logger.info(f"[dataset-store] {path}: {source} frame from memory")
+            return df.copy(deep=True), source
+        try:
+            raw, from_disk = _cached_download(storage, key, version)
+        except Exception:
+            if source == "parquet":
+                continue  # no copy yet (older upload): use the CSV
+            raise
+        df = _parse(raw, source, columns)
+        origin = "disk cache" if from_disk else "storage"
+        logger.info(f"[dataset-store] {path}: {source} from {origin} in {time.time() - start:.2f}s")
+        if version and columns is None:
+            _remember_frame((key, version), df)
+            df = df.copy(deep=True)
+        if source == "csv" and backfill and columns is None and parquet_available():
+            _backfill_parquet(storage, path, df)
+        return df, source
+    raise FileNotFoundError(path)  # unreachable: the CSV attempt raises
+
+
+def load_dataset_head(storage, path: str, nrows: int) -> Optional[pd.DataFrame]:
+    """
+    First `nrows` rows of the dataset at `path` from its Parquet copy, decoding
+    only the leading row group(s) of the (disk-cached) object. None when the
+    folder listing shows no copy or pyarrow is missing - read the CSV then.
+    """
+    if not parquet_available():
+        return None
+    versions = object_versions(storage, path)
+    pq_path = parquet_path(path)
+    version = (versions or {}).get(pq_path.strip("/"))
+    if not version:
+        return None
+    import pyarrow.parquet as pq
+    raw, from_disk = _cached_download(storage, pq_path, version)
+    pf = pq.ParquetFile(io.BytesIO(raw))
+    batch = next(pf.iter_batches(batch_size=max(1, nrows)), None)
+    df = batch.to_pandas() if batch is not None else pf.schema_arrow.empty_table().to_pandas()
+    logger.info(f"[dataset-store] {path}: {len(df)}-row head from parquet ({'disk cache' if from_disk else 'storage'})")
+    return df
+
+
+def _backfill_parquet(storage, path: str, df: pd.DataFrame) -> None:
+    raw = to_parquet_bytes(df)
+    if raw is None:
+        return
+    try:
+        storage.upload(path=parquet_path(path), file=raw,
+                       file_options={"contentType": "application/octet-stream", "upsert": "true"})
+    except Exception as e:
+        logger.warning(f"[dataset-store] could not store parquet copy of {path}: {e}")
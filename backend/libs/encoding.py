@@ -0,0 +1,127 @@
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Stable content hash of a dataframe (values, column names and dtypes).
+
+    Two frames with identical content produce the same fingerprint regardless of
+    object identity, so it can be used as a cache key across retries and runs.
+    """
+    h = hashlib.sha1()
+    h.update("|".join(f"{c}:{df[c].dtype}" for c in df.columns).encode())
+    h.update(str(df.shape).encode())
+    try:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        h.update(row_hashes.tobytes())
+    except Exception:
+        # Unhashable cells (lists, dicts) - fall back to the CSV representation
+        h.update(df.to_csv(index=False).encode())
+    return h.hexdigest()
+
+
+class FrameEncoder:
+    """
+    Numeric encoding shared by the real and synthetic side of an evaluation.
+
+    Category dictionaries are learned once from the real data, so the same value
+    always maps to the same code on both sides (unknown synthetic values → -1).
+    Numeric columns pass through with NaNs filled by 0, matching the legacy
+    per-metric encoders.
+    """
+
+    def __init__(self):
+        self.columns: List[str] = []
+        self.numeric: Dict[str, bool] = {}
+        self.categories: Dict[str, pd.Index] = {}
+
+    def fit(self, df: pd.DataFrame) -> "FrameEncoder":
+        self.columns = list(df.columns)
+        for c in self.columns:
+            s = df[c]
+            is_num = pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_complex_dtype(s)
+            self.numeric[c] = bool(is_num)
+            if not is_num:
+                self.categories[c] = pd.Index(pd.unique(s.astype(str)))
+        return self
+
+    def is_numeric(self, col: str) -> bool:
+        return self.numeric.get(col, False)
+
+    def encode_column(self, s: Optional[pd.Series], col: str, n_rows: int) -> np.ndarray:
+        """Encode a single column; a missing column encodes as zeros."""
+        if s is None:
+            return np.zeros(n_rows, dtype=np.float64)
+        if self.numeric.get(col, False):
+            return pd.to_numeric(s, errors="coerce").astype(float).fillna(0.0).to_numpy(dtype=np.float64)
+        cats = self.categories.get(col)
+        if cats is None:
+            return np.zeros(n_rows, dtype=np.float64)
+        codes = cats.get_indexer(s.astype(str))
+        return codes.astype(np.float64)
+
+    def transform(self, df: pd.DataFrame, columns: Optional[List[str]] = None) -> np.ndarray:
+        """Return a (n_rows, n_columns) float64 matrix in the encoder's column order."""
+        cols = list(columns) if columns is not None else self.columns
+        n = len(df)
+        out = np.empty((n, len(cols)), dtype=np.float64)
+        for j, c in enumerate(cols):
+            out[:, j] = self.encode_column(df[c] if c in df.columns else None, c, n)
+        return out
+
+
+class NeighbourSpace:
+    """
+    Scaled encoding of a column subset for nearest-neighbour queries.
+
+    Numerics are z-scored with the real mean/std; categoricals with few levels
+    are one-hot encoded so a mismatch costs about as much as a 1-sd gap, wider
+    ones use codes scaled to [0, 1). Shared by the distance-based privacy
+    attacks (attribute inference, membership inference).
+    """
+
+    def __init__(self, encoder: FrameEncoder, real: pd.DataFrame, columns: List[str], max_onehot: int = 50):
+        self.encoder = encoder
+        self.columns = list(columns)
+        self._spec: List[Dict] = []
+        for c in self.columns:
+            if encoder.is_numeric(c):
+                vals = pd.to_numeric(real[c], errors="coerce")
+                mean, std = float(vals.mean()), float(vals.std() or 1.0)
+                self._spec.append({"col": c, "kind": "numeric", "mean": mean if np.isfinite(mean) else 0.0,
+                                   "std": std if np.isfinite(std) and std > 0 else 1.0})
+            else:
+                levels = len(encoder.categories.get(c, []))
+                self._spec.append({"col": c, "kind": "onehot" if levels <= max_onehot else "code",
+                                   "levels": max(1, levels)})
+
+    @property
+    def width(self) -> int:
+        return sum(spec["levels"] if spec["kind"] == "onehot" else 1 for spec in self._spec)
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        blocks = []
+        n = len(df)
+        for spec in self._spec:
+            col = spec["col"]
+            s = df[col] if col in df.columns else None
+            if spec["kind"] == "numeric":
+                vals = self.encoder.encode_column(s, col, n)
+                blocks.append(((vals - spec["mean"]) / spec["std"])[:, None])
+                continue
+            codes = self.encoder.encode_column(s, col, n).astype(np.int64)
+            if spec["kind"] == "code":
+                blocks.append((codes / spec["levels"])[:, None])
+                continue
+            onehot = np.zeros((n, spec["levels"]), dtype=np.float64)
+            known = codes >= 0
+            onehot[np.flatnonzero(known), codes[known]] = np.sqrt(0.5)
+            blocks.append(onehot)
+        return np.hstack(blocks) if blocks else np.zeros((n, 0))
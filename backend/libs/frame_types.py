@@ -0,0 +1,163 @@
+"""
+Compact dtypes for real and synthetic frames.
+
+`pd.read_csv` gives every text column one Python string object per cell and
+every number 8 bytes. On wide clinical CSVs - mostly low-cardinality codes and
+small integers - that is several times the memory the data needs, and every
+stage that copies the frame pays it again.
+
+`compact_frame` runs once at load: text columns with few distinct values become
+`category` (one dictionary plus small integer codes), integers are downcast to
+the narrowest type that holds their range and floats to float32 when that is
+lossless. The resulting dtypes are the schema later stages carry forward;
+`match_dtype` casts synthetic columns back onto it.
+
+String normalization (`astype(str)`, title/lower case, value counts of the
+string form) goes through `dictionary_map`/`str_value_counts`: each distinct
+value is converted once and the per-row codes are remapped, instead of
+building and transforming one Python string per row.
+"""
+
+import os
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_float_dtype, is_integer_dtype, is_numeric_dtype
+
+logger = logging.getLogger(__name__)
+
+COMPACT_DTYPES = os.getenv("COMPACT_DTYPES", "true").strip().lower() in ("1", "true", "yes", "on")
+COMPACT_MAX_CATEGORY_RATIO = float(os.getenv("COMPACT_MAX_CATEGORY_RATIO", "0.5"))  # distinct/rows for text → category
+COMPACT_MAX_CATEGORIES = int(os.getenv("COMPACT_MAX_CATEGORIES", "100000"))
+
+_NULLABLE_INT = {np.dtype(t): t.capitalize() for t in ("int8", "int16", "int32", "int64")}
+
+
+def compact_series(s: pd.Series) -> pd.Series:
+    """Narrowest lossless dtype for one column (returns `s` unchanged if nothing applies)."""
+    if is_bool_dtype(s) or isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    if is_integer_dtype(s) and isinstance(s.dtype, np.dtype):
+        return pd.to_numeric(s, downcast="integer")
+    if is_float_dtype(s) and s.dtype == np.float64:
+        values = s.to_numpy()
+        narrow = values.astype(np.float32)
+        with np.errstate(invalid="ignore"):
+            if np.array_equal(narrow.astype(np.float64), values, equal_nan=True):
+                return pd.Series(narrow, index=s.index, name=s.name)
+        return s
+    if not is_numeric_dtype(s) and (s.dtype == object or pd.api.types.is_string_dtype(s)):
+        n = len(s)
+        distinct = s.nunique(dropna=True)
+        if n and distinct <= COMPACT_MAX_CATEGORIES and distinct <= max(1, COMPACT_MAX_CATEGORY_RATIO * n):
+            try:
+                return s.astype("category")
+            except (TypeError, ValueError):
+                return s
+    return s
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """New frame with every column in its compact dtype (the input is not modified)."""
+    if not COMPACT_DTYPES or df.empty:
+        return df
+    columns = {}
+    for c in df.columns:
+        try:
+            columns[c] = compact_series(df[c])
+        except Exception as e:
+            logger.warning(f"[frame-types] keeping {c} as {df[c].dtype}: {e}")
+            columns[c] = df[c]
+    out = pd.DataFrame(columns, index=df.index)
+    out.columns = df.columns
+    return out
+
+
+def frame_schema(df: pd.DataFrame) -> Dict[str, str]:
+    return {str(c): str(df[c].dtype) for c in df.columns}
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return float(df.memory_usage(index=True, deep=True).sum()) / 2**20
+
+
+def match_dtype(values: pd.Series, real_dtype) -> Optional[pd.Series]:
+    """
+    Synthetic column cast onto a compact real dtype, or None when the real dtype is
+    not a compact one (the caller keeps its default coercion).
+
+    Integers become the nullable type of the real width when the values fit (else
+    Int64); float32 and category are restored as-is.
+    """
+    if isinstance(real_dtype, pd.CategoricalDtype):
+        return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype("category")
+    if real_dtype == np.float32:
+        return pd.to_numeric(values, errors="coerce").astype(np.float32)
+    if isinstance(real_dtype, np.dtype) and real_dtype in _NULLABLE_INT and real_dtype != np.int64:
+        ints = pd.to_numeric(values, errors="coerce").round()
+        info = np.iinfo(real_dtype)
+        lo, hi = ints.min(), ints.max()
+        fits = (pd.isna(lo) or lo >= info.min) and (pd.isna(hi) or hi <= info.max)
+        return ints.astype(_NULLABLE_INT[real_dtype] if fits else "Int64")
+    return None
+
+
+# -------------------- dictionary-level string normalization --------------------
+
+def _dictionary(s: pd.Series) -> Tuple[np.ndarray, pd.Index]:
+    """(codes, distinct values) of `s`; missing values get code -1."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return np.asarray(s.cat.codes, dtype=np.int64), pd.Index(s.cat.categories)
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    return codes.astype(np.int64, copy=False), pd.Index(uniques)
+
+
+def string_codes(s: pd.Series, fn: Optional[Callable[[pd.Index], pd.Index]] = None) -> Tuple[np.ndarray, pd.Index]:
+    """
+    Codes of `s` into the distinct values of `fn(s.astype(str))`, computed on the
+    dictionary: every distinct value is converted (and passed through `fn`) once.
+    Missing values become "nan" as with `astype(str)`; values that normalize to
+    the same string share one code.
+    """
+    codes, uniques = _dictionary(s)
+    labels = pd.Index(np.asarray(uniques.astype(str), dtype=object).tolist() + ["nan"], dtype=object)
+    if fn is not None:
+        labels = pd.Index(fn(labels), dtype=object)
+    codes = np.where(codes < 0, len(labels) - 1, codes)
+    # Merge dictionary entries that collapsed onto the same string
+    inverse, distinct = pd.factorize(labels)
+    return inverse[codes], pd.Index(distinct, dtype=object)
+
+
+def dictionary_map(s: pd.Series, fn: Optional[Callable[[pd.Index], pd.Index]] = None,
+                   as_category: Optional[bool] = None) -> pd.Series:
+    """
+    `fn(s.astype(str))` evaluated per distinct value. Returns a category series
+    (only the labels that occur) when `as_category` is True, or by default when
+    `s` already is one; otherwise an object series of the mapped strings.
+    """
+    codes, labels = string_codes(s, fn)
+    if as_category is None:
+        as_category = isinstance(s.dtype, pd.CategoricalDtype)
+    if as_category:
+        used = np.bincount(codes, minlength=len(labels)) > 0
+        remap = np.cumsum(used) - 1
+        values = pd.Categorical.from_codes(remap[codes], categories=labels[used])
+    else:
+        values = np.asarray(labels, dtype=object)[codes]
+    return pd.Series(values, index=s.index, name=s.name)
+
+
+def as_str(s: pd.Series, as_category: Optional[bool] = None) -> pd.Series:
+    return dictionary_map(s, None, as_category)
+
+
+def str_value_counts(s: pd.Series, normalize: bool = False) -> pd.Series:
+    """`s.astype(str).value_counts(dropna=False)` counted on codes (NaN counted as "nan")."""
+    codes, labels = string_codes(s)
+    counts = np.bincount(codes, minlength=len(labels))
+    vc = pd.Series(counts, index=labels, name="proportion" if normalize else "count")
+    vc = vc[vc > 0].sort_values(ascending=False, kind="stable")
+    return vc / max(1, len(s)) if normalize else vc
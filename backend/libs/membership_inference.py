@@ -0,0 +1,242 @@
+"""
+Holdout-based membership inference.
+
+When enabled (MIA_HOLDOUT, or config_json.mia_holdout per run), the pipeline
+reserves a slice of the real data before training (`split_holdout`, at most
+MIA_TARGETS rows - all the attack draws); the generator only ever sees the
+remaining members and the run's metadata records `mia_holdout_rows`. The
+attack then asks the question an auditor cares about - can an adversary tell
+records that were used for training from real records that were not? - rather
+than whether real rows look different from synthetic ones.
+
+Two attacks score the same balanced member/holdout targets against one
+neighbour index over the synthetic data:
+
+* DCR: distance to the closest synthetic record (closer → member).
+* Shadow: small attack models on the k-nearest-neighbour distance profile,
+  cross-fitted so each target is scored by models that never saw its label,
+  trained in parallel.
+
+The reported AUC is the stronger of the two, with a DeLong confidence
+interval. Sampling is seeded and every stage is budgeted, so the result is
+deterministic and its cost does not grow with the dataset.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from libs.encoding import NeighbourSpace, dataset_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Reserving a holdout takes rows away from training, so it is opt-in (per run: config_json.mia_holdout)
+MIA_HOLDOUT = os.getenv("MIA_HOLDOUT", "false").strip().lower() in ("1", "true", "yes", "on")
+MIA_TARGETS = int(os.getenv("MIA_TARGETS", "2000"))                  # targets per side (members / holdout)
+MIA_HOLDOUT_FRAC = float(os.getenv("MIA_HOLDOUT_FRAC", "0.2"))      # share of real rows kept out of training
+# Cap on reserved rows; the attack never draws more than MIA_TARGETS holdout rows
+MIA_HOLDOUT_MAX = int(os.getenv("MIA_HOLDOUT_MAX", str(MIA_TARGETS)))
+MIA_HOLDOUT_MIN_ROWS = int(os.getenv("MIA_HOLDOUT_MIN_ROWS", "200"))  # smaller datasets train on every row
+MIA_SYNTH_BUDGET = int(os.getenv("MIA_SYNTH_BUDGET", "50000"))       # synthetic rows indexed
+MIA_K = int(os.getenv("MIA_K", "5"))                                 # neighbour distances per target
+MIA_SHADOW_MODELS = int(os.getenv("MIA_SHADOW_MODELS", "4"))         # cross-fitted attack models (0 = DCR only)
+MIA_QUERY_BATCH = int(os.getenv("MIA_QUERY_BATCH", "4096"))          # targets per kNN query
+MIA_CI_LEVEL = 0.95
+MIA_HOLDOUT_CACHE_SIZE = 8
+
+# Member-frame fingerprint → reserved holdout rows
+_HOLDOUTS: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+_HOLDOUT_LOCK = threading.Lock()
+
+
+# -------------------- holdout registry --------------------
+
+def split_holdout(real: pd.DataFrame, frac: float = MIA_HOLDOUT_FRAC, max_rows: int = MIA_HOLDOUT_MAX,
+                  min_rows: int = MIA_HOLDOUT_MIN_ROWS, seed: int = 42) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Split `real` into (members, holdout) and register the holdout for the members.
+
+    The split is a seeded function of the data, so re-running a dataset reserves
+    the same rows. Returns (real, None) when the dataset is too small to spare rows.
+    """
+    n = len(real)
+    n_hold = min(int(n * max(0.0, frac)), max_rows)
+    if n < min_rows or n_hold < 1:
+        return real, None
+    perm = np.random.default_rng(seed).permutation(n)
+    members = real.iloc[np.sort(perm[n_hold:])].reset_index(drop=True)
+    holdout = real.iloc[np.sort(perm[:n_hold])].reset_index(drop=True)
+    register_holdout(members, holdout)
+    return members, holdout
+
+
+def register_holdout(members: pd.DataFrame, holdout: pd.DataFrame) -> None:
+    from libs.dataset_profile import frame_fingerprint
+    key = frame_fingerprint(members)
+    with _HOLDOUT_LOCK:
+        _HOLDOUTS[key] = holdout
+        _HOLDOUTS.move_to_end(key)
+        while len(_HOLDOUTS) > MIA_HOLDOUT_CACHE_SIZE:
+            _HOLDOUTS.popitem(last=False)
+
+
+def holdout_for(members: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """Holdout reserved when `members` was split off (None if it was never split)."""
+    from libs.dataset_profile import frame_fingerprint
+    with _HOLDOUT_LOCK:
+        return _HOLDOUTS.get(frame_fingerprint(members))
+
+
+def clear_holdouts() -> None:
+    with _HOLDOUT_LOCK:
+        _HOLDOUTS.clear()
+
+
+# -------------------- scoring --------------------
+
+def auc_with_ci(y: np.ndarray, score: np.ndarray, level: float = MIA_CI_LEVEL) -> Tuple[float, Tuple[float, float]]:
+    """ROC AUC of `score` for y == 1 with a DeLong (normal-approximation) interval."""
+    from scipy.stats import norm, rankdata
+
+    y = np.asarray(y).astype(bool)
+    pos, neg = score[y], score[~y]
+    m, n = len(pos), len(neg)
+    if m < 2 or n < 2:
+        return 0.5, (0.0, 1.0)
+    ranks = rankdata(np.concatenate([pos, neg]))
+    auc = float((ranks[:m].sum() - m * (m + 1) / 2) / (m * n))
+    # Structural components: per-target share of the other class it outranks
+    v_pos = (ranks[:m] - rankdata(pos)) / n
+    v_neg = 1.0 - (ranks[m:] - rankdata(neg)) / m
+    se = float(np.sqrt(v_pos.var(ddof=1) / m + v_neg.var(ddof=1) / n))
+    z = float(norm.ppf(0.5 + level / 2))
+    return auc, (max(0.0, auc - z * se), min(1.0, auc + z * se))
+
+
+class MembershipInferenceEngine:
+    """
+    Member-vs-holdout attack for one real dataset, built once through the
+    real baseline cache.
+
+    The balanced targets (members drawn from the training rows, non-members
+    from the reserved holdout) and their encoding are fixed at construction;
+    `attack(synth)` builds one neighbour index over the synthetic rows and
+    scores every target with batched queries.
+    """
+
+    def __init__(self, baseline, holdout: pd.DataFrame, n_targets: int = MIA_TARGETS,
+                 synth_budget: int = MIA_SYNTH_BUDGET, k: int = MIA_K, shadow_models: int = MIA_SHADOW_MODELS):
+        from libs.tstr import subsample_index
+
+        members = baseline.real
+        self.seed = baseline.seed
+        self.k = max(1, int(k))
+        self.synth_budget = synth_budget
+        self.shadow_models = int(shadow_models)
+        self._last: Dict[str, Tuple[Dict[str, Any], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+        columns = [c for c in members.columns if c in holdout.columns]
+        self.space = NeighbourSpace(baseline.encoder, members, columns)
+
+        m = min(len(members), len(holdout), max(2, n_targets))
+        targets = pd.concat([
+            members.iloc[subsample_index(len(members), m, self.seed + 11)],
+            holdout.iloc[subsample_index(len(holdout), m, self.seed + 13)],
+        ], ignore_index=True)
+        self.n_per_side = m
+        self.y = np.r_[np.ones(m, dtype=np.int8), np.zeros(m, dtype=np.int8)]
+        self.X_targets = self.space.transform(targets)
+
+    def _distances(self, X_synth: np.ndarray) -> np.ndarray:
+        """(targets, k) sorted distances to the nearest synthetic rows."""
+        from sklearn.neighbors import NearestNeighbors
+
+        k = min(self.k, len(X_synth))
+        index = NearestNeighbors(n_neighbors=k).fit(X_synth)
+        parts = []
+        for start in range(0, len(self.X_targets), max(1, MIA_QUERY_BATCH)):
+            dist, _ = index.kneighbors(self.X_targets[start:start + MIA_QUERY_BATCH])
+            parts.append(dist)
+        return np.vstack(parts)
+
+    def _shadow_scores(self, dist: np.ndarray) -> Optional[np.ndarray]:
+        """Out-of-fold membership scores of attack models on the kNN distance profile."""
+        from sklearn.linear_model import LogisticRegression
+
+        folds = self.shadow_models
+        if folds < 2 or self.n_per_side < folds:
+            return None
+        feats = np.log1p(dist)
+        feats = np.hstack([feats, feats[:, :1] - feats.mean(axis=1, keepdims=True)])
+        # Stratified fold assignment: each fold holds the same number of members and non-members
+        rng = np.random.default_rng(self.seed + 17)
+        fold = np.empty(len(self.y), dtype=np.int64)
+        for label in (0, 1):
+            idx = np.flatnonzero(self.y == label)
+            fold[rng.permutation(idx)] = np.arange(len(idx)) % folds
+
+        def fit_fold(f: int) -> Tuple[int, np.ndarray]:
+            train = fold != f
+            model = LogisticRegression(max_iter=200).fit(feats[train], self.y[train])
+            return f, model.decision_function(feats[~train])
+
+        scores = np.empty(len(self.y), dtype=np.float64)
+        with ThreadPoolExecutor(max_workers=min(folds, os.cpu_count() or 1)) as pool:
+            for f, s in pool.map(fit_fold, range(folds)):
+                scores[fold == f] = s
+        return scores
+
+    def _run(self, synth: pd.DataFrame) -> Tuple[Dict[str, Any], np.ndarray]:
+        from libs.tstr import subsample_index
+
+        key = dataset_fingerprint(synth)
+        with self._lock:
+            if key in self._last:
+                return self._last[key]
+
+        start = time.time()
+        s = synth.iloc[subsample_index(len(synth), self.synth_budget, self.seed)]
+        dist = self._distances(self.space.transform(s))
+
+        dcr = -dist[:, 0]
+        dcr_auc, dcr_ci = auc_with_ci(self.y, dcr)
+        attacks = {"dcr": {"auc": dcr_auc, "ci": list(dcr_ci)}}
+        best, best_scores = "dcr", dcr
+        shadow = self._shadow_scores(dist)
+        if shadow is not None:
+            shadow_auc, shadow_ci = auc_with_ci(self.y, shadow)
+            attacks["shadow"] = {"auc": shadow_auc, "ci": list(shadow_ci), "models": self.shadow_models}
+            if shadow_auc > dcr_auc:
+                best, best_scores = "shadow", shadow
+
+        member = self.y == 1
+        result = {
+            "auc": attacks[best]["auc"],
+            "ci": attacks[best]["ci"],
+            "attack": best,
+            "attacks": attacks,
+            "dcr_median": {"members": float(np.median(dist[member, 0])),
+                           "holdout": float(np.median(dist[~member, 0]))},
+            "targets_per_side": self.n_per_side,
+            "synth_rows": len(s),
+            "elapsed_s": round(time.time() - start, 4),
+        }
+        with self._lock:
+            self._last = {key: (result, best_scores)}
+        return result, best_scores
+
+    def attack(self, synth: pd.DataFrame) -> Dict[str, Any]:
+        """AUC/CI of the strongest attack plus per-attack results and DCR medians."""
+        return self._run(synth)[0]
+
+    def scores(self, synth: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """(membership labels, scores) of the strongest attack, e.g. for bootstrap CIs."""
+        return self.y, self._run(synth)[1]
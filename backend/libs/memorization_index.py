@@ -0,0 +1,512 @@
+"""
+Cross-run memorization index (MinHash / LSH) per real dataset.
+
+Duplicate checks inside a run only compare one synthetic table with the real
+data. A model that keeps regenerating near-copies of the same patient across
+many runs is only visible when every release is remembered, so each dataset
+keeps one index over its encoded real records and all released synthetic rows.
+
+Rows are turned into token sets ("column = value", numerics quantized on a
+real-data grid) and summarised by MinHash signatures; LSH banding turns those
+into sorted bucket keys, so screening a new release is a handful of
+searchsorted lookups per row instead of a scan over everything published
+before. Candidate pairs are confirmed on the signature-estimated Jaccard
+similarity.
+
+The index is persisted next to the dataset in storage as immutable objects: one
+NPZ with the real records (written once) and one small NPZ per release. A run
+lists the folder, downloads only the releases it has not seen yet before
+screening, and uploads only its own release, so concurrent workers never
+overwrite each other and nothing is re-uploaded.
+"""
+
+import io
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MEMO_INDEX_VERSION = 1
+MEMO_BANDS = 8                                                              # LSH bands of 4 MinHash values
+MEMO_NUM_PERM = MEMO_BANDS * 4
+MEMO_THRESHOLD = float(os.getenv("MEMO_THRESHOLD", "0.8"))                  # estimated Jaccard counted as near-copy
+MEMO_NUMERIC_RESOLUTION = float(os.getenv("MEMO_NUMERIC_RESOLUTION", "0.1"))  # numeric grid step in real std units
+MEMO_MAX_BUCKET = int(os.getenv("MEMO_MAX_BUCKET", "64"))                   # candidates per row and band
+MEMO_MAX_RECORDS = int(os.getenv("MEMO_MAX_RECORDS", "2000000"))            # oldest releases are dropped beyond this
+MEMO_CACHE_SIZE = int(os.getenv("MEMO_CACHE_SIZE", "4"))
+MEMO_LIST_PAGE = 1000  # objects per storage listing request
+
+REAL_SOURCE = -1
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+_CACHE: "OrderedDict[str, MemorizationIndex]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer (vectorized, wrapping uint64 arithmetic)."""
+    x = x.astype(np.uint64, copy=True)
+    with np.errstate(over="ignore"):
+        x ^= x >> np.uint64(30)
+        x *= np.uint64(0xBF58476D1CE4E5B9)
+        x ^= x >> np.uint64(27)
+        x *= np.uint64(0x94D049BB133111EB)
+        x ^= x >> np.uint64(31)
+    return x
+
+
+class MemorizationIndex:
+    """LSH index over the real records and every released synthetic row of one dataset."""
+
+    def __init__(self, fingerprint: str, columns: List[str], grid: Dict[str, Tuple[float, float]],
+                 releases: Optional[List[str]] = None, keys: Optional[np.ndarray] = None,
+                 sig: Optional[np.ndarray] = None, source: Optional[np.ndarray] = None,
+                 nearest_real: Optional[np.ndarray] = None):
+        self.fingerprint = fingerprint
+        self.columns = list(columns)
+        self.grid = dict(grid)  # numeric column → (origin, step); step 0 hashes the exact value
+        self.releases: List[str] = list(releases or [])
+        # Per record: LSH band keys and the low byte of each MinHash value (b-bit MinHash)
+        self.keys = keys if keys is not None else np.zeros((0, MEMO_BANDS), dtype=np.uint64)
+        self.sig = sig if sig is not None else np.zeros((0, MEMO_NUM_PERM), dtype=np.uint8)
+        self.source = source if source is not None else np.zeros(0, dtype=np.int32)
+        # For released rows: real record they copied (-1 = none); for real rows: -1
+        self.nearest_real = nearest_real if nearest_real is not None else np.zeros(0, dtype=np.int32)
+        self._bands: Optional[List[Tuple[np.ndarray, np.ndarray]]] = None
+        self._lock = threading.Lock()
+        # Release objects already considered (loaded or skipped as beyond MEMO_MAX_RECORDS)
+        self._listed: set = set(self.releases)
+
+        rng = np.random.default_rng(1234)
+        self._a = rng.integers(1, 2**63, MEMO_NUM_PERM, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, MEMO_NUM_PERM, dtype=np.uint64)
+        self._salts = _mix64(np.arange(1, len(self.columns) + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+
+    # -------------------- construction --------------------
+
+    @classmethod
+    def build(cls, real: pd.DataFrame, fingerprint: str) -> "MemorizationIndex":
+        grid: Dict[str, Tuple[float, float]] = {}
+        for c in real.columns:
+            s = real[c]
+            if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+                vals = pd.to_numeric(s, errors="coerce")
+                std = float(vals.std())
+                if np.isfinite(std) and std > 0 and vals.nunique() > 20:
+                    grid[str(c)] = (float(vals.min()), std * MEMO_NUMERIC_RESOLUTION)
+                else:
+                    grid[str(c)] = (0.0, 0.0)  # few levels: exact value
+        index = cls(fingerprint, [str(c) for c in real.columns], grid)
+        index.keys, index.sig = index.hash_rows(real)
+        index.source = np.full(len(real), REAL_SOURCE, dtype=np.int32)
+        index.nearest_real = np.full(len(real), -1, dtype=np.int32)
+        return index
+
+    @property
+    def n_real(self) -> int:
+        return int(np.count_nonzero(self.source == REAL_SOURCE))
+
+    # -------------------- hashing --------------------
+
+    def _tokens(self, df: pd.DataFrame) -> np.ndarray:
+        """(rows, columns) uint64 token hashes; a missing column hashes like a missing value."""
+        n = len(df)
+        out = np.empty((n, len(self.columns)), dtype=np.uint64)
+        for j, c in enumerate(self.columns):
+            if c not in df.columns:
+                out[:, j] = 0
+            elif c in self.grid:
+                origin, step = self.grid[c]
+                vals = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+                q = np.floor((vals - origin) / step) if step > 0 else vals + 0.0  # + 0.0 folds -0.0
+                q[~np.isfinite(q)] = np.inf
+                out[:, j] = q.view(np.uint64)
+            else:
+                out[:, j] = pd.util.hash_array(df[c].astype(str).to_numpy(dtype=object))
+        return _mix64(out ^ self._salts)
+
+    def signatures(self, df: pd.DataFrame) -> np.ndarray:
+        """(rows, MEMO_NUM_PERM) uint32 MinHash signatures."""
+        sig = np.zeros((len(df), MEMO_NUM_PERM), dtype=np.uint32)
+        if not self.columns:
+            return sig
+        tokens = self._tokens(df)
+        with np.errstate(over="ignore"):
+            for p in range(MEMO_NUM_PERM):
+                sig[:, p] = (((tokens * self._a[p] + self._b[p]) >> np.uint64(32)).min(axis=1) & _MASK32)
+        return sig
+
+    def hash_rows(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """(band keys (rows, MEMO_BANDS) uint64, low-byte signatures (rows, MEMO_NUM_PERM) uint8)."""
+        sig = self.signatures(df)
+        s = sig.astype(np.uint64).reshape(len(sig), MEMO_BANDS, 4)
+        hi = (s[:, :, 0] << np.uint64(32)) | s[:, :, 1]
+        lo = (s[:, :, 2] << np.uint64(32)) | s[:, :, 3]
+        keys = _mix64(_mix64(hi) ^ lo ^ np.arange(MEMO_BANDS, dtype=np.uint64))
+        return keys, (sig & 0xFF).astype(np.uint8)
+
+    def _buckets(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Per band: (sorted keys, record ids in that order); rebuilt after each release."""
+        if self._bands is None:
+            bands = []
+            for b in range(MEMO_BANDS):
+                order = np.argsort(self.keys[:, b], kind="stable")
+                bands.append((self.keys[order, b], order.astype(np.int64)))
+            self._bands = bands
+        return self._bands
+
+    # -------------------- lookup --------------------
+
+    def candidates(self, qkeys: np.ndarray, sig: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(query row, record id, estimated Jaccard) for every LSH candidate pair (may repeat)."""
+        if len(sig) == 0 or len(self.sig) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+        q_parts, c_parts = [], []
+        for b, (keys, ids) in enumerate(self._buckets()):
+            lo = np.searchsorted(keys, qkeys[:, b], side="left")
+            hi = np.minimum(np.searchsorted(keys, qkeys[:, b], side="right"), lo + MEMO_MAX_BUCKET)
+            counts = hi - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            q = np.repeat(np.arange(len(sig)), counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            q_parts.append(q)
+            c_parts.append(ids[np.repeat(lo, counts) + offsets])
+        if not q_parts:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+        # Pairs colliding in several bands repeat; every consumer tolerates that,
+        # which is cheaper than deduplicating
+        q, c = np.concatenate(q_parts), np.concatenate(c_parts)
+        match = np.count_nonzero(sig[q] == self.sig[c], axis=1) / MEMO_NUM_PERM
+        # Low bytes also agree by chance (1/256) when the full MinHash values differ
+        return q, c, (match - 1 / 256) / (1 - 1 / 256)
+
+    def screen(self, synth: pd.DataFrame, release_id: Optional[str] = None,
+               threshold: float = MEMO_THRESHOLD) -> Dict[str, Any]:
+        """
+        Near-copy report for a release against the real records and all earlier releases.
+
+        Reports the share of rows near a real record / an earlier release and how
+        many real records this release copies that earlier releases already
+        copied. With `release_id` the release is then added to the index (once).
+        """
+        start = time.time()
+        keys, sig = self.hash_rows(synth)
+        with self._lock:
+            own = self.releases.index(release_id) if release_id in self.releases else None
+            q, c, sim = self.candidates(keys, sig)
+            keep = sim >= threshold
+            if own is not None:
+                keep &= self.source[c] != own  # re-screening a release ignores its own rows
+            q, c, sim = q[keep], c[keep], sim[keep]
+            from_real = self.source[c] == REAL_SOURCE
+
+            n = len(synth)
+            nearest_real = np.full(n, -1, dtype=np.int32)
+            if from_real.any():
+                # Best real match per row: sort by (row, -similarity) and keep the first
+                rq, rc, rs = q[from_real], c[from_real], sim[from_real]
+                order = np.lexsort((-rs, rq))
+                rq, rc = rq[order], rc[order]
+                first = np.r_[True, rq[1:] != rq[:-1]]
+                nearest_real[rq[first]] = rc[first]
+            near_release = np.zeros(n, dtype=bool)
+            near_release[q[~from_real]] = True
+
+            # Number of earlier releases that copied each real record
+            earlier = (self.source != REAL_SOURCE) & (self.nearest_real >= 0)
+            if own is not None:
+                earlier &= self.source != own
+            pairs = np.unique(self.nearest_real[earlier].astype(np.int64) * (len(self.releases) + 1)
+                              + self.source[earlier])
+            prior = np.bincount(pairs // (len(self.releases) + 1), minlength=self.n_real)
+            copied = np.unique(nearest_real[nearest_real >= 0])
+            repeated = copied[prior[copied] > 0]
+
+            report = {
+                "rows": n,
+                "threshold": threshold,
+                "near_real_rate": float(np.mean(nearest_real >= 0)) if n else 0.0,
+                "near_release_rate": float(np.mean(near_release)) if n else 0.0,
+                "real_records_copied": int(copied.size),
+                "repeated_real_records": int(repeated.size),
+                "max_releases_per_record": int(prior[copied].max() + 1) if copied.size else 0,
+                "prior_releases": len(self.releases) - (own is not None),
+                "indexed_records": int(len(self.sig)),
+            }
+            if release_id is not None and own is None:
+                self._append(str(release_id), keys, sig, nearest_real)
+        report["elapsed_ms"] = round((time.time() - start) * 1000.0, 2)
+        return report
+
+    def _append(self, release_id: str, keys: np.ndarray, sig: np.ndarray, nearest_real: np.ndarray) -> None:
+        self.releases.append(release_id)
+        self.keys = np.vstack([self.keys, keys])
+        self.sig = np.vstack([self.sig, sig])
+        self.source = np.r_[self.source, np.full(len(sig), len(self.releases) - 1, dtype=np.int32)]
+        self.nearest_real = np.r_[self.nearest_real, nearest_real]
+        excess = len(self.sig) - max(MEMO_MAX_RECORDS, self.n_real)
+        if excess > 0:
+            # Drop the oldest released rows; real records are always kept
+            keep = np.ones(len(self.sig), dtype=bool)
+            keep[np.flatnonzero(self.source != REAL_SOURCE)[:excess]] = False
+            self.keys, self.sig = self.keys[keep], self.sig[keep]
+            self.source, self.nearest_real = self.source[keep], self.nearest_real[keep]
+        self._bands = None
+
+    def add_release(self, release_id: str, keys: np.ndarray, sig: np.ndarray, nearest_real: np.ndarray) -> bool:
+        """Add a release screened elsewhere (loaded from storage); False if it is already indexed."""
+        with self._lock:
+            self._listed.add(release_id)
+            if release_id in self.releases:
+                return False
+            self._append(release_id, keys, sig, nearest_real)
+            return True
+
+    # -------------------- persistence (NPZ) --------------------
+
+    def _rows(self, source: int) -> np.ndarray:
+        return np.flatnonzero(self.source == source)
+
+    def release_rows(self, release_id: str) -> int:
+        """Indexed rows of one release (0 if unknown)."""
+        with self._lock:
+            if release_id not in self.releases:
+                return 0
+            return int(len(self._rows(self.releases.index(release_id))))
+
+    def base_bytes(self) -> bytes:
+        """The real records only (the immutable base object)."""
+        rows = self._rows(REAL_SOURCE)
+        header = {
+            "version": MEMO_INDEX_VERSION,
+            "fingerprint": self.fingerprint,
+            "columns": self.columns,
+            "grid": self.grid,
+            "releases": [],
+        }
+        buf = io.BytesIO()
+        np.savez_compressed(buf, header=np.array(json.dumps(header)), keys=self.keys[rows], sig=self.sig[rows],
+                            source=self.source[rows], nearest_real=self.nearest_real[rows])
+        return buf.getvalue()
+
+    def release_bytes(self, release_id: str) -> Optional[bytes]:
+        """One release's rows (keys, signatures, copied real record); None if it is not indexed."""
+        with self._lock:
+            if release_id not in self.releases:
+                return None
+            rows = self._rows(self.releases.index(release_id))
+            keys, sig, nearest = self.keys[rows], self.sig[rows], self.nearest_real[rows]
+        header = {"version": MEMO_INDEX_VERSION, "fingerprint": self.fingerprint, "release": release_id}
+        buf = io.BytesIO()
+        np.savez_compressed(buf, header=np.array(json.dumps(header)), keys=keys, sig=sig, nearest_real=nearest)
+        return buf.getvalue()
+
+    def load_release(self, raw: bytes) -> bool:
+        """Add a release object written by release_bytes; False for other versions/datasets or known releases."""
+        with np.load(io.BytesIO(raw), allow_pickle=False) as z:
+            header = json.loads(str(z["header"]))
+            if header.get("version") != MEMO_INDEX_VERSION or header.get("fingerprint") != self.fingerprint:
+                return False
+            return self.add_release(str(header["release"]), z["keys"], z["sig"], z["nearest_real"])
+
+    def to_bytes(self) -> bytes:
+        header = {
+            "version": MEMO_INDEX_VERSION,
+            "fingerprint": self.fingerprint,
+            "columns": self.columns,
+            "grid": self.grid,
+            "releases": self.releases,
+        }
+        buf = io.BytesIO()
+        np.savez_compressed(buf, header=np.array(json.dumps(header)), keys=self.keys, sig=self.sig,
+                            source=self.source, nearest_real=self.nearest_real)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> Optional["MemorizationIndex"]:
+        """Load a persisted index; returns None for other index versions."""
+        with np.load(io.BytesIO(raw), allow_pickle=False) as z:
+            header = json.loads(str(z["header"]))
+            if header.get("version") != MEMO_INDEX_VERSION:
+                return None
+            grid = {c: tuple(v) for c, v in header["grid"].items()}
+            return cls(header["fingerprint"], header["columns"], grid, header["releases"],
+                       z["keys"], z["sig"], z["source"], z["nearest_real"])
+
+
+def index_storage_path(dataset_path: str, fingerprint: str) -> str:
+    """Single-file index of earlier versions: <dir>/.memorization/<fingerprint>.v<version>.npz (read for migration)."""
+    base = os.path.dirname(dataset_path.strip("/"))
+    name = f".memorization/{fingerprint}.v{MEMO_INDEX_VERSION}.npz"
+    return f"{base}/{name}" if base else name
+
+
+def index_storage_dir(dataset_path: str, fingerprint: str) -> str:
+    """Index folder next to the dataset file: <dir>/.memorization/<fingerprint>.v<version>/"""
+    return index_storage_path(dataset_path, fingerprint)[:-len(".npz")]
+
+
+def _release_name(release_id: str, rows: int) -> str:
+    # The row count is in the name so loaders can skip releases beyond MEMO_MAX_RECORDS unseen
+    return f"release-{release_id}.{rows}.npz"
+
+
+def _parse_release_name(name: str) -> Optional[Tuple[str, int]]:
+    if not (name.startswith("release-") and name.endswith(".npz")):
+        return None
+    stem, _, rows = name[len("release-"):-len(".npz")].rpartition(".")
+    return (stem, int(rows)) if stem and rows.isdigit() else None
+
+
+def _download(storage, path: str) -> bytes:
+    raw = storage.download(path)
+    return bytes(raw) if isinstance(raw, (bytes, bytearray)) else raw.read()
+
+
+def _upload_new(storage, path: str, data: bytes) -> bool:
+    """Create an immutable object; an existing one (same content by construction) counts as success."""
+    try:
+        storage.upload(path=path, file=data,
+                       file_options={"contentType": "application/octet-stream", "upsert": "false"})
+        return True
+    except Exception as e:
+        if "exist" in str(e).lower() or "duplicate" in str(e).lower():
+            return True
+        logger.warning(f"[memorization] could not persist {path}: {e}")
+        return False
+
+
+def _list_releases(storage, folder: str) -> List[Tuple[str, str, int]]:
+    """(object name, release id, rows) of every stored release, oldest first."""
+    items: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        page = storage.list(folder, {"limit": MEMO_LIST_PAGE, "offset": offset,
+                                     "sortBy": {"column": "created_at", "order": "asc"}}) or []
+        items.extend(page)
+        if len(page) < MEMO_LIST_PAGE:
+            break
+        offset += len(page)
+    out = []
+    for item in items:
+        parsed = _parse_release_name(item.get("name") or "")
+        if parsed is not None:
+            out.append((item["name"], parsed[0], parsed[1]))
+    return out
+
+
+def sync_releases(index: MemorizationIndex, storage, dataset_path: str) -> int:
+    """
+    Load releases other workers stored since this index was last synced (newest
+    first up to MEMO_MAX_RECORDS; older ones are skipped unseen). Returns the count.
+    """
+    folder = index_storage_dir(dataset_path, index.fingerprint)
+    listed = _list_releases(storage, folder)
+    new = [item for item in listed if item[1] not in index._listed]
+    room = MEMO_MAX_RECORDS - index.n_real
+    keep: List[Tuple[str, str, int]] = []
+    for item in reversed(new):
+        if keep and item[2] > room:
+            break
+        keep.append(item)
+        room -= item[2]
+    loaded = 0
+    for name, release_id, _ in reversed(keep):
+        try:
+            loaded += index.load_release(_download(storage, f"{folder}/{name}"))
+        except Exception as e:
+            logger.warning(f"[memorization] release {release_id} unreadable: {e}")
+    with index._lock:
+        index._listed.update(item[1] for item in new)
+    return loaded
+
+
+def _remember(index: MemorizationIndex) -> MemorizationIndex:
+    with _CACHE_LOCK:
+        _CACHE[index.fingerprint] = index
+        _CACHE.move_to_end(index.fingerprint)
+        while len(_CACHE) > max(1, MEMO_CACHE_SIZE):
+            _CACHE.popitem(last=False)
+    return index
+
+
+def _load_base(real: pd.DataFrame, fp: str, storage, dataset_path: str) -> MemorizationIndex:
+    """Stored base object → single-file index of earlier versions (migrated) → build and store the base."""
+    folder = index_storage_dir(dataset_path, fp)
+    try:
+        loaded = MemorizationIndex.from_bytes(_download(storage, f"{folder}/base.npz"))
+        if loaded is not None and loaded.fingerprint == fp:
+            return loaded
+    except Exception:
+        pass  # first release of this dataset (or not migrated yet)
+    index = None
+    try:
+        legacy = MemorizationIndex.from_bytes(_download(storage, index_storage_path(dataset_path, fp)))
+        if legacy is not None and legacy.fingerprint == fp:
+            index = legacy
+    except Exception:
+        pass
+    index = index or MemorizationIndex.build(real, fp)
+    _upload_new(storage, f"{folder}/base.npz", index.base_bytes())
+    for release_id in index.releases:
+        name = _release_name(release_id, index.release_rows(release_id))
+        _upload_new(storage, f"{folder}/{name}", index.release_bytes(release_id))
+    return index
+
+
+def get_memorization_index(real: pd.DataFrame, storage=None, dataset_path: Optional[str] = None) -> Optional[MemorizationIndex]:
+    """
+    Index for this real frame: in-process cache (or the stored base object, or
+    a fresh build), then synced with every release stored since.
+
+    `storage` is a bucket handle with download/upload/list (see get_dataset_profile).
+    Never raises; returns None if the index cannot be built.
+    """
+    try:
+        from libs.dataset_profile import frame_fingerprint
+        fp = frame_fingerprint(real)
+        with _CACHE_LOCK:
+            index = _CACHE.get(fp)
+            if index is not None:
+                _CACHE.move_to_end(fp)
+        persisted = storage is not None and bool(dataset_path)
+        if index is None:
+            index = _remember(_load_base(real, fp, storage, dataset_path) if persisted else MemorizationIndex.build(real, fp))
+        if persisted:
+            try:
+                sync_releases(index, storage, dataset_path)
+            except Exception as e:
+                logger.warning(f"[memorization] could not sync stored releases: {e}")
+        return index
+    except Exception as e:
+        logger.warning(f"[memorization] index unavailable: {e}")
+        return None
+
+
+def save_memorization_index(index: MemorizationIndex, storage, dataset_path: Optional[str], release_id: str) -> bool:
+    """Store one release as its own object (the base and earlier releases are never re-uploaded)."""
+    if storage is None or not dataset_path:
+        return False
+    data = index.release_bytes(str(release_id))
+    if data is None:
+        return False
+    name = _release_name(str(release_id), index.release_rows(str(release_id)))
+    path = f"{index_storage_dir(dataset_path, index.fingerprint)}/{name}"
+    return _upload_new(storage, path, data)
+
+
+def clear_memorization_indexes() -> None:
+    with _CACHE_LOCK:
+        _CACHE.clear()
@@ -0,0 +1,175 @@
+"""
+Memoized metric results keyed by (real hash, synth hash, metric, version).
+
+Scoring the same real/synthetic pair twice - the final metric pass after a
+search attempt, a benchmark re-run, a report re-render - returns the stored
+result instead of recomputing it. Results are
+therefore also consistent: stochastic metrics (MIA proxy, red team) give the
+same numbers for the same data.
+
+Entries live in an in-process LRU and, when METRIC_CACHE_DIR is set, as pickle
+files on disk (shared by worker processes on the same host). Bump a metric's
+entry in METRIC_VERSIONS whenever its implementation changes.
+"""
+
+import os
+import copy
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+METRIC_CACHE_SIZE = int(os.getenv("METRIC_CACHE_SIZE", "256"))
+METRIC_CACHE_DIR = os.getenv("METRIC_CACHE_DIR", "").strip()
+METRIC_CACHE_ENABLED = os.getenv("METRIC_CACHE", "true").lower() in ("1", "true", "yes", "on")
+
+# Version per metric component; unknown components use DEFAULT_VERSION
+DEFAULT_VERSION = "1"
+METRIC_VERSIONS: Dict[str, str] = {
+    "synthcity_utility": "1",
+    "synthcity_privacy": "1",
+    "ks": "2",            # presorted real columns (dataset profile)
+    "correlation": "2",   # blockwise engine with categorical associations
+    "mle": "2",           # batched TSTR engine
+    "mia": "2",           # member-vs-holdout attack
+    "dup_rate": "1",
+    "attr_disclosure": "3",  # kNN attack over all sensitive columns
+    "red_team": "2",         # attribute inference enabled
+    "clinical": "1",
+    "clinical_extended": "1",
+    "fairness": "1",
+    "bootstrap": "1",
+    "report_pdf": "1",       # API PDF render (api/main.py); the version also carries a payload digest
+}
+
+CacheKey = Tuple[str, str, str, str]
+
+_MISS = object()
+
+
+def metric_version(metric: str) -> str:
+    return METRIC_VERSIONS.get(metric, DEFAULT_VERSION)
+
+
+def metric_key(real_fp: str, synth_fp: str, metric: str, version: Optional[str] = None) -> CacheKey:
+    return (real_fp, synth_fp, metric, version or metric_version(metric))
+
+
+class MetricCache:
+    """Thread-safe LRU of metric results with an optional on-disk layer."""
+
+    def __init__(self, max_entries: int = METRIC_CACHE_SIZE, directory: Optional[str] = METRIC_CACHE_DIR or None):
+        self.max_entries = max(1, max_entries)
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[CacheKey, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: CacheKey) -> str:
+        digest = hashlib.sha256("|".join(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.pkl")
+
+    def _remember(self, key: CacheKey, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, key: CacheKey, default: Any = None) -> Any:
+        """Stored result for `key` (a private copy, safe to mutate) or `default`."""
+        with self._lock:
+            value = self._entries.get(key, _MISS)
+            if value is not _MISS:
+                self._entries.move_to_end(key)
+        if value is _MISS and self.directory:
+            try:
+                with open(self._path(key), "rb") as f:
+                    stored_key, value = pickle.load(f)
+                if tuple(stored_key) != key:
+                    value = _MISS
+                else:
+                    self._remember(key, value)
+            except FileNotFoundError:
+                value = _MISS
+            except Exception as e:
+                logger.warning(f"[metric-cache] Unreadable entry for {key[2]}: {e}")
+                value = _MISS
+        if value is _MISS:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key: CacheKey, value: Any) -> None:
+        value = copy.deepcopy(value)
+        self._remember(key, value)
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except Exception as e:
+            logger.warning(f"[metric-cache] Could not persist {key[2]}: {e}")
+
+    def memoize(self, key: CacheKey, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Return the cached result for `key`, computing and storing it on a miss (None is not stored)."""
+        hit = self.get(key, _MISS)
+        if hit is not _MISS:
+            return hit
+        value = fn(*args, **kwargs)
+        if value is not None:
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return {"entries": size, "hits": self.hits, "misses": self.misses, "disk": bool(self.directory)}
+
+
+_DEFAULT: Optional[MetricCache] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_metric_cache() -> Optional[MetricCache]:
+    """Process-wide cache, or None when METRIC_CACHE is disabled."""
+    global _DEFAULT
+    if not METRIC_CACHE_ENABLED:
+        return None
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = MetricCache()
+        return _DEFAULT
+
+
+def pair_fingerprints(real: pd.DataFrame, synth: pd.DataFrame) -> Tuple[str, str]:
+    """Content hashes of a real/synthetic pair (the real side is memoized per frame object)."""
+    from libs.dataset_profile import frame_fingerprint
+    from libs.encoding import dataset_fingerprint
+    return frame_fingerprint(real), dataset_fingerprint(synth)
+
+
+def cached_metric(metric: str, fn: Callable[..., Any], real: pd.DataFrame, synth: pd.DataFrame, *args, **kwargs) -> Any:
+    """fn(real, synth, *args) memoized on the pair's content hashes."""
+    cache = get_metric_cache()
+    if cache is None:
+        return fn(real, synth, *args, **kwargs)
+    real_fp, synth_fp = pair_fingerprints(real, synth)
+    return cache.memoize(metric_key(real_fp, synth_fp, metric), fn, real, synth, *args, **kwargs)
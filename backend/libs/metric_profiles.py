@@ -0,0 +1,349 @@
+"""
+Named metric profiles and per-metric instrumentation.
+
+A profile decides which metric components run during an evaluation and how long
+each may take. Every component runs through a MetricRecorder, which measures
+wall time and peak resident memory and degrades gracefully (skipped / timeout /
+error → fallback value) so one slow metric cannot stall an optimizer retry.
+Components called on a (real, synth) frame pair are memoized in the metric
+cache (libs.metric_cache), so re-scoring the same pair is free.
+
+Gate metrics come from the same (custom) estimators in every profile; profiles
+only add or drop reported components (SynthCity evaluators, red team, ...), so a
+result that passes search is gated on the same numbers in the final pass.
+
+Budgets are cooperative: a component reads its deadline with `metric_deadline()`
+(the TSTR fits and bootstrap replicates stop there). A component that overruns
+is given METRIC_TIMEOUT_GRACE_S to return and otherwise recorded as a timeout;
+a recorder never starts a component again while its own earlier, abandoned run
+of it is still going (other recorders - other runs - are not held up).
+
+Profiles:
+  - search-fast: only the metrics that gate retries (KS, corr Δ, MIA, dup rate,
+    MLE, attribute disclosure, k-anonymity/HIPAA risk, bootstrap CIs of the
+    gate metrics) with tight budgets.
+  - final-full:  everything, with generous budgets (default for the final report).
+  - regulatory:  everything, no time budgets (nothing may be dropped).
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PROFILE_SEARCH = os.getenv("METRIC_PROFILE_SEARCH", "search-fast").strip().lower()
+METRIC_PROFILE_FINAL = os.getenv("METRIC_PROFILE_FINAL", "final-full").strip().lower()
+METRIC_MEM_SAMPLE_MS = float(os.getenv("METRIC_MEM_SAMPLE_MS", "20"))
+METRIC_TIMEOUT_GRACE_S = float(os.getenv("METRIC_TIMEOUT_GRACE_S", "5"))
+
+_LOCAL = threading.local()
+
+# Components measured by the worker (keys of MetricProfile.enabled / budgets)
+_DEFAULT_CACHE = object()
+
+COMPONENTS = (
+    "synthcity_utility", "ks", "correlation", "mle",
+    "synthcity_privacy", "mia", "dup_rate", "attr_disclosure",
+    "red_team", "clinical", "clinical_extended", "fairness", "bootstrap",
+)
+
+
+@dataclass
+class MetricProfile:
+    """Which metric components run and their time budgets in seconds (None = unbounded)."""
+    name: str
+    enabled: Dict[str, bool] = field(default_factory=dict)
+    budgets: Dict[str, Optional[float]] = field(default_factory=dict)
+    description: str = ""
+
+    def is_enabled(self, component: str) -> bool:
+        return self.enabled.get(component, True)
+
+    def budget(self, component: str) -> Optional[float]:
+        return self.budgets.get(component)
+
+
+PROFILES: Dict[str, MetricProfile] = {
+    "search-fast": MetricProfile(
+        name="search-fast",
+        enabled={
+            "synthcity_utility": False,
+            "synthcity_privacy": False,
+            "red_team": False,
+            "clinical_extended": False,
+            "fairness": False,
+        },
+        budgets={
+            "ks": 30.0, "correlation": 30.0, "mle": 45.0, "mia": 60.0,
+            "dup_rate": 30.0, "attr_disclosure": 45.0, "clinical": 30.0,
+            "bootstrap": 60.0,
+        },
+        description="Gate metrics only, tight budgets (optimizer retries)",
+    ),
+    "final-full": MetricProfile(
+        name="final-full",
+        budgets={
+            "synthcity_utility": 600.0, "synthcity_privacy": 600.0, "ks": 120.0,
+            "correlation": 120.0, "mle": 300.0, "mia": 300.0, "dup_rate": 120.0,
+            "attr_disclosure": 300.0, "red_team": 300.0, "clinical": 120.0,
+            "clinical_extended": 300.0, "fairness": 120.0, "bootstrap": 300.0,
+        },
+        description="All metrics with generous budgets (final report)",
+    ),
+    "regulatory": MetricProfile(
+        name="regulatory",
+        description="All metrics, no time budgets (certification)",
+    ),
+}
+
+
+def get_metric_profile(name: Optional[str]) -> MetricProfile:
+    key = (name or "").strip().lower().replace("_", "-")
+    if key not in PROFILES:
+        if key:
+            logger.warning(f"[metric-profile] Unknown profile '{name}', using final-full")
+        key = "final-full"
+    return PROFILES[key]
+
+
+def resolve_metric_profiles(config: Optional[Dict[str, Any]]) -> Tuple[MetricProfile, MetricProfile]:
+    """
+    (search, final) profiles from a run's config_json.
+
+    `metric_profile` may be a single name (used for the final evaluation) or
+    {"search": ..., "final": ...}. A "regulatory" final profile also forces
+    full metrics during search.
+    """
+    raw = (config or {}).get("metric_profile") if isinstance(config, dict) else None
+    search, final = METRIC_PROFILE_SEARCH, METRIC_PROFILE_FINAL
+    if isinstance(raw, dict):
+        search = raw.get("search") or search
+        final = raw.get("final") or final
+    elif isinstance(raw, str) and raw.strip():
+        final = raw
+        if get_metric_profile(raw).name == "regulatory":
+            search = raw
+    return get_metric_profile(search), get_metric_profile(final)
+
+
+# -------------------- Instrumentation --------------------
+
+def metric_deadline() -> Optional[float]:
+    """time.monotonic() deadline of the metric component running on this thread (None = unbounded)."""
+    return getattr(_LOCAL, "deadline", None)
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        try:
+            import resource
+            return int(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+        except Exception:
+            return 0
+
+
+class _PeakSampler:
+    """Background RSS sampler (tracemalloc slows numpy/pandas-heavy metrics several-fold)."""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = max(0.001, interval_s)
+        self.start_rss = _rss_bytes()
+        self.peak = self.start_rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            self.peak = max(self.peak, _rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self.peak = max(self.peak, _rss_bytes())
+
+    @property
+    def peak_delta_mb(self) -> float:
+        return round(max(0, self.peak - self.start_rss) / (1024 * 1024), 2)
+
+
+class MetricRecorder:
+    """
+    Runs metric components under a profile and records wall time / peak memory.
+
+    `timings` maps component → {"status", "wall_s", "peak_mb"[, "budget_s", "error"]}
+    and is written into the metrics payload by the worker. Status "cached" means
+    the result came from the metric cache.
+
+    `cache` defaults to the process-wide metric cache; pass None to disable.
+    Frame hashes are taken once per recorder, so a recorder must not outlive
+    in-place edits of the frames it scores.
+    """
+
+    def __init__(self, profile: Optional[MetricProfile] = None, mem_sample_ms: float = METRIC_MEM_SAMPLE_MS,
+                 cache: Any = _DEFAULT_CACHE):
+        self.profile = profile or get_metric_profile(None)
+        self.mem_sample_s = mem_sample_ms / 1000.0
+        self.timings: Dict[str, Dict[str, Any]] = {}
+        self.evaluator_backend = "custom"
+        self._started = time.time()
+        if cache is _DEFAULT_CACHE:
+            from libs.metric_cache import get_metric_cache
+            cache = get_metric_cache()
+        self.cache = cache
+        self._fingerprints: Dict[int, Tuple[Any, str]] = {}
+        self.pair: Optional[Tuple[str, str]] = None
+        self._overruns: Dict[str, threading.Thread] = {}  # component → run abandoned past its budget
+
+    def _cache_key(self, component: str, args: Tuple[Any, ...]):
+        """(real hash, synth hash, component, version) when called on a frame pair, else None."""
+        if self.cache is None or len(args) != 2:
+            return None
+        try:
+            import pandas as pd
+            from libs.metric_cache import metric_key
+            if not all(isinstance(a, pd.DataFrame) for a in args):
+                return None
+            fps = []
+            for frame in args:
+                hit = self._fingerprints.get(id(frame))
+                if hit is None or hit[0] is not frame:
+                    from libs.dataset_profile import frame_fingerprint
+                    from libs.encoding import dataset_fingerprint
+                    # Real frames are immutable once profiled; others are hashed once per recorder
+                    fp = frame_fingerprint(frame) if not fps else dataset_fingerprint(frame)
+                    hit = self._fingerprints[id(frame)] = (frame, fp)
+                fps.append(hit[1])
+            self.pair = (fps[0], fps[1])
+            return metric_key(fps[0], fps[1], component)
+        except Exception as e:
+            logger.warning(f"[metric-profile] Could not key {component} for caching: {e}")
+            return None
+
+    def enabled(self, component: str) -> bool:
+        return self.profile.is_enabled(component)
+
+    def _record(self, component: str, status: str, wall_s: float, peak_mb: float, **extra) -> None:
+        entry = {"status": status, "wall_s": round(wall_s, 4), "peak_mb": peak_mb}
+        budget = self.profile.budget(component)
+        if budget is not None:
+            entry["budget_s"] = budget
+        entry.update(extra)
+        self.timings[component] = entry
+
+    @contextmanager
+    def measure(self, component: str):
+        """Measure an inline block (no budget enforcement)."""
+        start = time.time()
+        sampler = _PeakSampler(self.mem_sample_s)
+        status = "ok"
+        try:
+            with sampler:
+                yield
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            self._record(component, status, time.time() - start, sampler.peak_delta_mb)
+
+    def run(self, component: str, fn: Callable[..., Any], *args, default: Any = None, **kwargs) -> Any:
+        """
+        Run one metric component under the profile.
+
+        Disabled → `default` (status "skipped"). Over budget → `default` (status
+        "timeout") unless the component returns within METRIC_TIMEOUT_GRACE_S
+        of its deadline (status "ok", over_budget). While a timed-out run is
+        still going, the next run of that component on this recorder waits up
+        to its own budget for it and otherwise times out without starting.
+        Exceptions → `default` (status "error").
+        """
+        if not self.enabled(component):
+            self._record(component, "skipped", 0.0, 0.0)
+            return default
+
+        key = None if kwargs else self._cache_key(component, args)
+        if key is not None:
+            start = time.time()
+            cached = self.cache.get(key, _DEFAULT_CACHE)
+            if cached is not _DEFAULT_CACHE:
+                self._record(component, "cached", time.time() - start, 0.0)
+                return cached
+
+        budget = self.profile.budget(component)
+        box: Dict[str, Any] = {}
+        start = time.time()
+        overrun = self._overruns.get(component)
+        if overrun is not None:
+            overrun.join(timeout=budget)
+            if overrun.is_alive():
+                self._record(component, "timeout", time.time() - start, 0.0, busy=True)
+                print(f"[worker][metrics] {component} still running from an earlier timeout; degraded to default")
+                return default
+            self._overruns.pop(component, None)
+        # A component nested in another one also keeps the outer deadline
+        deadline = None if budget is None else time.monotonic() + budget
+        outer = metric_deadline()
+        if outer is not None:
+            deadline = outer if deadline is None else min(outer, deadline)
+
+        def target():
+            previous = metric_deadline()
+            _LOCAL.deadline = deadline
+            try:
+                box["value"] = fn(*args, **kwargs)
+            except Exception as e:
+                box["error"] = e
+            finally:
+                _LOCAL.deadline = previous
+
+        sampler = _PeakSampler(self.mem_sample_s)
+        with sampler:
+            if budget is None:
+                target()
+            else:
+                t = threading.Thread(target=target, name=f"metric-{component}", daemon=True)
+                t.start()
+                t.join(timeout=budget)
+                if t.is_alive():
+                    # Cooperative components stop at metric_deadline(); give them a moment to return
+                    t.join(timeout=METRIC_TIMEOUT_GRACE_S)
+                if t.is_alive():
+                    self._overruns[component] = t
+        wall = time.time() - start
+        over = {"over_budget": True} if budget is not None and wall > budget else {}
+
+        if "value" in box:
+            self._record(component, "ok", wall, sampler.peak_delta_mb, **over)
+            if key is not None and box["value"] is not None:
+                self.cache.put(key, box["value"])
+            return box["value"]
+        if "error" in box:
+            err = box["error"]
+            self._record(component, "error", wall, sampler.peak_delta_mb, error=f"{type(err).__name__}: {err}"[:200], **over)
+            logger.warning(f"[metric-profile] {component} failed: {err}")
+            return default
+        self._record(component, "timeout", wall, sampler.peak_delta_mb)
+        print(f"[worker][metrics] {component} exceeded its {budget:.0f}s budget ({self.profile.name}); degraded to default")
+        return default
+
+    def summary(self) -> Dict[str, Any]:
+        out = {
+            "metric_profile": self.profile.name,
+            "metric_timings": dict(self.timings),
+            "metric_total_s": round(time.time() - self._started, 3),
+        }
+        if self.pair is not None:
+            # Content hashes of the scored pair (also keys the API's report cache)
+            out["metric_cache_key"] = {"real": self.pair[0], "synth": self.pair[1]}
+        return out
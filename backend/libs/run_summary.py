@@ -0,0 +1,103 @@
+"""
+Run summaries: the compact per-run row behind the dashboard listings
+(sql/run_summaries.sql).
+
+The worker writes the row when a run succeeds; the API derives the same fields
+from the metrics payload for runs that have none. Both go through
+`payload_summary`, and the report/audit thresholds live here, so the two sides
+(and the SQL backfill, which mirrors these formulas) agree.
+"""
+
+import math
+from typing import Any, Dict, Optional, Tuple
+
+# Report all-green status: every available headline metric within its limit
+ALL_GREEN_LIMITS = {"mia_auc": 0.60, "dup_rate": 0.05, "ks_mean": 0.15, "corr_delta": 0.10}
+# Dashboard audit gates (PRIVACY GATES); a missing metric fails its gate
+PRIVACY_AUDIT_LIMITS = {"mia_auc": 0.60, "dup_rate": 0.05}
+UTILITY_AUDIT_LIMITS = {"ks_mean": 0.10, "corr_delta": 0.15}
+
+# run_summaries columns derived from the payload (besides run_id, method, duration_seconds)
+SUMMARY_FIELDS: Tuple[str, ...] = (
+    "all_green", "ks_mean", "corr_delta", "mia_auc", "dup_rate", "privacy_score", "utility_score",
+    "auroc", "c_index", "rare_coverage", "freq_skew",
+    "compliance_passed", "compliance_score", "compliance_level", "n_synth",
+)
+
+
+def _num(v: Any) -> Optional[float]:
+    if isinstance(v, bool):
+        return None
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return f if math.isfinite(f) else None
+
+
+def headline_metrics(payload: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    """Headline numbers of a metrics payload; fairness may sit top-level or under utility."""
+    p_met = payload.get("privacy") or {}
+    u_met = payload.get("utility") or {}
+    fair = payload.get("fairness") or u_met.get("fairness") or {}
+    return {
+        "mia_auc": _num(p_met.get("mia_auc")),
+        "dup_rate": _num(p_met.get("dup_rate")),
+        "ks_mean": _num(u_met.get("ks_mean")),
+        "corr_delta": _num(u_met.get("corr_delta")),
+        "auroc": _num(u_met.get("auroc")),
+        "c_index": _num(u_met.get("c_index")),
+        "rare_coverage": _num(fair.get("rare_coverage")) if isinstance(fair, dict) else None,
+        "freq_skew": _num(fair.get("freq_skew")) if isinstance(fair, dict) else None,
+    }
+
+
+def within_limits(values: Dict[str, Any], limits: Dict[str, float], missing_passes: bool) -> bool:
+    """True when every gated value is at or below its limit; `missing_passes` decides absent values."""
+    for key, limit in limits.items():
+        v = values.get(key)
+        if v is None:
+            if not missing_passes:
+                return False
+        elif v > limit:
+            return False
+    return True
+
+
+def all_green(payload: Dict[str, Any]) -> bool:
+    """Report all-green status of a metrics payload (missing metrics do not count against it)."""
+    return within_limits(headline_metrics(payload), ALL_GREEN_LIMITS, missing_passes=True)
+
+
+def audit_passed(summary: Dict[str, Any]) -> Tuple[bool, bool]:
+    """(privacy, utility) audit passes of a summary row."""
+    return (within_limits(summary, PRIVACY_AUDIT_LIMITS, missing_passes=False),
+            within_limits(summary, UTILITY_AUDIT_LIMITS, missing_passes=False))
+
+
+def payload_summary(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    SUMMARY_FIELDS of a metrics payload. Scores fall back to the dashboard
+    formulas when the payload has no explicit privacy_score/utility_score.
+    """
+    head = headline_metrics(payload)
+    mia, dup, ks, cd = head["mia_auc"], head["dup_rate"], head["ks_mean"], head["corr_delta"]
+    utility_score = _num((payload.get("utility") or {}).get("utility_score"))
+    if not utility_score and ks is not None:
+        utility_score = max(0.0, 1.0 - ((ks + (cd or 0.0)) / 2.0))
+    privacy_score = _num((payload.get("privacy") or {}).get("privacy_score"))
+    if not privacy_score and mia is not None:
+        penalty = (dup * 5.0 if dup and dup > 0 else 0.0) + ((mia - 0.6) * 2.0 if mia > 0.6 else 0.0)
+        privacy_score = max(0.0, 1.0 - penalty)
+    compliance = payload.get("compliance") or {}
+    n_synth = _num((payload.get("meta") or {}).get("n_synth"))
+    return {
+        **head,
+        "all_green": within_limits(head, ALL_GREEN_LIMITS, missing_passes=True),
+        "privacy_score": privacy_score,
+        "utility_score": utility_score,
+        "compliance_passed": compliance.get("passed") if compliance else None,
+        "compliance_score": _num(compliance.get("score")) if compliance else None,
+        "compliance_level": compliance.get("level") if compliance else None,
+        "n_synth": int(n_synth) if n_synth is not None else None,
+    }
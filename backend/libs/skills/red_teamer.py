@@ -2,6 +2,7 @@ import pandas as pd
 import numpy as np
 import logging
 from typing import Dict, Any, List
+from pandas.api.types import is_numeric_dtype
 
 logger = logging.getLogger(__name__)
 
@@ -56,9 +57,11 @@ class RedTeamer:
             if not cols:
                 return {"attack_success_rate": 0.0, "details": "No common columns"}
 
-            # Standardize for matching (strings, lowercase)
+            from libs.frame_types import dictionary_map
+
+            # Standardize text for matching (strings, lowercase), once per distinct value
             def standard(df, c):
-                return df[c].astype(str).str.lower().str.strip()
+                return dictionary_map(df[c], lambda v: v.str.lower().str.strip(), as_category=False)
 
             logger.info(f"[{self.name}] Attacking {len(cols)} features on {sample_size} targets.")
             
@@ -93,8 +96,12 @@ class RedTeamer:
             
             # For this version, we will stick to the Worker's simpler robust implementation
             # We align types first
-            common_real = real[cols].copy()
-            common_synth = samples[cols].copy()
+            text_cols = [c for c in cols if not (is_numeric_dtype(real[c]) or is_numeric_dtype(synth[c]))]
+            common_real = real[cols].copy(deep=False)
+            common_synth = samples[cols].copy(deep=False)
+            for c in text_cols:
+                common_real[c] = standard(real, c)
+                common_synth[c] = standard(samples, c)
             
             # Check for exact matches
             merged = pd.merge(common_real, common_synth, on=cols, how='inner')
@@ -117,9 +124,20 @@ class RedTeamer:
         """
         Can an attacker infer a sensitive attribute (e.g. 'diagnosis') 
         given public attributes (age, zip)?
+
+        Uses the shared kNN attack (libs.attribute_inference); risk_score is the
+        worst per-column lift over guessing the most frequent class.
         """
         try:
-             # Just a placeholder for the advanced logic
-             return {"risk_score": 0.0, "details": "Not enabled in this tier"}
-        except Exception:
-            return {"risk_score": 0.0}
+            from libs.baseline_cache import get_real_baseline
+
+            res = get_real_baseline(real).attribute_inference().attack(synth)
+            return {
+                "risk_score": res.get("max_lift") or 0.0,
+                "worst_column": res.get("worst_column"),
+                "quasi_identifiers": res.get("qis", []),
+                "details": res.get("columns", {}),
+            }
+        except Exception as e:
+            logger.error(f"[{self.name}] Attribute inference failed: {e}")
+            return {"risk_score": 0.0, "error": str(e)}
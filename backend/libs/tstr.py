@@ -0,0 +1,245 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from libs.encoding import dataset_fingerprint
+from libs.metric_profiles import metric_deadline
+
+logger = logging.getLogger(__name__)
+
+# Budgets keep utility evaluation time roughly constant as datasets grow
+TSTR_ROW_BUDGET = int(os.getenv("TSTR_ROW_BUDGET", "20000"))      # max rows per train/test side
+TSTR_TIME_BUDGET = float(os.getenv("TSTR_TIME_BUDGET", "30"))     # seconds per evaluation
+TSTR_MAX_ITER = int(os.getenv("TSTR_MAX_ITER", "100"))            # boosting iterations per model
+TSTR_MAX_TARGETS = int(os.getenv("TSTR_MAX_TARGETS", "3"))        # targets trained per batch
+TSTR_WORKERS = int(os.getenv("TSTR_WORKERS", "2"))
+TSTR_ITER_STEP = int(os.getenv("TSTR_ITER_STEP", "10"))           # boosting iterations between budget checks
+
+TARGET_NAMES = ('outcome', 'target', 'diagnosis', 'class', 'label', 'classification', 'y', 'status')
+MAX_CATEGORICAL_BINS = 255  # HistGradientBoosting native categorical limit
+
+
+def detect_targets(real: pd.DataFrame, max_targets: int = TSTR_MAX_TARGETS) -> List[Dict[str, Any]]:
+    """
+    Pick the prediction targets for TSTR once per dataset.
+
+    The first entry is the primary target (named outcome column, else the
+    lowest-cardinality 2-10 valued column, else the last non-identifier column);
+    further low-cardinality columns are added as secondary classification targets.
+    """
+    n = len(real)
+    nunique = {c: int(real[c].nunique()) for c in real.columns}
+
+    def task_for(col: str) -> str:
+        is_clf = real[col].dtype.kind not in 'iuf' or nunique[col] < 10
+        return "classification" if is_clf else "regression"
+
+    primary = next((c for c in real.columns if str(c).lower() in TARGET_NAMES and nunique[c] > 1), None)
+    if primary is None:
+        low_card = [c for c in real.columns if 2 <= nunique[c] <= 10]
+        if low_card:
+            primary = min(low_card, key=lambda c: nunique[c])
+    if primary is None:
+        # Drop purely unique columns like 'id' or 'PatientID' before choosing last column
+        cols = [c for c in real.columns if 1 < nunique[c] < n]
+        primary = cols[-1] if cols else None
+    if primary is None:
+        return []
+
+    targets = [{"column": primary, "task": task_for(primary), "primary": True}]
+    secondary = sorted((c for c in real.columns if c != primary and 2 <= nunique[c] <= 10), key=lambda c: nunique[c])
+    for c in secondary[:max(0, max_targets - 1)]:
+        targets.append({"column": c, "task": "classification", "primary": False})
+    return targets
+
+
+def subsample_index(n: int, budget: int, seed: int) -> np.ndarray:
+    if n <= budget:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(seed).choice(n, size=budget, replace=False))
+
+
+def train_bounded(task: str, X: np.ndarray, y: np.ndarray, categorical: Optional[np.ndarray] = None,
+                  seed: int = 42, max_iter: int = TSTR_MAX_ITER, deadline: Optional[float] = None):
+    """
+    Fit a bounded HistGradientBoosting model (multi-threaded, early stopping on large inputs).
+
+    With a `deadline` (time.monotonic() value) boosting grows in TSTR_ITER_STEP
+    increments (warm start) and stops at the first step past the deadline, so
+    the fit itself ends within about one step of the budget.
+    """
+    from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+
+    params = dict(max_iter=max_iter, early_stopping="auto", random_state=seed)
+    if categorical is not None and categorical.any():
+        params["categorical_features"] = categorical
+    cls = HistGradientBoostingClassifier if task == "classification" else HistGradientBoostingRegressor
+    if deadline is None:
+        return cls(**params).fit(X, y)
+
+    model = cls(**params, warm_start=True)
+    iters = min(max(1, TSTR_ITER_STEP), max_iter)
+    while True:
+        model.set_params(max_iter=iters)
+        model.fit(X, y)
+        if model.n_iter_ < iters or iters >= max_iter or time.monotonic() >= deadline:
+            return model  # converged (early stopping), complete, or out of time
+        iters = min(iters + TSTR_ITER_STEP, max_iter)
+
+
+def _score(task: str, model, X: np.ndarray, y: np.ndarray, n_classes: int) -> Dict[str, Optional[float]]:
+    from sklearn.metrics import f1_score, r2_score, roc_auc_score
+
+    if task == "regression":
+        return {"r2": float(r2_score(y, model.predict(X)))}
+
+    out: Dict[str, Optional[float]] = {"f1": float(f1_score(y, model.predict(X), average='weighted'))}
+    try:
+        # Align probabilities to the real label space (synthetic data may miss classes)
+        proba = np.zeros((len(X), n_classes))
+        proba[:, model.classes_.astype(int)] = model.predict_proba(X)
+        present = np.unique(y).astype(int)
+        if len(present) == 2:
+            out["auroc"] = float(roc_auc_score(y == present[1], proba[:, present[1]]))
+        elif len(present) > 2:
+            p = proba[:, present]
+            p = p / np.clip(p.sum(axis=1, keepdims=True), 1e-12, None)
+            out["auroc"] = float(roc_auc_score(y, p, multi_class='ovr', labels=present))
+    except Exception:
+        out["auroc"] = 0.5
+    return out
+
+
+class TSTREngine:
+    """
+    Train-on-synthetic / test-on-real for every detected target in one batch.
+
+    Built once per real dataset (through the real baseline cache): targets, the
+    real train/test split, encodings and real-trained reference scores are fixed.
+    `evaluate(synth)` trains one bounded model per target on the synthetic rows,
+    in parallel and under the row/time budgets, and returns AUROC/F1/R² together.
+    """
+
+    def __init__(self, baseline, row_budget: int = TSTR_ROW_BUDGET, time_budget: float = TSTR_TIME_BUDGET):
+        from sklearn.model_selection import train_test_split
+
+        self.baseline = baseline
+        self.encoder = baseline.encoder
+        self.seed = baseline.seed
+        self.row_budget = row_budget
+        self.time_budget = time_budget
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        real = baseline.real
+        self.targets = detect_targets(real)
+        idx = subsample_index(len(real), int(row_budget / 0.7), self.seed)
+        r_train, r_test = train_test_split(real.iloc[idx], test_size=0.3, random_state=self.seed)
+
+        self.specs: List[Dict[str, Any]] = []
+        for t in self.targets:
+            col = t["column"]
+            features = baseline.features_for(col)
+            spec = {**t, "features": features, "categorical": self._categorical_mask(features)}
+            if t["task"] == "classification":
+                classes = pd.Index(pd.unique(real[col].astype(str)))
+                spec["classes"] = classes
+                spec["y_test"] = classes.get_indexer(r_test[col].astype(str))
+                y_train = classes.get_indexer(r_train[col].astype(str))
+            else:
+                spec["y_test"] = self.encoder.encode_column(r_test[col], col, len(r_test))
+                y_train = self.encoder.encode_column(r_train[col], col, len(r_train))
+            spec["X_test"] = self.encoder.transform(r_test, features)
+            try:
+                X_train = self.encoder.transform(r_train, features)
+                model = train_bounded(t["task"], X_train, y_train, spec["categorical"], self.seed)
+                spec["real_scores"] = _score(t["task"], model, spec["X_test"], spec["y_test"], len(spec.get("classes", [])))
+            except Exception as e:
+                logger.warning(f"[tstr] real reference model for '{col}' failed: {e}")
+                spec["real_scores"] = {}
+            self.specs.append(spec)
+
+    def _categorical_mask(self, features: List[str]) -> np.ndarray:
+        return np.array([
+            (not self.encoder.is_numeric(c)) and len(self.encoder.categories.get(c, [])) <= MAX_CATEGORICAL_BINS
+            for c in features
+        ], dtype=bool)
+
+    @property
+    def primary(self) -> Optional[Dict[str, Any]]:
+        return self.specs[0] if self.specs else None
+
+    def _evaluate_target(self, spec: Dict[str, Any], synth: pd.DataFrame, deadline: float) -> Dict[str, Any]:
+        col = spec["column"]
+        if col not in synth.columns:
+            return {"task": spec["task"], "skipped": "missing column"}
+        if time.monotonic() >= deadline:  # queued behind targets that used up the budget
+            return {"task": spec["task"], "skipped": "time budget exceeded"}
+        idx = subsample_index(len(synth), self.row_budget, self.seed)
+        s = synth.iloc[idx]
+        X = self.encoder.transform(s, spec["features"])
+        if spec["task"] == "classification":
+            y = spec["classes"].get_indexer(s[col].astype(str))
+            keep = y >= 0
+            X, y = X[keep], y[keep]
+            if len(np.unique(y)) < 2:
+                return {"task": spec["task"], "skipped": "single class in synthetic data", "auroc": 0.5}
+        else:
+            y = self.encoder.encode_column(s[col], col, len(s))
+        model = train_bounded(spec["task"], X, y, spec["categorical"], self.seed, deadline=deadline)
+        scores = _score(spec["task"], model, spec["X_test"], spec["y_test"], len(spec.get("classes", [])))
+        out = {"task": spec["task"], **scores, "real": spec["real_scores"]}
+        if model.n_iter_ < TSTR_MAX_ITER and time.monotonic() >= deadline:
+            out["truncated_at_iter"] = int(model.n_iter_)
+        return out
+
+    def evaluate(self, synth: pd.DataFrame) -> Dict[str, Any]:
+        """Return per-target TSTR scores plus headline auroc/f1/r2/mle_score."""
+        key = dataset_fingerprint(synth)
+        with self._lock:
+            if key in self._last:
+                return self._last[key]
+
+        start = time.time()
+        per_target: Dict[str, Any] = {}
+        if self.specs:
+            # The budget is enforced inside each fit, so every worker is joined
+            # before returning: no model keeps training behind a later run
+            deadline = time.monotonic() + self.time_budget
+            outer = metric_deadline()  # the calling metric component's budget, if tighter
+            if outer is not None:
+                deadline = min(deadline, outer)
+            with ThreadPoolExecutor(max_workers=max(1, min(TSTR_WORKERS, len(self.specs)))) as pool:
+                futures = {pool.submit(self._evaluate_target, spec, synth, deadline): spec for spec in self.specs}
+                for fut, spec in futures.items():
+                    try:
+                        per_target[spec["column"]] = fut.result()
+                    except Exception as e:
+                        per_target[spec["column"]] = {"task": spec["task"], "error": str(e)}
+
+        result: Dict[str, Any] = {
+            "targets": per_target,
+            "primary_target": self.primary["column"] if self.primary else None,
+            "auroc": None, "f1": None, "r2": None, "mle_score": None,
+            "elapsed_s": round(time.time() - start, 3),
+        }
+        if self.primary:
+            prim = per_target.get(self.primary["column"], {})
+            result.update({k: prim.get(k) for k in ("auroc", "f1", "r2")})
+            # MLE: synthetic-trained score relative to the real-trained reference, capped at 1.0
+            metric = "f1" if self.primary["task"] == "classification" else "r2"
+            score_s = prim.get(metric)
+            score_r = (self.primary.get("real_scores") or {}).get(metric)
+            if score_s is not None and score_r is not None:
+                result["mle_score"] = 0.0 if score_r <= 0 else float(max(0.0, min(1.0, score_s / score_r)))
+
+        with self._lock:
+            # Keep only the most recent synthetic frame (utility + MLE share one fit)
+            self._last = {key: result}
+        return result
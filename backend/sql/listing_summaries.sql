@@ -0,0 +1,103 @@
+-- Aggregate listing functions for the dashboard (GET /v1/projects, /v1/runs, /v1/projects/{id})
+-- Run this in your Supabase SQL Editor after schema.sql and run_summaries.sql. Safe to re-run.
+--
+-- Each call returns one page of rows with their counts, last activity and
+-- summary metrics in a single query, ordered for keyset (cursor) pagination.
+-- The API falls back to batched table queries while these are not installed.
+-- Functions run with the caller's rights, so RLS still applies to non-service callers.
+
+-- Keyset pagination indexes
+create index if not exists idx_projects_owner_created on projects(owner_id, created_at desc, id desc);
+create index if not exists idx_runs_project_started on runs(project_id, started_at desc, id desc);
+
+create or replace function list_project_summaries(
+  p_owner uuid,
+  p_limit int default null,
+  p_cursor_created timestamptz default null,
+  p_cursor_id uuid default null
+)
+returns table (
+  id uuid,
+  name text,
+  owner_id uuid,
+  created_at timestamptz,
+  datasets_count bigint,
+  runs_count bigint,
+  last_run_at timestamptz
+)
+language sql stable
+as $$
+  select p.id, p.name, p.owner_id, p.created_at,
+         coalesce(d.n, 0), coalesce(r.n, 0), r.last_run_at
+  from projects p
+  left join lateral (select count(*) as n from datasets where datasets.project_id = p.id) d on true
+  left join lateral (
+    select count(*) as n, max(runs.started_at) as last_run_at from runs where runs.project_id = p.id
+  ) r on true
+  where p.owner_id = p_owner
+    and (p_cursor_created is null or (p.created_at, p.id) < (p_cursor_created, p_cursor_id))
+  order by p.created_at desc, p.id desc
+  limit p_limit
+$$;
+
+-- Runs not started yet (started_at null) sort first, as with "order by started_at desc".
+-- Scores come from run_summaries (sql/run_summaries.sql), never from metrics.payload_json.
+drop function if exists list_run_summaries(uuid, uuid, int, timestamptz, uuid, boolean);
+create or replace function list_run_summaries(
+  p_owner uuid,
+  p_project uuid default null,
+  p_limit int default null,
+  p_cursor_key timestamptz default null,
+  p_cursor_id uuid default null
+)
+returns table (
+  id uuid,
+  name text,
+  project_id uuid,
+  project_name text,
+  dataset_id uuid,
+  dataset_name text,
+  status text,
+  method text,
+  started_at timestamptz,
+  finished_at timestamptz,
+  config_json jsonb,
+  sort_key timestamptz,
+  duration_seconds double precision,
+  has_summary boolean,
+  all_green boolean,
+  ks_mean double precision,
+  corr_delta double precision,
+  mia_auc double precision,
+  dup_rate double precision,
+  privacy_score double precision,
+  utility_score double precision,
+  auroc double precision,
+  c_index double precision,
+  rare_coverage double precision,
+  freq_skew double precision,
+  compliance_passed boolean,
+  compliance_score double precision,
+  compliance_level text,
+  n_synth bigint
+)
+language sql stable
+as $$
+  select r.id, r.name, r.project_id, p.name, r.dataset_id, d.name, r.status::text, r.method,
+         r.started_at, r.finished_at, r.config_json,
+         coalesce(r.started_at, 'infinity'::timestamptz),
+         coalesce(s.duration_seconds, extract(epoch from coalesce(r.finished_at, now()) - r.started_at)::double precision),
+         s.run_id is not null, s.all_green, s.ks_mean, s.corr_delta, s.mia_auc, s.dup_rate,
+         s.privacy_score, s.utility_score, s.auroc, s.c_index, s.rare_coverage, s.freq_skew,
+         s.compliance_passed, s.compliance_score, s.compliance_level, s.n_synth
+  from runs r
+  join projects p on p.id = r.project_id
+  left join datasets d on d.id = r.dataset_id
+  left join run_summaries s on s.run_id = r.id
+  where p.owner_id = p_owner
+    and (p_project is null or r.project_id = p_project)
+    and (p_cursor_key is null
+         or (coalesce(r.started_at, 'infinity'::timestamptz), r.id) < (p_cursor_key, p_cursor_id))
+  order by coalesce(r.started_at, 'infinity'::timestamptz) desc, r.id desc
+  limit p_limit
+$$;
@@ -0,0 +1,87 @@
+-- Compact per-run summary written by the worker when a run succeeds.
+-- Listings (sql/listing_summaries.sql) read these narrow rows instead of metrics.payload_json.
+-- Run this in your Supabase SQL Editor before listing_summaries.sql. Safe to re-run.
+
+create table if not exists run_summaries (
+  run_id uuid primary key references runs(id) on delete cascade,
+  method text,
+  all_green boolean,
+  ks_mean double precision,
+  corr_delta double precision,
+  mia_auc double precision,
+  dup_rate double precision,
+  privacy_score double precision,
+  utility_score double precision,
+  auroc double precision,
+  c_index double precision,
+  rare_coverage double precision,
+  freq_skew double precision,
+  compliance_passed boolean,
+  compliance_score double precision,
+  compliance_level text,
+  n_synth bigint,
+  duration_seconds double precision,
+  created_at timestamptz not null default now()
+);
+
+-- Tables created before the utility/fairness headline columns
+alter table run_summaries add column if not exists auroc double precision;
+alter table run_summaries add column if not exists c_index double precision;
+alter table run_summaries add column if not exists rare_coverage double precision;
+alter table run_summaries add column if not exists freq_skew double precision;
+
+create index if not exists idx_run_summaries_all_green on run_summaries(all_green);
+
+alter table run_summaries enable row level security;
+
+drop policy if exists rs_select on run_summaries;
+create policy rs_select on run_summaries for select
+  using (exists (
+    select 1 from runs r join projects p on p.id = r.project_id
+    where r.id = run_summaries.run_id and p.owner_id = auth.uid()
+  ));
+
+-- Backfill runs that finished before the worker wrote summaries, and the headline columns of
+-- rows written before they existed (same formulas as libs/run_summary.py)
+create or replace function _jsonb_num(v jsonb) returns double precision
+language sql immutable
+as $$ select case when jsonb_typeof(v) = 'number' then (v #>> '{}')::double precision end $$;
+
+insert into run_summaries (
+  run_id, method, all_green, ks_mean, corr_delta, mia_auc, dup_rate, privacy_score, utility_score,
+  auroc, c_index, rare_coverage, freq_skew, compliance_passed, compliance_score, compliance_level, n_synth, duration_seconds
+)
+select m.run_id,
+       coalesce(m.payload_json->'meta'->>'model', r.method),
+       not (coalesce(v.mia > 0.60, false) or coalesce(v.dup > 0.05, false)
+            or coalesce(v.ks > 0.15, false) or coalesce(v.cd > 0.10, false)),
+       v.ks, v.cd, v.mia, v.dup,
+       coalesce(nullif(_jsonb_num(m.payload_json->'privacy'->'privacy_score'), 0),
+                case when v.mia is not null then greatest(0.0, 1.0
+                  - case when v.dup > 0 then v.dup * 5.0 else 0.0 end
+                  - case when v.mia > 0.6 then (v.mia - 0.6) * 2.0 else 0.0 end) end),
+       coalesce(nullif(_jsonb_num(m.payload_json->'utility'->'utility_score'), 0),
+                case when v.ks is not null then greatest(0.0, 1.0 - (v.ks + coalesce(v.cd, 0.0)) / 2.0) end),
+       _jsonb_num(m.payload_json->'utility'->'auroc'),
+       _jsonb_num(m.payload_json->'utility'->'c_index'),
+       _jsonb_num(coalesce(m.payload_json->'fairness', m.payload_json->'utility'->'fairness')->'rare_coverage'),
+       _jsonb_num(coalesce(m.payload_json->'fairness', m.payload_json->'utility'->'fairness')->'freq_skew'),
+       case when jsonb_typeof(m.payload_json->'compliance'->'passed') = 'boolean'
+            then (m.payload_json->'compliance'->>'passed')::boolean end,
+       _jsonb_num(m.payload_json->'compliance'->'score'),
+       m.payload_json->'compliance'->>'level',
+       _jsonb_num(m.payload_json->'meta'->'n_synth')::bigint,
+       extract(epoch from r.finished_at - r.started_at)::double precision
+from metrics m
+join runs r on r.id = m.run_id
+cross join lateral (
+  select _jsonb_num(m.payload_json->'privacy'->'mia_auc') as mia,
+         _jsonb_num(m.payload_json->'privacy'->'dup_rate') as dup,
+         _jsonb_num(m.payload_json->'utility'->'ks_mean') as ks,
+         _jsonb_num(m.payload_json->'utility'->'corr_delta') as cd
+) v
+on conflict (run_id) do update
+  set auroc = excluded.auroc, c_index = excluded.c_index,
+      rare_coverage = excluded.rare_coverage, freq_skew = excluded.freq_skew
+  where run_summaries.auroc is null and run_summaries.c_index is null
+    and run_summaries.rare_coverage is null and run_summaries.freq_skew is null;
@@ -147,9 +147,10 @@ def execute_allgreen_pipeline(run_id: str, dataset_id: str) -> Dict[str, Any]:
                      clean_path = clean_path[len(DATASET_BUCKET)+1:]
                  
                  print(f"[allgreen-worker] Downloading from Storage: {DATASET_BUCKET}/{clean_path}")
-                 b = supabase.storage.from_(DATASET_BUCKET).download(clean_path)
-                 raw = b if isinstance(b, (bytes, bytearray)) else b.read()
-                 real_df = pd.read_csv(io.BytesIO(raw))
+                 # Parquet copy written at upload when available, CSV otherwise
+                 from libs.dataset_store import load_dataset
+                 real_df, source = load_dataset(supabase.storage.from_(DATASET_BUCKET), clean_path)
+                 print(f"[allgreen-worker] Read {source} copy")
 
         except Exception as e:
             raise ValueError(f"Failed to download dataset ({file_url}): {e}")
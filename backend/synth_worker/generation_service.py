@@ -205,7 +205,9 @@ def generate_synthetic(csv_content, omop_mapping=None):
             "privacy": metrics['privacy'],
             "all_green": all_green,
             "pdf_path": str(pdf_path),
-            "synthetic_path": str(synthetic_path)
+            "synthetic_path": str(synthetic_path),
+            # In-process callers verify this frame instead of re-reading the CSV
+            "synthetic_data": synthetic_data
         }
     except Exception as e:
         print(f"[ERROR] Generation failed: {e}", flush=True)
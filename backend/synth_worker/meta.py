@@ -13,7 +13,16 @@ def extract_features(df: pd.DataFrame) -> Dict[str, float]:
       - pct_num, pct_cat
       - num_mean_skew (mean absolute skewness over numeric cols)
       - num_std_skew (std of absolute skewness)
+
+    Uses the cached dataset profile when this frame has one (libs.dataset_profile).
     """
+    try:
+        from libs.dataset_profile import peek_dataset_profile
+        profile = peek_dataset_profile(df)
+        if profile is not None and profile.meta_features:
+            return profile.meta_features
+    except Exception:
+        pass
     try:
         n_rows = int(df.shape[0])
         n_cols = int(df.shape[1]) or 1
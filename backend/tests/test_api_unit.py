@@ -6,6 +6,7 @@ Run with: pytest tests/test_api_unit.py -v
 import pytest
 import io
 import json
+import pandas as pd
 from fastapi.testclient import TestClient
 from unittest.mock import Mock, patch, MagicMock
 import sys
@@ -37,9 +38,55 @@ def mock_user():
     }
 
 
+class FakeAsyncRest:
+    """In-memory stand-in for api.main.db: tables of rows, `eq.` filters, tracks concurrent queries."""
+
+    def __init__(self, tables=None):
+        self.tables = tables or {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.queries = 0
+        self.objects = {}
+
+    async def select(self, table, columns="*", filters=None, order=None, limit=None):
+        import asyncio
+        self.queries += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        rows = [dict(r) for r in self.tables.get(table, [])
+                if all(str(r.get(k)) == v.split(".", 1)[1] for k, v in (filters or {}).items())]
+        return rows[:limit] if limit else rows
+
+    async def first(self, table, columns="*", filters=None, order=None):
+        rows = await self.select(table, columns, filters, order, limit=1)
+        return rows[0] if rows else None
+
+    async def signed_urls(self, bucket, paths, expires_in):
+        return {p: f"https://signed.example/{bucket}/{p}" for p in paths}
+
+    async def download(self, bucket, path):
+        from api.main import DataAccessError
+        self.queries += 1
+        if path not in self.objects:
+            raise DataAccessError(404, "Object not found")
+        return self.objects[path]
+
+
+@pytest.fixture
+def fake_db():
+    fake = FakeAsyncRest()
+    with patch('api.main.db', fake):
+        yield fake
+
+
 @pytest.fixture
 def override_auth(mock_user):
-    from api.main import require_user
+    from api.main import require_user, _AUTHZ_CACHE, _FINISHED, _FINISHED_BYTES
+    _AUTHZ_CACHE.clear()
+    _FINISHED.clear()
+    _FINISHED_BYTES[0] = 0
     app.dependency_overrides[require_user] = lambda: mock_user
     yield
     app.dependency_overrides.clear()
@@ -299,14 +346,14 @@ def test_cancel_run_queued(override_auth, mock_supabase):
 
 # ========== Metrics Tests ==========
 
-def test_get_metrics_valid(override_auth, mock_supabase):
+def test_get_metrics_valid(override_auth, fake_db):
     """UT-API-034: Get metrics - valid run_id"""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = {
-        "id": "test-run-id",
-        "metrics_json": {
+    fake_db.tables = {
+        "runs": [{"id": "test-run-id", "status": "succeeded", "project_id": "p1", "projects": {"owner_id": "test-user-id"}}],
+        "metrics": [{"run_id": "test-run-id", "payload_json": {
             "utility": {"ks_mean": 0.05, "corr_delta": 0.08},
             "privacy": {"mia_auc": 0.45, "dup_rate": 0.02}
-        }
+        }}],
     }
     
     response = client.get(
@@ -319,10 +366,8 @@ def test_get_metrics_valid(override_auth, mock_supabase):
     assert "privacy" in data
 
 
-def test_get_metrics_invalid(override_auth, mock_supabase):
+def test_get_metrics_invalid(override_auth, fake_db):
     """UT-API-035: Get metrics - invalid run_id"""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = None
-    
     response = client.get(
         "/v1/runs/invalid-id/metrics",
         headers={"Authorization": "Bearer valid-token"}
@@ -330,11 +375,11 @@ def test_get_metrics_invalid(override_auth, mock_supabase):
     assert response.status_code == 404
 
 
-def test_metrics_structure(override_auth, mock_supabase):
+def test_metrics_structure(override_auth, fake_db):
     """UT-API-036: Metrics structure validation"""
-    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = {
-        "id": "test-run-id",
-        "metrics_json": {
+    fake_db.tables = {
+        "runs": [{"id": "test-run-id", "status": "succeeded", "project_id": "p1", "projects": {"owner_id": "test-user-id"}}],
+        "metrics": [{"run_id": "test-run-id", "payload_json": {
             "utility": {
                 "ks_mean": 0.05,
                 "corr_delta": 0.08,
@@ -345,7 +390,7 @@ def test_metrics_structure(override_auth, mock_supabase):
                 "mia_auc": 0.45,
                 "dup_rate": 0.02
             }
-        }
+        }}],
     }
     
     response = client.get(
@@ -362,6 +407,442 @@ def test_metrics_structure(override_auth, mock_supabase):
     assert "mia_auc" in data["privacy"]
 
 
+def test_run_reads_run_concurrently_with_one_ownership_query(override_auth, fake_db):
+    """Run endpoints authorize with one embedded query and await their other reads alongside it"""
+    fake_db.tables = {
+        "runs": [
+            {"id": "r1", "status": "succeeded", "project_id": "p1", "method": "gc", "config_json": {},
+             "projects": {"owner_id": "test-user-id", "name": "Project"}, "dataset": {"name": "heart"}},
+            {"id": "r2", "status": "succeeded", "project_id": "p2", "projects": {"owner_id": "someone-else"}},
+        ],
+        "metrics": [{"run_id": "r1", "payload_json": {}}],
+        "run_artifacts": [{"run_id": "r1", "kind": "synthetic_csv", "path": "r1/synthetic.csv", "bytes": 10, "mime": "text/csv"}],
+        "run_steps": [{"run_id": "r1", "step_no": 1, "title": "training", "detail": "attempt 1 with gc"}],
+    }
+    auth = {"Authorization": "Bearer valid-token"}
+
+    artifacts = client.get("/v1/runs/r1/artifacts", headers=auth).json()
+    assert artifacts["artifacts_ready"] is True
+    assert artifacts["artifacts"][0]["signedUrl"] == "https://signed.example/artifacts/r1/synthetic.csv"
+    assert fake_db.max_in_flight == 3  # ownership, metrics and artifact rows in parallel
+
+    run = client.get("/v1/runs/r1", headers=auth).json()
+    assert run["project_name"] == "Project" and run["dataset_name"] == "heart"
+    assert "projects" not in run and run["agent_interventions"]["final_method"] == "gc"
+
+    steps = client.get("/v1/runs/r1/steps", headers=auth).json()
+    assert steps[0]["is_training"] and steps[0]["method_hint"] == "GC"
+
+    assert client.get("/v1/runs/r2/steps", headers=auth).status_code == 403
+    assert client.get("/v1/runs/r3/artifacts", headers=auth).status_code == 404
+
+
+def test_verified_token_claims_cached_until_exp():
+    """A verified token is decoded once and then served from the cache until it expires"""
+    import time
+    import api.main as api_main
+    api_main._TOKEN_CACHE.clear()
+    claims = {"sub": "u1", "email": "u1@example.com", "exp": time.time() + 60}
+    with patch("api.main._verified_claims", return_value=claims) as verify:
+        assert api_main.verify_token("tok-a") == claims
+        assert api_main.verify_token("tok-a") == claims
+        assert verify.call_count == 1
+        api_main._forget_user("u1")  # account deletion drops the cached token
+        api_main.verify_token("tok-a")
+        assert verify.call_count == 2
+
+    expired = {"sub": "u1", "exp": time.time() - 1}
+    with patch("api.main._verified_claims", return_value=expired) as verify:
+        api_main.verify_token("tok-b")
+        api_main.verify_token("tok-b")
+        assert verify.call_count == 2
+    api_main._TOKEN_CACHE.clear()
+
+
+def test_hs256_tokens_checked_against_configured_secret(monkeypatch):
+    """With SUPABASE_JWT_SECRET set, HS256 tokens it does not verify are rejected, not trusted unverified"""
+    import time
+    from jose import jwt as jose_jwt
+    import api.main as api_main
+    api_main._TOKEN_CACHE.clear()
+    claims = {"sub": "u1", "exp": int(time.time()) + 60}
+    good = jose_jwt.encode(claims, "right-secret", algorithm="HS256")
+    forged = jose_jwt.encode(claims, "wrong-secret", algorithm="HS256")
+    expired = jose_jwt.encode({"sub": "u1", "exp": int(time.time()) - 10}, "right-secret", algorithm="HS256")
+
+    monkeypatch.setattr(api_main, "SUPABASE_JWT_SECRET", "right-secret")
+    assert api_main.verify_token(good)["sub"] == "u1"
+    assert api_main.verify_token(forged) == {} and api_main.verify_token(expired) == {}
+    assert client.get("/v1/projects", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+
+    monkeypatch.setattr(api_main, "SUPABASE_JWT_SECRET", None)
+    assert api_main.verify_token(forged)["sub"] == "u1"  # no secret: unverified claims, as before
+    api_main._TOKEN_CACHE.clear()
+
+
+def test_run_ownership_cached_and_invalidated_on_delete(override_auth, mock_supabase):
+    """Repeat requests on an owned run skip the ownership queries until the run is deleted"""
+    row = {"id": "r1", "project_id": "p1", "owner_id": "test-user-id"}
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = row
+    auth = {"Authorization": "Bearer valid-token"}
+    single = mock_supabase.table.return_value.select.return_value.eq.return_value.single
+
+    assert client.patch("/v1/runs/r1/name", json={"name": "a"}, headers=auth).status_code == 200
+    assert single.call_count == 2  # runs, then projects.owner_id
+    assert client.delete("/v1/runs/r1", headers=auth).status_code == 200
+    assert single.call_count == 2  # cached grant, no queries
+    assert client.patch("/v1/runs/r1/name", json={"name": "b"}, headers=auth).status_code == 200
+    assert single.call_count == 4  # grant was dropped by the delete
+
+    row["owner_id"] = "someone-else"
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = {"id": "r2", "project_id": "p2", "owner_id": "someone-else"}
+    assert client.patch("/v1/runs/r2/name", json={"name": "c"}, headers=auth).status_code == 403
+    assert client.patch("/v1/runs/r2/name", json={"name": "c"}, headers=auth).status_code == 403  # denials are not cached
+
+
+def test_finished_run_responses_cached_with_etags(override_auth, fake_db, mock_supabase):
+    """Succeeded runs are served from memory with ETags; concurrent misses share one load"""
+    import asyncio
+    import httpx
+    fake_db.tables = {
+        "runs": [
+            {"id": "r1", "status": "succeeded", "project_id": "p1", "projects": {"owner_id": "test-user-id"}},
+            {"id": "r2", "status": "running", "project_id": "p1", "projects": {"owner_id": "test-user-id"}},
+        ],
+        "metrics": [{"run_id": "r1", "payload_json": {"utility": {"ks_mean": 0.1}}},
+                    {"run_id": "r2", "payload_json": {"utility": {"ks_mean": 0.3}}}],
+        "run_artifacts": [{"run_id": "r1", "kind": "report_json", "path": "r1/report.json"}],
+    }
+    fake_db.objects = {"r1/report.json": b'{"utility":{"ks_mean":0.1}}'}
+    auth = {"Authorization": "Bearer valid-token"}
+
+    async def fetch_together(path, n):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            return await asyncio.gather(*[ac.get(path, headers=auth) for _ in range(n)])
+
+    first = asyncio.run(fetch_together("/v1/runs/r1/metrics", 5))
+    assert fake_db.queries == 2  # one ownership + one metrics read for all five
+    assert {r.json()["utility"]["ks_mean"] for r in first} == {0.1}
+    etag = first[0].headers["etag"]
+
+    again = client.get("/v1/runs/r1/metrics", headers=auth)
+    assert again.json() == first[0].json() and again.headers["etag"] == etag
+    assert client.get("/v1/runs/r1/metrics", headers={**auth, "If-None-Match": etag}).status_code == 304
+    assert fake_db.queries == 2
+
+    plain = {**auth, "Accept-Encoding": "identity"}
+    report = client.get("/v1/runs/r1/report", headers=plain)
+    assert report.json() == {"utility": {"ks_mean": 0.1}}
+    queries = fake_db.queries
+    assert client.get("/v1/runs/r1/report", headers={**plain, "If-None-Match": report.headers["etag"]}).status_code == 304
+    assert fake_db.queries == queries
+
+    # The worker's precompressed report is passed through for clients that accept it, ETagged per variant
+    import gzip
+    fake_db.objects["r1/report.json.gz"] = gzip.compress(fake_db.objects["r1/report.json"], mtime=0)
+    gz = client.get("/v1/runs/r1/report", headers={**auth, "Accept-Encoding": "gzip"})
+    assert gz.headers["content-encoding"] == "gzip" and gz.json() == {"utility": {"ks_mean": 0.1}}
+    assert gz.headers["etag"] != report.headers["etag"] and "Accept-Encoding" in gz.headers["vary"]
+    assert client.get("/v1/runs/r1/report", headers={**auth, "Accept-Encoding": "gzip",
+                                                     "If-None-Match": gz.headers["etag"]}).status_code == 304
+    queries = fake_db.queries
+
+    # Runs still in progress are re-read every time
+    client.get("/v1/runs/r2/metrics", headers=auth)
+    client.get("/v1/runs/r2/metrics", headers=auth)
+    assert fake_db.queries == queries + 4
+
+    assert client.delete("/v1/runs/r1", headers=auth).status_code == 200  # ownership grant still cached
+    from api.main import _FINISHED
+    assert not any(k[1] == "r1" for k in _FINISHED)
+
+
+# ========== Report Cache Tests ==========
+
+def test_report_pdf_reuses_render_for_same_metrics(override_auth, mock_supabase):
+    """Re-requesting the PDF for unchanged metrics re-signs the stored file instead of re-rendering"""
+    import api.main as api_main
+    metrics = {"utility": {"ks_mean": 0.05}, "meta": {"metric_cache_key": {"real": "r1", "synth": "s1"}}}
+    owner = {"id": "test-run-id", "project_id": "p1", "owner_id": "test-user-id", "path": "test-run-id/report.json"}
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = owner
+    mock_supabase.table.return_value.select.return_value.eq.return_value.eq.return_value.single.return_value.execute.return_value.data = owner
+    mock_supabase.storage.from_.return_value.download.return_value = json.dumps(metrics).encode()
+    mock_supabase.storage.from_.return_value.create_signed_url.return_value = {"signedURL": "https://signed"}
+    api_main._REPORT_CACHE.clear()
+
+    with patch.object(api_main, "_render_report_pdf", return_value=b"%PDF-1.4 test") as render, \
+            patch.object(api_main, "ensure_bucket"):
+        first = client.post("/v1/runs/test-run-id/report/pdf", headers={"Authorization": "Bearer valid-token"})
+        second = client.post("/v1/runs/test-run-id/report/pdf", headers={"Authorization": "Bearer valid-token"})
+
+    assert first.status_code == 200 and second.status_code == 200
+    assert render.call_count == 1
+    assert second.json()["cached"] is True
+    assert api_main._report_cache_key(metrics)[:3] == ("r1", "s1", "report_pdf")
+    assert api_main._REPORT_CACHE.stats()["entries"] == 1
+
+    # The dev endpoint goes through the same cache
+    with patch.object(api_main, "_render_report_pdf", return_value=b"%PDF-1.4 test") as render, \
+            patch.object(api_main, "ensure_bucket"):
+        dev = client.post("/dev/runs/test-run-id/report/pdf")
+    assert dev.json()["cached"] is True and render.call_count == 0
+
+
+
+# ========== Upload Ingestion Tests ==========
+
+def test_upload_ingestion_profiles_in_chunks(mock_supabase):
+    """Chunked profile matches a full parse; the CSV is streamed to storage with a Parquet copy"""
+    import tempfile
+    import api.main as api_main
+    rows = ["id,group,score"] + [f"{i},{'ab'[i % 2]},{'' if i % 10 == 0 else i / 4}" for i in range(1200)]
+    upload = tempfile.SpooledTemporaryFile(max_size=1024)
+    upload.write("\n".join(rows).encode())
+    stored = {}
+    mock_supabase.storage.from_.return_value.upload.side_effect = \
+        lambda path, file, file_options=None: stored.setdefault(path, file.read())
+
+    with patch.object(api_main, "UPLOAD_CHUNK_ROWS", 500):
+        profile = api_main._ingest_upload(upload, "p1/1_data.csv", None)
+
+    columns = {c["name"]: c for c in profile.schema()["columns"]}
+    assert profile.rows == 1200
+    assert columns["id"] == {"name": "id", "type": "int64", "missing": 0.0, "unique": 1200}
+    assert columns["group"]["unique"] == 2
+    assert columns["score"]["type"] == "float64" and columns["score"]["missing"] == 0.1
+    assert stored["p1/1_data.csv"] == "\n".join(rows).encode()
+    if "p1/1_data.parquet" in stored:  # pyarrow installed
+        copy = pd.read_parquet(io.BytesIO(stored["p1/1_data.parquet"]))
+        assert len(copy) == 1200 and str(copy["score"].dtype) == "float64"
+
+    with pytest.raises(api_main.HTTPException) as quota:
+        api_main._ingest_upload(upload, "p1/2_data.csv", 1000)
+    assert quota.value.status_code == 403 and "p1/2_data.csv" not in stored
+
+
+
+# ========== Preview Tests ==========
+
+def test_preview_reads_only_the_head_and_is_cached(override_auth, mock_supabase):
+    """Dataset previews stream a byte range of the CSV, grow it for wide rows, and are cached"""
+    import contextlib
+    import api.main as api_main
+    body = ("id,text\n" + "".join(f"{i},{'x' * 5000}\n" for i in range(500))).encode()
+    requests_seen = []
+
+    @contextlib.contextmanager
+    def fake_stream(method, url, headers=None, timeout=None):
+        end = int(headers["Range"].split("-")[1])
+        requests_seen.append(end)
+        chunk = body[:end + 1]
+        yield Mock(status_code=206, raise_for_status=lambda: None,
+                   iter_bytes=lambda: (chunk[i:i + 4096] for i in range(0, len(chunk), 4096)))
+
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = {
+        "id": "d1", "project_id": "p1", "file_url": "p1/1_wide.csv", "owner_id": "test-user-id"}
+    mock_supabase.storage.from_.return_value.list.return_value = []  # no Parquet copy (older upload)
+    api_main._PREVIEW_CACHE.clear()
+    with patch.object(api_main.httpx, "stream", fake_stream):
+        first = client.get("/v1/datasets/d1/preview", headers={"Authorization": "Bearer valid-token"})
+        second = client.get("/v1/datasets/d1/preview", headers={"Authorization": "Bearer valid-token"})
+
+    assert first.status_code == 200 and first.text == second.text
+    rows = pd.read_csv(io.StringIO(first.text))
+    assert list(rows["id"]) == list(range(20))
+    assert len(requests_seen) == 2  # 64 KiB was too short for 20 rows, one larger range, then cached
+    assert max(requests_seen) < len(body)
+
+
+def test_preview_reads_the_parquet_copy_when_stored(override_auth, mock_supabase, tmp_path, monkeypatch):
+    """A dataset with a Parquet copy is previewed from its first row group, never from the CSV"""
+    pytest.importorskip("pyarrow")
+    import api.main as api_main
+    from libs import dataset_store
+    df = pd.DataFrame({"id": range(500), "score": [i / 7 for i in range(500)], "grp": ["a", "b"] * 250})
+    raw = dataset_store.to_parquet_bytes(df)
+    monkeypatch.setattr(dataset_store, "DATASET_CACHE_DIR", str(tmp_path))
+    bucket = mock_supabase.storage.from_.return_value
+    bucket.list.return_value = [{"name": "1_typed.csv", "metadata": {"eTag": "c1", "size": 1}},
+                                {"name": "1_typed.parquet", "metadata": {"eTag": "p1", "size": len(raw)}}]
+    bucket.download.return_value = raw
+    mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute.return_value.data = {
+        "id": "d1", "project_id": "p1", "file_url": "p1/1_typed.csv", "owner_id": "test-user-id"}
+    api_main._PREVIEW_CACHE.clear()
+    with patch.object(api_main, "_stream_head", side_effect=AssertionError("CSV read")):
+        resp = client.get("/v1/datasets/d1/preview", headers={"Authorization": "Bearer valid-token"})
+
+    assert resp.status_code == 200
+    assert bucket.download.call_args[0][0] == "p1/1_typed.parquet"
+    pd.testing.assert_frame_equal(pd.read_csv(io.StringIO(resp.text)), df.head(api_main.PREVIEW_ROWS))
+    api_main._PREVIEW_CACHE.clear()
+
+
+def test_download_all_streams_zip_with_stored_pdf(override_auth, mock_supabase):
+    """Run exports stream a ZIP built from concurrently fetched artifacts; PDFs are stored, CSVs deflated"""
+    import contextlib
+    import zipfile
+    import api.main as api_main
+    bodies = {"synthetic.csv": b"a,b\n" + b"1,2\n" * 20000, "report.pdf": b"%PDF-1.4 " + bytes(range(256)) * 40}
+
+    @contextlib.contextmanager
+    def fake_stream(method, url, headers=None, timeout=None):
+        body = bodies.get(url.rsplit("/", 1)[-1])
+        if body is None:
+            raise RuntimeError("missing object")
+        yield Mock(raise_for_status=lambda: None,
+                   iter_bytes=lambda size=None: (body[i:i + 4096] for i in range(0, len(body), 4096)))
+
+    single = mock_supabase.table.return_value.select.return_value.eq.return_value.single.return_value.execute
+    single.side_effect = [Mock(data={"id": "r1", "project_id": "p1", "name": "Run"}),
+                          Mock(data={"owner_id": "test-user-id"})]
+    mock_supabase.table.return_value.select.return_value.eq.return_value.execute.return_value.data = [
+        {"kind": "synthetic_csv", "path": "r1/synthetic.csv"},
+        {"kind": "report_pdf", "path": "r1/report.pdf"},
+        {"kind": "other", "path": "r1/gone.json"},
+    ]
+    with patch.object(api_main.httpx, "stream", fake_stream):
+        response = client.get("/v1/runs/r1/download/all", headers={"Authorization": "Bearer valid-token"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    zf = zipfile.ZipFile(io.BytesIO(response.content))
+    assert sorted(zf.namelist()) == ["Gesalps_Quality_Report.pdf", "README.txt", "synthetic.csv"]
+    assert zf.read("synthetic.csv") == bodies["synthetic.csv"]
+    assert zf.read("Gesalps_Quality_Report.pdf") == bodies["report.pdf"]
+    assert zf.getinfo("Gesalps_Quality_Report.pdf").compress_type == zipfile.ZIP_STORED
+    assert zf.getinfo("synthetic.csv").compress_type == zipfile.ZIP_DEFLATED
+    assert zf.testzip() is None
+
+
+def test_zip_stream_writes_entries_while_downloading_and_releases_spools():
+    """ZIP entries stream from downloads still in progress; an abandoned export stops and frees them"""
+    import contextlib
+    import threading
+    import time
+    import api.main as api_main
+    gate = threading.Event()
+    pipes = []
+
+    @contextlib.contextmanager
+    def fake_stream(method, url, headers=None, timeout=None):
+        def parts(size=None):
+            yield b"x" * 70000  # first chunk arrives at once, the rest waits on `gate`
+            gate.wait(5)
+            for _ in range(100):
+                yield b"y" * 70000
+        yield Mock(raise_for_status=lambda: None, iter_bytes=parts)
+
+    class RecordingPipe(api_main._ArtifactPipe):
+        def __init__(self):
+            super().__init__()
+            pipes.append(self)
+
+    with patch.object(api_main.httpx, "stream", fake_stream), \
+            patch.object(api_main, "_ArtifactPipe", RecordingPipe), \
+            patch.object(api_main, "_storage_object_request", lambda bucket, path: (path, {})):
+        gen = api_main._zip_stream([("a.csv", "r1/a.csv"), ("b.csv", "r1/b.csv")], b"readme")
+        first = next(gen)  # written before any download finished
+        assert first.startswith(b"PK") and not any(p._done for p in pipes)
+        gen.close()
+        gate.set()
+        for p in pipes:
+            with p._cond:
+                p._cond.wait_for(lambda: p._done, timeout=5)
+    time.sleep(0.05)
+    assert len(pipes) == 2 and all(p._file.closed for p in pipes)
+    assert all(p._written < 100 * 70000 for p in pipes)  # downloads stopped early
+
+
+def test_synthetic_download_serves_precompressed_variants(override_auth, mock_supabase):
+    """Synthetic downloads pass the worker's .gz sibling through as-is and fall back to the plain CSV"""
+    import contextlib
+    import gzip
+    import api.main as api_main
+    csv_bytes = b"a,b\n" + b"1,2\n" * 5000
+    objects = {"r1/synthetic.csv": csv_bytes, "r1/synthetic.csv.gz": gzip.compress(csv_bytes, mtime=0),
+               "r1/synthetic.parquet": b"PAR1-bytes"}
+    fetched = []
+
+    @contextlib.contextmanager
+    def fake_stream(method, url, headers=None, timeout=None):
+        path = url.split("/storage/v1/object/artifacts/", 1)[1]
+        fetched.append(path)
+        body = objects.get(path)
+        yield Mock(status_code=200 if body is not None else 404, headers={"content-length": str(len(body or b""))},
+                   iter_bytes=lambda size=None: iter([body]))
+
+    table = mock_supabase.table.return_value.select.return_value.eq.return_value
+    table.single.return_value.execute.return_value.data = {"id": "r1", "project_id": "p1", "owner_id": "test-user-id"}
+    table.eq.return_value.single.return_value.execute.return_value.data = {"path": "r1/synthetic.csv"}
+    auth = {"Authorization": "Bearer valid-token"}
+    with patch.object(api_main.httpx, "stream", fake_stream):
+        gz = client.get("/v1/runs/r1/synthetic/download", headers={**auth, "Accept-Encoding": "gzip"})
+        assert gz.status_code == 200 and gz.headers["content-encoding"] == "gzip"
+        assert gz.content == csv_bytes  # decoded by the client; the stored .gz went out unchanged
+        assert fetched == ["r1/synthetic.csv.gz"]
+
+        fetched.clear()
+        zst = client.get("/v1/runs/r1/synthetic/download", headers={**auth, "Accept-Encoding": "zstd"})
+        assert zst.status_code == 200 and "content-encoding" not in zst.headers
+        assert zst.content == csv_bytes
+        assert fetched == ["r1/synthetic.csv.zst", "r1/synthetic.csv"]  # no zstd variant stored: plain CSV
+
+        pq = client.get("/v1/runs/r1/synthetic/download?format=parquet", headers=auth)
+        assert pq.status_code == 200 and pq.content == b"PAR1-bytes"
+        assert 'filename="synthetic.parquet"' in pq.headers["content-disposition"]
+
+        assert client.get("/v1/runs/r1/synthetic/download?format=csv.zst", headers=auth).status_code == 404
+        assert client.get("/v1/runs/r1/synthetic/download?format=xlsx", headers=auth).status_code == 400
+
+
+def test_listings_page_through_aggregate_queries(override_auth, mock_supabase):
+    """Project and run listings come from one aggregate call per page, with cursors and field projection"""
+    import api.main as api_main
+    api_main._LISTING_RPC_DOWN_UNTIL[0] = 0.0
+    projects = [{"id": f"p{i}", "name": f"P{i}", "owner_id": "test-user-id", "created_at": f"2024-01-0{9 - i}T00:00:00+00:00",
+                 "datasets_count": i, "runs_count": i, "last_run_at": None} for i in range(3)]
+    mock_supabase.rpc.return_value.execute.return_value.data = projects
+    auth = {"Authorization": "Bearer valid-token"}
+
+    first = client.get("/v1/projects?limit=2", headers=auth)
+    assert first.status_code == 200
+    assert [p["id"] for p in first.json()] == ["p0", "p1"]
+    assert first.json()[1]["datasets_count"] == 1 and first.json()[1]["status"] == "Active"
+    fn, params = mock_supabase.rpc.call_args[0]
+    assert fn == "list_project_summaries" and params["p_limit"] == 3 and params["p_cursor_id"] is None
+
+    mock_supabase.rpc.return_value.execute.return_value.data = projects[2:]
+    second = client.get(f"/v1/projects?limit=2&cursor={first.headers['x-next-cursor']}", headers=auth)
+    assert [p["id"] for p in second.json()] == ["p2"] and "x-next-cursor" not in second.headers
+    params = mock_supabase.rpc.call_args[0][1]
+    assert (params["p_cursor_created"], params["p_cursor_id"]) == (projects[1]["created_at"], "p1")
+
+    mock_supabase.rpc.return_value.execute.return_value.data = [{
+        "id": "r1", "name": "run", "project_id": "p0", "project_name": "P0", "dataset_id": "d1", "dataset_name": "D",
+        "status": "succeeded", "method": "gc", "started_at": "2024-01-01T00:00:00+00:00",
+        "finished_at": "2024-01-01T00:10:00+00:00", "config_json": {}, "sort_key": "2024-01-01T00:00:00+00:00",
+        "duration_seconds": 600.0, "has_summary": True, "n_synth": 100, "all_green": True,
+        "ks_mean": 0.05, "corr_delta": 0.04, "mia_auc": 0.52, "dup_rate": 0.0, "privacy_score": 0.9,
+        "utility_score": None, "auroc": 0.81, "c_index": 0.79, "rare_coverage": 0.9, "freq_skew": None,
+        "compliance_passed": True, "compliance_score": 0.8, "compliance_level": "hipaa_like"}]
+    runs = client.get("/v1/runs?fields=status,duration,project_name", headers=auth)
+    assert runs.json() == [{"id": "r1", "status": "succeeded", "duration": 10, "project_name": "P0"}]
+    fn, params = mock_supabase.rpc.call_args[0]
+    # Without `limit` the whole listing comes back, unpaginated
+    assert fn == "list_run_summaries" and params["p_limit"] is None and "x-next-cursor" not in runs.headers
+    full = client.get("/v1/runs", headers=auth).json()[0]
+    assert full["privacy"] == {"mia_auc": 0.52, "dup_rate": 0.0, "privacy_score": 0.9}
+    assert full["utility"]["auroc"] == 0.81 and full["utility"]["c_index"] == 0.79
+    assert full["metrics"]["fairness"] == {"rare_coverage": 0.9} and full["scores"]["auroc"] == 0.81
+    assert full["metrics"]["privacy_audit_passed"] and full["metrics"]["utility_audit_passed"]
+    assert full["metrics"]["compliance_passed"] and full["metrics"]["rows_generated"] == 100
+    assert full["scores"]["privacy_score"] == 0.9
+    mock_supabase.table.assert_not_called()  # no metrics payloads, no per-run queries
+
+    assert client.get("/v1/runs?cursor=not-a-cursor", headers=auth).status_code == 400
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
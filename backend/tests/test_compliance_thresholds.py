@@ -350,6 +350,39 @@ class TestComplianceIntegration:
         assert "passed" in result
         assert "violations" in result
 
+    def test_ci_gates_use_bootstrap_bounds(self):
+        """COMP-015: CI-aware gates compare the favourable (lenient) or unfavourable (strict) bound."""
+        evaluator = get_compliance_evaluator("hipaa_like")
+        borderline = {
+            "privacy": {"mia_auc": 0.55, "dup_rate": 0.02},
+            "utility": {
+                "ks_mean": 0.11,
+                "corr_delta": 0.05,
+                "ci": {"ks_mean": {"estimate": 0.11, "low": 0.08, "high": 0.13}},
+            },
+            "meta": {"n_real": 200},
+        }
+
+        point = evaluator.evaluate(borderline)
+        assert not point["utility_passed"] and point["ci_gate"] is None
+
+        lenient = evaluator.evaluate(borderline, ci_gate="lenient")
+        assert lenient["utility_passed"] and lenient["ci_gate"] == "lenient"
+
+        borderline["utility"]["ks_mean"] = 0.09
+        borderline["utility"]["ci"]["ks_mean"]["estimate"] = 0.09
+        strict = evaluator.evaluate(borderline, ci_gate="strict")
+        assert not strict["utility_passed"]
+        assert any("CI 0.080-0.130" in v for v in strict["violations"])
+        # Metrics without a CI keep their point estimate in every mode
+        assert strict["privacy_passed"]
+
+        # A CI around another estimator's number never stands in for the reported value
+        borderline["privacy"]["mia_auc"] = 0.75
+        borderline["privacy"]["ci"] = {"mia_auc": {"estimate": 0.51, "low": 0.48, "high": 0.52}}
+        lenient = evaluator.evaluate(borderline, ci_gate="lenient")
+        assert not lenient["privacy_passed"]
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,735 @@
+"""
+Unit tests for the shared metric engines in libs/.
+Run with: pytest tests/test_metric_engines.py -v
+"""
+
+import hashlib
+
+import pytest
+import numpy as np
+import pandas as pd
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from libs.encoding import FrameEncoder, dataset_fingerprint
+from libs.baseline_cache import get_real_baseline, clear_baseline_cache
+from libs.tstr import TSTREngine, detect_targets
+
+
+@pytest.fixture
+def real_df():
+    rng = np.random.default_rng(0)
+    n = 400
+    df = pd.DataFrame({
+        "age": rng.integers(20, 80, n),
+        "sex": rng.choice(["M", "F"], n),
+        "bp": rng.normal(120, 10, n),
+    })
+    df["target"] = ((df["age"] > 50) & (df["sex"] == "M")).astype(int)
+    return df
+
+
+class MemoryBucket:
+    """Storage bucket stand-in with the download/upload/list calls the libs use."""
+
+    def __init__(self):
+        self.objects = {}
+        self.downloads = 0
+
+    def download(self, path):
+        self.downloads += 1
+        return self.objects[path]
+
+    def upload(self, path, file, file_options=None):
+        self.objects[path] = file
+
+    def list(self, folder, options=None):
+        prefix = f"{folder}/" if folder else ""
+        search = (options or {}).get("search", "")
+        names = [p[len(prefix):] for p in self.objects if p.startswith(prefix)]
+        return [{"name": name, "metadata": {"eTag": hashlib.md5(self.objects[prefix + name]).hexdigest()}}
+                for name in names if "/" not in name and name.startswith(search)]
+
+
+# ========== Encoding ==========
+
+def test_fingerprint_is_content_based(real_df):
+    assert dataset_fingerprint(real_df) == dataset_fingerprint(real_df.copy())
+    changed = real_df.copy()
+    changed.loc[0, "bp"] += 1.0
+    assert dataset_fingerprint(changed) != dataset_fingerprint(real_df)
+
+
+def test_encoder_shares_dictionaries(real_df):
+    enc = FrameEncoder().fit(real_df)
+    synth = pd.DataFrame({"age": [30], "sex": ["F"], "bp": [np.nan], "target": [0]})
+    X_real = enc.transform(real_df.head(50))
+    X_synth = enc.transform(synth)
+    f_code = enc.categories["sex"].get_loc("F")
+    assert X_synth[0, 1] == f_code
+    assert X_synth[0, 2] == 0.0  # numeric NaN filled
+    assert X_real.shape == (50, 4)
+
+    unknown = enc.transform(pd.DataFrame({"sex": ["X"]}), columns=["sex", "bp"])
+    assert unknown[0, 0] == -1
+    assert unknown[0, 1] == 0.0  # missing column encodes as zeros
+
+
+# ========== Real baseline cache ==========
+
+def test_baseline_cached_per_content_and_seed(real_df):
+    clear_baseline_cache()
+    b1 = get_real_baseline(real_df)
+    assert get_real_baseline(real_df.copy()) is b1
+    assert get_real_baseline(real_df, seed=7) is not b1
+
+
+def test_baseline_sections_are_built_once(real_df):
+    clear_baseline_cache()
+    baseline = get_real_baseline(real_df)
+    engine = baseline.tstr()
+    assert baseline.tstr() is engine
+
+    attr = baseline.attribute_inference()
+    assert baseline.attribute_inference() is attr
+    assert attr.qis == ["age", "sex"]
+    assert 0.0 < attr.baselines.min() <= 1.0
+
+
+# ========== Attribute inference ==========
+
+def test_attribute_inference_covers_all_sensitive_columns(real_df):
+    clear_baseline_cache()
+    engine = get_real_baseline(real_df).attribute_inference()
+    leaked = engine.attack(real_df.copy())
+    assert set(leaked["columns"]) == {"target", "bp"}
+    assert leaked["primary"] == "target"
+    assert leaked["columns"]["target"]["accuracy"] == 1.0
+    assert leaked["max_lift"] > 0.15
+    assert engine.attack(real_df.copy()) is leaked  # memoized per synthetic content
+
+    rng = np.random.default_rng(1)
+    shuffled = real_df.apply(lambda s: rng.permutation(s.to_numpy()))
+    assert engine.attack(shuffled)["max_lift"] < 0.05
+
+
+# ========== TSTR engine ==========
+
+def test_detect_targets_prefers_named_outcome(real_df):
+    targets = detect_targets(real_df)
+    assert targets[0] == {"column": "target", "task": "classification", "primary": True}
+    assert {t["column"] for t in targets[1:]} == {"sex"}
+
+
+def test_tstr_returns_scores_together(real_df):
+    clear_baseline_cache()
+    engine = get_real_baseline(real_df).tstr()
+    res = engine.evaluate(real_df.sample(frac=1.0, random_state=3))
+    assert res["primary_target"] == "target"
+    assert res["auroc"] > 0.9
+    assert res["f1"] is not None
+    assert 0.0 <= res["mle_score"] <= 1.0
+    assert set(res["targets"]) == {"target", "sex"}
+
+
+def test_tstr_respects_row_budget(real_df):
+    clear_baseline_cache()
+    engine = TSTREngine(get_real_baseline(real_df), row_budget=100)
+    assert len(engine.primary["X_test"]) <= 100
+    res = engine.evaluate(real_df)
+    assert res["auroc"] is not None
+
+
+def test_tstr_time_budget_stops_fits_without_leaving_threads(real_df):
+    import threading
+    clear_baseline_cache()
+    engine = TSTREngine(get_real_baseline(real_df), time_budget=0.0)
+    before = threading.active_count()
+    res = engine.evaluate(real_df)
+    assert {t["skipped"] for t in res["targets"].values()} == {"time budget exceeded"}
+    assert threading.active_count() == before
+
+    # A fit that starts at its deadline stops after one boosting step
+    import time
+    from libs.tstr import train_bounded
+    spec = engine.primary
+    X = engine.encoder.transform(real_df, spec["features"])
+    y = spec["classes"].get_indexer(real_df["target"].astype(str))
+    model = train_bounded("classification", X, y, spec["categorical"], deadline=time.monotonic())
+    assert model.n_iter_ <= 10
+
+
+# ========== Sketches ==========
+
+def test_sketch_metrics_match_exact_within_bounds():
+    from scipy.stats import ks_2samp
+    from libs.sketches import approximate_utility_metrics, iter_frame_chunks
+
+    rng = np.random.default_rng(1)
+    real = pd.DataFrame({"a": rng.normal(0, 1, 50000), "c": rng.choice(list("xyz"), 50000)})
+    real["b"] = real["a"] * 2 + rng.normal(0, 1, 50000)
+    synth = pd.DataFrame({"a": rng.normal(0.2, 1, 20000), "c": rng.choice(list("xy"), 20000)})
+    synth["b"] = synth["a"] + rng.normal(0, 1, 20000)
+
+    res = approximate_utility_metrics(iter_frame_chunks(real, 7000), iter_frame_chunks(synth, 3000), k=100)
+    approx = res["approx"]
+    exact_ks = np.mean([ks_2samp(real[c], synth[c]).statistic for c in ("a", "b")])
+    assert abs(res["ks_mean"] - exact_ks) <= approx["ks_mean_error"]
+    exact_corr = abs(real[["a", "b"]].corr().iloc[0, 1] - synth[["a", "b"]].corr().iloc[0, 1])
+    assert res["corr_delta"] == pytest.approx(exact_corr, abs=1e-9)
+    assert approx["tvd_mean_error"] == 0.0  # small cardinality stays exact
+
+
+def test_stored_csv_sketch_streams_and_is_cached():
+    from contextlib import contextmanager
+    from unittest.mock import patch
+    from libs.sketches import cached_sketch, sketch_chunks, sketch_stored_csv, approximate_utility_metrics, iter_frame_chunks
+
+    rng = np.random.default_rng(4)
+    real = pd.DataFrame({"a": rng.normal(0, 1, 5000), "c": rng.choice(["x", "y"], 5000)})
+    raw = real.to_csv(index=False).encode()
+
+    class Resp:
+        def raise_for_status(self):
+            pass
+
+        def iter_bytes(self, size):
+            for i in range(0, len(raw), 777):  # blocks cut mid-line
+                yield raw[i:i + 777]
+
+    @contextmanager
+    def stream(method, url, headers=None, timeout=None):
+        yield Resp()
+
+    builds = []
+
+    def build():
+        builds.append(1)
+        return sketch_stored_csv("http://storage/obj.csv", chunk_rows=1000, numeric=["a"], categorical=["c"])
+
+    with patch("httpx.stream", stream):
+        sk = cached_sketch(("obj.csv", "etag-1", ("a", "c")), build)
+        assert cached_sketch(("obj.csv", "etag-1", ("a", "c")), build) is sk
+    assert len(builds) == 1 and sk.rows == 5000
+
+    res = approximate_utility_metrics(sk, iter_frame_chunks(real, 1000))
+    assert res["ks_mean"] <= res["approx"]["ks_mean_error"]
+    assert res["approx"]["tvd_mean"] == pytest.approx(0.0, abs=1e-9)
+    expected = sketch_chunks(iter_frame_chunks(real, 1000))
+    assert sk.quantiles["a"].n == expected.quantiles["a"].n
+
+
+def test_sketches_merge_and_bound_memory():
+    from libs.sketches import FrequencySketch, QuantileSketch
+
+    rng = np.random.default_rng(2)
+    values = rng.normal(0, 1, 100000)
+    merged = QuantileSketch(k=100, seed=0).update(values[:60000])
+    merged.merge(QuantileSketch(k=100, seed=1).update(values[60000:]))
+    assert merged.n == 100000
+    assert len(merged.items()) < 1000
+    assert abs(merged.quantile(0.5) - np.median(values)) < 0.05
+
+    freq = FrequencySketch(capacity=2).update(["a"] * 50 + ["b"] * 30 + ["c"] * 10 + ["d"] * 10)
+    assert set(freq.counts) == {"a", "b"}
+    assert freq.residual == pytest.approx(0.4)
+
+
+# ========== Correlation engine ==========
+
+def test_distinct_sketch_exact_then_approximate_and_mergeable():
+    from libs.sketches import DistinctSketch
+    small = DistinctSketch().update(pd.Series(["a", "b", None, "a"]))
+    assert small.count() == 2 and small.exact is not None
+
+    values = np.arange(50000)
+    a = DistinctSketch().update(pd.Series(values[:30000]))
+    b = DistinctSketch().update(pd.Series(values[20000:]))
+    assert a.exact is None  # past exact_limit: HyperLogLog registers
+    assert abs(a.merge(b).count() - 50000) / 50000 < 0.05
+
+
+def test_schema_profile_merges_chunks_like_a_full_parse():
+    from libs.sketches import SchemaProfile
+    df = pd.DataFrame({"id": range(1200), "grp": ["ab"[i % 2] for i in range(1200)],
+                       "score": [np.nan if i % 10 == 0 else i for i in range(1200)]})
+    profile = SchemaProfile()
+    profile.update(df.iloc[:500].astype({"score": "float64"}))
+    profile.update(df.iloc[500:].assign(score=lambda d: d["score"].fillna(0).astype("int64")))
+    columns = {c["name"]: c for c in profile.schema()["columns"]}
+    assert profile.rows == 1200
+    assert columns["id"] == {"name": "id", "type": "int64", "missing": 0.0, "unique": 1200}
+    assert columns["grp"]["unique"] == 2 and columns["grp"]["missing"] == 0.0
+    # float chunk then int chunk: float64, as pandas infers for the whole column
+    assert columns["score"]["type"] == "float64" and columns["score"]["missing"] == round(50 / 1200, 4)
+
+
+def test_correlation_engine_matches_pandas_blockwise():
+    from libs.correlation import CorrelationEngine
+
+    rng = np.random.default_rng(3)
+    real = pd.DataFrame(rng.normal(size=(500, 7)), columns=[f"x{i}" for i in range(7)])
+    real["x1"] += real["x0"]
+    real.loc[::9, "x2"] = np.nan
+    synth = pd.DataFrame(rng.normal(size=(300, 7)), columns=real.columns)
+
+    res = CorrelationEngine(real, block_size=3).compare(synth, top_k=2)
+    cr, cs = real.corr().to_numpy(), synth.corr().to_numpy()
+    iu = np.triu_indices_from(cr, k=1)
+    assert res["corr_delta"] == pytest.approx(np.mean(np.abs(cr[iu] - cs[iu])))
+    assert res["pairs"]["numeric"] == 21
+    assert {res["worst_pairs"][0]["a"], res["worst_pairs"][0]["b"]} == {"x0", "x1"}
+
+
+def test_correlation_engine_categorical_associations(real_df):
+    from libs.correlation import CorrelationEngine
+
+    real = real_df.assign(grp=np.where(real_df["bp"] > 120, "hi", "lo"))
+    synth = real.assign(grp=real["grp"].sample(frac=1.0, random_state=0).to_numpy())
+    engine = CorrelationEngine(real)
+    same = engine.compare(real)
+    assert same["cramers_v_delta"] == pytest.approx(0.0)
+    assert same["corr_ratio_delta"] == pytest.approx(0.0)
+
+    shuffled = engine.compare(synth)
+    worst = shuffled["worst_pairs"][0]
+    assert {worst["a"], worst["b"]} == {"bp", "grp"} and worst["kind"] == "mixed"
+    assert worst["real"] > 0.7
+
+
+# ========== Metric profiles ==========
+
+def test_resolve_metric_profiles_from_config():
+    from libs.metric_profiles import resolve_metric_profiles
+
+    search, final = resolve_metric_profiles({})
+    assert (search.name, final.name) == ("search-fast", "final-full")
+    search, final = resolve_metric_profiles({"metric_profile": "regulatory"})
+    assert (search.name, final.name) == ("regulatory", "regulatory")
+    search, final = resolve_metric_profiles({"metric_profile": {"search": "final_full", "final": "nope"}})
+    assert (search.name, final.name) == ("final-full", "final-full")
+
+
+def test_recorder_degrades_gracefully(monkeypatch):
+    import time
+    import libs.metric_profiles as mp
+    from libs.metric_profiles import MetricProfile, MetricRecorder, metric_deadline
+
+    monkeypatch.setattr(mp, "METRIC_TIMEOUT_GRACE_S", 0.05)
+    profile = MetricProfile(name="test", enabled={"off": False}, budgets={"slow": 0.05, "polite": 0.05})
+    rec = MetricRecorder(profile, mem_sample_ms=5)
+    assert rec.run("off", lambda: 1, default="d") == "d"
+    assert rec.run("slow", time.sleep, 1.0, default="late") == "late"
+    assert rec.run("boom", lambda: 1 / 0, default=None) is None
+    assert rec.run("fine", lambda x: x * 2, 21) == 42
+
+    timings = rec.summary()["metric_timings"]
+    assert [timings[k]["status"] for k in ("off", "slow", "boom", "fine")] == ["skipped", "timeout", "error", "ok"]
+    assert timings["slow"]["wall_s"] < 0.5
+    assert "ZeroDivisionError" in timings["boom"]["error"]
+    assert timings["fine"]["peak_mb"] >= 0.0
+
+    # The overrunning sleep still holds "slow" on this recorder: a second run does not start a second copy
+    assert rec.run("slow", lambda: "fresh", default="late") == "late"
+    assert rec.timings["slow"]["busy"] is True
+    # ... but another recorder (another run) is not held up by it
+    assert MetricRecorder(profile, mem_sample_ms=5).run("slow", lambda: "fresh", default="late") == "fresh"
+
+    # A component that honours its deadline returns its partial result
+    def polite():
+        while time.monotonic() < metric_deadline():
+            time.sleep(0.005)
+        return "partial"
+    assert rec.run("polite", polite) == "partial"
+    assert metric_deadline() is None
+
+
+# ========== Dataset profile ==========
+
+def test_dataset_profile_round_trip_and_lookup(real_df):
+    from scipy.stats import ks_2samp
+    from libs.dataset_profile import (
+        DatasetProfile, clear_dataset_profiles, get_dataset_profile, ks_statistic, peek_dataset_profile,
+    )
+
+    clear_dataset_profiles()
+    bucket = MemoryBucket()
+    profile = get_dataset_profile(real_df, bucket, "proj/data.csv")
+    assert list(bucket.objects) == [f"proj/.profiles/{profile.fingerprint}.v1.npz"]
+    assert peek_dataset_profile(real_df) is profile
+    assert profile.quasi_identifiers == ["age", "sex"] and profile.sensitive == "target"
+    assert profile.freq("sex").sum() == pytest.approx(1.0)
+
+    synth = np.random.default_rng(5).normal(120, 12, 300)
+    assert ks_statistic(profile.sorted("bp"), synth) == pytest.approx(ks_2samp(real_df["bp"], synth).statistic)
+
+    # A new process (empty cache) loads the persisted copy instead of rebuilding
+    clear_dataset_profiles()
+    loaded = get_dataset_profile(real_df.copy(), bucket, "proj/data.csv")
+    assert loaded is not profile and loaded.fingerprint == profile.fingerprint
+    assert np.array_equal(loaded.sorted("age"), profile.sorted("age"))
+    assert DatasetProfile.from_bytes(profile.to_bytes()).value_counts == profile.value_counts
+
+
+# ========== Metric cache ==========
+
+def test_recorder_memoizes_metric_pairs(real_df, tmp_path):
+    from libs.metric_cache import MetricCache
+    from libs.metric_profiles import MetricRecorder
+
+    calls = []
+
+    def metric(real, synth):
+        calls.append(1)
+        return {"value": float(np.random.random())}
+
+    cache = MetricCache(directory=str(tmp_path))
+    synth = real_df.sample(frac=1.0, random_state=1)
+    rec = MetricRecorder(cache=cache)
+    first = rec.run("mia", metric, real_df, synth)
+    first["value"] = -1.0  # callers may mutate results without touching the cache
+
+    again = MetricRecorder(cache=cache).run("mia", metric, real_df.copy(), synth.copy())
+    assert again["value"] != -1.0 and len(calls) == 1
+    assert rec.summary()["metric_cache_key"]["synth"] != rec.summary()["metric_cache_key"]["real"]
+
+    # Disk layer survives a fresh process-level cache
+    rec2 = MetricRecorder(cache=MetricCache(directory=str(tmp_path)))
+    assert rec2.run("mia", metric, real_df, synth) == again
+    assert rec2.timings["mia"]["status"] == "cached" and len(calls) == 1
+
+    # Different synthetic content is a different key
+    MetricRecorder(cache=cache).run("mia", metric, real_df, synth.head(100))
+    assert len(calls) == 2
+
+
+# ========== Bootstrap CIs ==========
+
+def test_bootstrap_cis_are_reproducible_and_cover_estimates(real_df):
+    from scipy.stats import ks_2samp
+    from sklearn.metrics import roc_auc_score
+    from libs.bootstrap import bootstrap_cis
+
+    synth = real_df.sample(frac=1.0, replace=True, random_state=4).reset_index(drop=True)
+    synth.loc[:199, "bp"] += 2.0  # first half no longer copies a real row
+    rng = np.random.default_rng(6)
+    y = rng.integers(0, 2, 300)
+    scores = rng.normal(size=300) + 0.5 * y
+
+    serial = bootstrap_cis(real_df, synth, mia_scores=(y, scores), n_boot=60, seed=11, workers=1)
+    pooled = bootstrap_cis(real_df, synth, mia_scores=(y, scores), n_boot=60, seed=11, workers=2)
+    for metric in ("ks_mean", "corr_delta", "dup_rate", "mia_auc"):
+        assert serial[metric] == pooled[metric]
+        assert serial[metric]["low"] <= serial[metric]["estimate"] <= serial[metric]["high"]
+
+    exact_ks = np.mean([ks_2samp(real_df[c], synth[c]).statistic for c in ("age", "bp", "target")])
+    assert serial["ks_mean"]["estimate"] == pytest.approx(exact_ks)
+    assert serial["mia_auc"]["estimate"] == pytest.approx(roc_auc_score(y, scores))
+    assert serial["mia_auc"]["low"] < serial["mia_auc"]["estimate"] < serial["mia_auc"]["high"]
+    # Same definition as the worker's _dup_rate: distinct real-matching synthetic rows / all synthetic rows
+    distinct_dups = len(pd.merge(real_df.drop_duplicates(), synth.drop_duplicates(), how="inner"))
+    assert serial["dup_rate"]["estimate"] == pytest.approx(distinct_dups / len(synth))
+    assert "truncated" not in serial and serial["n_boot"] == 60
+
+
+def test_bootstrap_stops_at_metric_deadline(real_df):
+    import time
+    import libs.metric_profiles as mp
+    from libs.bootstrap import bootstrap_cis
+
+    synth = real_df.sample(frac=1.0, replace=True, random_state=4).reset_index(drop=True)
+    mp._LOCAL.deadline = time.monotonic()
+    try:
+        res = bootstrap_cis(real_df, synth, n_boot=60, seed=11, workers=2)
+    finally:
+        mp._LOCAL.deadline = None
+    assert res["truncated"] and res["n_boot"] < 60
+
+
+# ========== Membership inference ==========
+
+def test_holdout_split_is_deterministic_and_registered(real_df):
+    from libs.membership_inference import split_holdout, holdout_for
+
+    members, holdout = split_holdout(real_df, frac=0.25, min_rows=100)
+    assert len(holdout) == 100 and len(members) == 300
+    again, _ = split_holdout(real_df, frac=0.25, min_rows=100)
+    assert dataset_fingerprint(again) == dataset_fingerprint(members)
+    pd.testing.assert_frame_equal(holdout_for(members.copy()), holdout)
+    assert split_holdout(real_df, min_rows=1000)[1] is None
+    # Never more rows than the attack draws as non-member targets
+    assert len(split_holdout(real_df, frac=0.5, max_rows=40, min_rows=100)[1]) == 40
+
+
+def test_membership_inference_separates_members_from_holdout(real_df):
+    from sklearn.metrics import roc_auc_score
+    from libs.membership_inference import auc_with_ci, clear_holdouts, split_holdout
+
+    clear_holdouts()
+    clear_baseline_cache()
+    members, _ = split_holdout(real_df, frac=0.25, min_rows=100)
+    engine = get_real_baseline(members).membership_inference()
+
+    leaked = engine.attack(members.copy())
+    assert leaked["auc"] > 0.95
+    assert leaked["dcr_median"]["members"] == 0.0
+
+    rng = np.random.default_rng(8)
+    fresh = pd.DataFrame({
+        "age": rng.integers(20, 80, 300),
+        "sex": rng.choice(["M", "F"], 300),
+        "bp": rng.normal(120, 10, 300),
+    })
+    fresh["target"] = ((fresh["age"] > 50) & (fresh["sex"] == "M")).astype(int)
+    res = engine.attack(fresh)
+    assert res["ci"][0] < 0.5 < res["ci"][1]
+    assert engine.attack(fresh.copy()) == res  # deterministic
+
+    y, scores = engine.scores(fresh)
+    auc, ci = auc_with_ci(y, scores)
+    assert auc == pytest.approx(roc_auc_score(y, scores)) == pytest.approx(res["auc"])
+
+
+# ========== Memorization index ==========
+
+def test_memorization_index_flags_copies_repeated_across_releases(real_df):
+    from libs.memorization_index import MemorizationIndex
+
+    index = MemorizationIndex.build(real_df, dataset_fingerprint(real_df))
+    rng = np.random.default_rng(3)
+    fresh = pd.DataFrame({
+        "age": rng.integers(20, 80, 200),
+        "sex": rng.choice(["M", "F"], 200),
+        "bp": rng.normal(120, 10, 200),
+        "target": rng.integers(0, 2, 200),
+    })
+    first = index.screen(pd.concat([fresh, real_df.head(50)], ignore_index=True), release_id="run-1")
+    assert first["real_records_copied"] >= 50
+    assert first["repeated_real_records"] == 0
+
+    # A later release regenerating some of the same patients is flagged as repeating them
+    second = index.screen(real_df.head(20).assign(bp=lambda d: d["bp"] + 1e-6), release_id="run-2")
+    assert second["near_real_rate"] == 1.0
+    assert second["near_release_rate"] == 1.0
+    assert second["repeated_real_records"] == 20
+    assert second["max_releases_per_record"] == 2
+
+    restored = MemorizationIndex.from_bytes(index.to_bytes())
+    assert restored.releases == ["run-1", "run-2"]
+    assert restored.screen(real_df.head(20), release_id="run-2")["prior_releases"] == 1
+
+
+class _FakeBucket:
+    """Storage bucket double: download/upload(upsert)/list over a dict, in creation order."""
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = []
+
+    def download(self, path):
+        if path not in self.objects:
+            raise FileNotFoundError(path)
+        return self.objects[path]
+
+    def upload(self, path, file, file_options=None):
+        if path in self.objects and (file_options or {}).get("upsert") != "true":
+            raise RuntimeError("The resource already exists")
+        self.objects[path] = file
+        self.uploads.append(path)
+
+    def list(self, folder, options=None):
+        options = options or {}
+        names = [p[len(folder) + 1:] for p in self.objects if p.startswith(folder + "/")]
+        offset = options.get("offset", 0)
+        return [{"name": n} for n in names[offset:offset + options.get("limit", 100)]]
+
+
+def test_memorization_index_persists_one_object_per_release(real_df, monkeypatch):
+    import libs.memorization_index as mi
+
+    monkeypatch.setattr(mi, "MEMO_LIST_PAGE", 2)
+    bucket = _FakeBucket()
+    copies = real_df.head(30).assign(bp=lambda d: d["bp"] + 1e-6)
+
+    # Two workers screen concurrently from the same stored state
+    mi.clear_memorization_indexes()
+    a = mi.get_memorization_index(real_df, bucket, "u/data.csv")
+    mi.clear_memorization_indexes()
+    b = mi.get_memorization_index(real_df, bucket, "u/data.csv")
+    assert a is not b and bucket.uploads == ["u/.memorization/" + a.fingerprint + ".v1/base.npz"]
+    a.screen(copies, release_id="run-a")
+    b.screen(copies, release_id="run-b")
+    assert mi.save_memorization_index(a, bucket, "u/data.csv", "run-a")
+    assert mi.save_memorization_index(b, bucket, "u/data.csv", "run-b")
+    # Only each run's own rows were uploaded; the base went up once
+    assert len(bucket.uploads) == 3 and all("release-run-" in p for p in bucket.uploads[1:])
+
+    # A cached index picks up the other worker's release before screening
+    mi.clear_memorization_indexes()
+    mi._remember(a)
+    assert mi.get_memorization_index(real_df, bucket, "u/data.csv") is a
+    assert sorted(a.releases) == ["run-a", "run-b"]
+    third = a.screen(copies, release_id="run-c")
+    assert third["prior_releases"] == 2 and third["max_releases_per_record"] == 3
+
+    # A cold worker loads the base plus every release (listed across pages)
+    mi.clear_memorization_indexes()
+    cold = mi.get_memorization_index(real_df, bucket, "u/data.csv")
+    assert cold.releases == ["run-a", "run-b"]
+    mi.clear_memorization_indexes()
+
+
+# ========== Compact dtypes ==========
+
+def test_compact_frame_is_lossless_and_restorable(real_df):
+    from libs.frame_types import compact_frame, match_dtype, memory_mb
+
+    wide = real_df.assign(half=real_df["age"] * 0.5, code=real_df["sex"].map({"M": "yes", "F": "no"}))
+    compact = compact_frame(wide)
+    assert compact["age"].dtype == np.int8
+    assert compact["half"].dtype == np.float32
+    assert isinstance(compact["code"].dtype, pd.CategoricalDtype)
+    assert compact["bp"].dtype == np.float64  # not representable in float32
+    pd.testing.assert_frame_equal(compact.astype(wide.dtypes.to_dict()), wide)
+    assert memory_mb(compact) < memory_mb(wide)
+
+    synth = pd.Series([21.4, 300.0, np.nan])
+    assert str(match_dtype(synth.head(1), compact["age"].dtype).dtype) == "Int8"
+    assert str(match_dtype(synth, compact["age"].dtype).dtype) == "Int64"  # out of int8 range
+    assert match_dtype(synth, compact["bp"].dtype) is None
+
+
+def test_dictionary_map_matches_row_wise_strings():
+    from libs.frame_types import as_str, dictionary_map, str_value_counts
+
+    raw = pd.Series([" Yes", "no", None, "YES ", "No", "maybe"] * 50, dtype=object)
+    expected = raw.astype(object).where(raw.notna(), "nan").astype(str)  # pandas 1.5 astype(str)
+    for s in (raw, raw.astype("category")):
+        assert as_str(s, as_category=False).tolist() == expected.tolist()
+        lowered = dictionary_map(s, lambda v: v.str.lower().str.strip())
+        assert lowered.astype(str).tolist() == expected.str.lower().str.strip().tolist()
+        pd.testing.assert_series_equal(
+            str_value_counts(s, normalize=True).sort_index(),
+            expected.value_counts(normalize=True).sort_index(), check_names=False, check_index_type=False,
+        )
+
+    titled = dictionary_map(raw.astype("category"), lambda v: v.str.strip().str.title())
+    assert isinstance(titled.dtype, pd.CategoricalDtype)
+    assert sorted(titled.cat.categories) == ["Maybe", "Nan", "No", "Yes"]  # duplicates merged
+
+
+# ========== Post-processing ==========
+
+def test_postprocess_engine_matches_real_marginals_in_one_pass(real_df):
+    from libs.postprocess import PostProcessEngine
+
+    rng = np.random.default_rng(3)
+    n = 400
+    synth = pd.DataFrame({
+        "age": rng.normal(80, 5, n),
+        "bp": np.where(rng.random(n) < 0.1, np.nan, rng.normal(200, 30, n)),
+        "sex": rng.choice(["M", "F", "X"], n),
+        "row_id": np.arange(n),
+    })
+    engine = PostProcessEngine(real_df)
+    out, steps = engine.apply(synth, sigma_factor=0.0, rng=np.random.default_rng(0))
+
+    assert steps["quantile_matched"] == 2 and steps["cat_resampled"] == 1
+    # Matched values are real quantiles (same order as the synthetic ranks), NaN kept in place
+    assert out["age"].between(real_df["age"].min(), real_df["age"].max()).all()
+    assert (np.diff(out["age"].to_numpy()[np.argsort(synth["age"].to_numpy())]) >= 0).all()
+    assert out["bp"].isna().equals(synth["bp"].isna())
+    assert set(out["sex"]) <= set(real_df["sex"].astype(str))
+    assert out["row_id"].equals(synth["row_id"])  # unmatched integers untouched
+    assert synth["sex"].isin(["X"]).any()  # input not modified
+
+    jittered, _ = engine.apply(synth, sigma_factor=0.01, rng=np.random.default_rng(0))
+    assert not np.allclose(jittered["age"], out["age"])
+    assert jittered["row_id"].equals(synth["row_id"])
+
+
+# ========== Dataset store ==========
+
+def test_dataset_store_prefers_parquet_and_backfills(real_df, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import libs.dataset_store as store
+    from libs.dataset_profile import frame_fingerprint
+    from libs.dataset_store import load_dataset, parquet_path
+
+    monkeypatch.setattr(store, "DATASET_CACHE_DIR", str(tmp_path))
+
+    bucket = MemoryBucket()
+    bucket.upload("proj/1_data.csv", real_df.to_csv(index=False).encode())
+
+    from_csv, source = load_dataset(bucket, "proj/1_data.csv")
+    assert source == "csv" and parquet_path("proj/1_data.csv") == "proj/1_data.parquet"
+    assert "proj/1_data.parquet" in bucket.objects  # written back for the next load
+
+    from_parquet, source = load_dataset(bucket, "proj/1_data.csv")
+    assert source == "parquet"
+    pd.testing.assert_frame_equal(from_parquet, from_csv)
+    assert frame_fingerprint(from_parquet) == frame_fingerprint(from_csv)  # same cache keys either way
+
+    projected, _ = load_dataset(bucket, "proj/1_data.csv", columns=["age", "bp"])
+    assert list(projected.columns) == ["age", "bp"]
+
+
+def test_dataset_store_caches_by_etag(real_df, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import libs.dataset_store as store
+
+    monkeypatch.setattr(store, "DATASET_CACHE_DIR", str(tmp_path))
+    store.clear_dataset_cache()
+    bucket = MemoryBucket()
+    bucket.upload("proj/2_data.csv", real_df.to_csv(index=False).encode())
+    store.load_dataset(bucket, "proj/2_data.csv")  # CSV download + parquet backfill
+
+    first, source = store.load_dataset(bucket, "proj/2_data.csv")
+    downloads = bucket.downloads
+    assert source == "parquet" and len(list(tmp_path.iterdir())) == 2
+
+    # Memory tier: no download, and callers get their own copy
+    first["age"] = 0
+    again, _ = store.load_dataset(bucket, "proj/2_data.csv")
+    assert bucket.downloads == downloads and again["age"].ne(0).all()
+
+    # Disk tier survives a new process (empty memory tier)
+    store.clear_dataset_cache()
+    store.load_dataset(bucket, "proj/2_data.csv")
+    assert bucket.downloads == downloads
+
+    # A replaced object has a new eTag and is fetched again
+    store.clear_dataset_cache()
+    bucket.upload("proj/2_data.parquet", store.to_parquet_bytes(real_df.head(10)))
+    replaced, _ = store.load_dataset(bucket, "proj/2_data.csv")
+    assert len(replaced) == 10 and bucket.downloads == downloads + 1
+
+    # LRU eviction keeps the disk tier under its cap
+    other = real_df.to_csv(index=False).encode()
+    monkeypatch.setattr(store, "DATASET_CACHE_MAX_MB", 1.2 * len(other) / 2**20)
+    bucket.upload("proj/3_other.csv", other)
+    store.load_dataset(bucket, "proj/3_other.csv", backfill=False)
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_run_summary_headlines_and_gates():
+    from libs import run_summary
+    payload = {
+        "privacy": {"mia_auc": 0.55, "dup_rate": 0.01},
+        "utility": {"ks_mean": 0.12, "corr_delta": 0.08, "auroc": 0.8, "c_index": float("nan"),
+                    "fairness": {"rare_coverage": 0.7, "freq_skew": 0.02}},
+        "compliance": {"passed": True, "score": 0.9, "level": "hipaa_like"},
+        "meta": {"n_synth": 500},
+    }
+    row = run_summary.payload_summary(payload)
+    assert set(row) == set(run_summary.SUMMARY_FIELDS)
+    assert row["auroc"] == 0.8 and row["c_index"] is None and row["rare_coverage"] == 0.7
+    assert row["utility_score"] == pytest.approx(0.9) and row["privacy_score"] == pytest.approx(0.95)
+    assert row["all_green"] and row["n_synth"] == 500
+    # Audit gates are stricter on KS than the report and fail on missing metrics
+    assert run_summary.audit_passed(row) == (True, False)
+    assert run_summary.audit_passed({"ks_mean": 0.05, "corr_delta": None}) == (False, False)
+    assert not run_summary.all_green({"privacy": {"mia_auc": 0.7}})